@@ -0,0 +1,74 @@
+"""
+Benchmark: analytics over large result histories.
+
+Times each analytics report on a synthetic in-memory history (default
+1M records across 50 connections), and the chunked load_frame() path
+from an append-only result log.
+
+    python benchmarks/bench_analytics.py --records 1000000 --load-records 200000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import analytics
+from bench_history import build_history
+from storage import ResultStorage
+
+
+def synthetic_frame(records, connections=50, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(records) * 30, unit='s')
+    latency = rng.lognormal(3.5, 0.4, records)
+    latency[rng.random(records) < 0.001] *= 20  # injected spikes
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'connection_name': pd.Categorical(rng.integers(0, connections, records).astype(str)),
+        'avg_latency': latency,
+        'min_latency': latency * 0.8,
+        'max_latency': latency * 1.3,
+        'packet_loss': rng.choice([0.0, 10.0], records, p=[0.97, 0.03]),
+        'download_speed': np.where(rng.random(records) < 0.1, rng.normal(40, 5, records), np.nan),
+        'upload_speed': np.where(rng.random(records) < 0.1, rng.normal(10, 2, records), np.nan),
+    })
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    print(f"  {label:<22} {time.perf_counter() - t0:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--load-records', type=int, default=200_000)
+    args = parser.parse_args()
+
+    frame = synthetic_frame(args.records)
+    print(f"Analytics on {args.records:,} records:")
+    timed('summarize', lambda: analytics.summarize(frame))
+    timed('time_of_day_profile', lambda: analytics.time_of_day_profile(frame))
+    timed('trends', lambda: analytics.trends(frame))
+    flagged = timed('anomalies', lambda: analytics.anomalies(frame))
+    print(f"  flagged {int(flagged['anomaly'].sum()):,} anomalies")
+
+    if args.load_records:
+        with tempfile.TemporaryDirectory() as data_dir:
+            build_history(data_dir, args.load_records)
+            storage = ResultStorage(data_dir)
+            print(f"Loading {args.load_records:,} records from the result log:")
+            loaded = timed('load_frame', lambda: analytics.load_frame(storage))
+            assert len(loaded) == args.load_records
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: fleet mode scaling with worker processes.
+
+Every worker probes its shard of fake targets. FakeTransport runs with
+sleep=False, so the probe loop and the statistics are CPU-bound. Results
+reach the aggregator as binary batches, and the aggregator writes them to a
+temporary ResultStorage. The benchmark prints probes/s per worker count and
+the scaling efficiency against one worker. Efficiency is only meaningful
+up to the number of available cores.
+
+    python benchmarks/bench_fleet.py --targets 2000 --count 50 --workers 1 2 4
+"""
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from engine import FakeTransport, ProbeEngine
+from fleet import Fleet
+from monitor import DEFAULTS, TARGET_DEFAULTS
+from storage import ResultStorage
+
+
+def make_config(targets, count):
+    return {**DEFAULTS, 'max_in_flight': 1024, 'targets': [
+        {**TARGET_DEFAULTS, 'host': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+         'name': f"target-{i}", 'count': count, 'probe_interval': 0.0}
+        for i in range(targets)
+    ]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', type=int, default=2000)
+    parser.add_argument('--count', type=int, default=50, help='Probes per target per round')
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--workers', type=int, nargs='*', default=None)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, 2, 4, cores})
+    config = make_config(args.targets, args.count)
+    probes = args.targets * args.count * args.rounds
+    transport = functools.partial(FakeTransport, latency_ms=20, jitter_ms=5, loss=0.01, seed=1, sleep=False)
+
+    # مبنا: یک موتور در همین پروسس بدون ذخیره‌سازی
+    engine = ProbeEngine(transport=transport(), max_in_flight=1024)
+    t0 = time.perf_counter()
+    engine.run_sync([t['host'] for t in config['targets']], count=args.count, interval=0)
+    baseline = args.targets * args.count / (time.perf_counter() - t0)
+    print(f"single process, no storage: {baseline:>12,.0f} probes/s")
+
+    single = None
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as data_dir:
+            storage = ResultStorage(data_dir=data_dir)
+            fleet = Fleet(config, workers=workers, storage=storage, transport_factory=transport)
+            elapsed = fleet.run(rounds=args.rounds)
+            fleet.close()
+            assert fleet.results == args.targets * args.rounds, fleet.results
+        rate = probes / elapsed
+        single = single or rate
+        note = '' if workers <= cores else f'  (only {cores} core(s) available)'
+        print(f"{workers:>2} worker(s): {rate:>12,.0f} probes/s  speedup {rate / single:4.2f}x  "
+              f"efficiency {rate / single / workers:4.0%}  batches {fleet.batches}{note}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: live chart update cost, per-sample redraws vs batched blitting.
+
+Runs headless on the Agg backend. Simulates `targets` hosts that each
+stream `rate` samples per second. It compares redrawing the whole figure
+for every sample (one Tk update per message) with LiveChart's approach:
+one blitted redraw per frame at a capped frame rate.
+
+    python benchmarks/bench_gui.py --targets 20 --rate 50 --seconds 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from live_chart import LiveChart
+
+
+def make_chart():
+    figure = Figure(figsize=(5, 5), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    return LiveChart(figure, canvas)
+
+
+def sample_stream(targets, rate, seconds, seed=0):
+    """Synthetic (t, target, delay) samples in time order."""
+    rng = np.random.default_rng(seed)
+    n = int(rate * seconds)
+    for i in range(n):
+        t = i / rate
+        for k in range(targets):
+            delay = None if rng.random() < 0.02 else float(rng.lognormal(3.3, 0.3))
+            yield t, f"host-{k}", delay
+
+
+def run_per_sample(targets, rate, seconds, budget):
+    """Old behaviour: every sample triggers its own full redraw."""
+    chart = make_chart()
+    updates = 0
+    t0 = time.perf_counter()
+    for t, target, delay in sample_stream(targets, rate, seconds):
+        chart.push(target, delay, t=t)
+        chart._needs_full_draw = True
+        chart.draw_frame(now=t)
+        updates += 1
+        if time.perf_counter() - t0 > budget:
+            break
+    elapsed = time.perf_counter() - t0
+    return updates, elapsed
+
+
+def run_batched(targets, rate, seconds, fps):
+    """LiveChart: samples are queued and drawn once per frame with blitting."""
+    chart = make_chart()
+    frame_period = 1.0 / fps
+    next_frame = frame_period
+    frames = samples = 0
+    t0 = time.perf_counter()
+    for t, target, delay in sample_stream(targets, rate, seconds):
+        if t >= next_frame:
+            chart.draw_frame(now=t)
+            frames += 1
+            next_frame += frame_period
+        chart.push(target, delay, t=t)
+        samples += 1
+    chart.draw_frame(now=seconds)
+    frames += 1
+    return samples, frames, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--targets', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=50, help='samples per second per target')
+    parser.add_argument('--seconds', type=float, default=5, help='simulated stream length')
+    parser.add_argument('--fps', type=float, default=20)
+    args = parser.parse_args()
+
+    total = int(args.rate * args.seconds) * args.targets
+    print(f"{args.targets} targets x {args.rate:g} samples/s for {args.seconds:g} s "
+          f"= {total:,} samples")
+
+    samples, frames, elapsed = run_batched(args.targets, args.rate, args.seconds, args.fps)
+    print(f"  batched : {frames} frames, {elapsed:.2f} s of drawing for {args.seconds:g} s of data "
+          f"({elapsed / frames * 1000:.1f} ms/frame, GUI load {elapsed / args.seconds:.0%})")
+
+    updates, elapsed = run_per_sample(args.targets, args.rate, args.seconds, budget=10.0)
+    per_update = elapsed / updates
+    needed = per_update * total
+    print(f"  per-msg : {updates} redraws in {elapsed:.2f} s ({per_update * 1000:.1f} ms/redraw); "
+          f"full stream would need {needed:.0f} s of drawing (GUI load {needed / args.seconds:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: GUI history startup cost as the result history grows.
+
+Builds synthetic append-only result logs of increasing size and measures
+what NetSpectorApp.load_history does at startup (open ResultStorage and
+read the last 10 results), alongside a full load_results() for reference.
+
+    python benchmarks/bench_history.py --sizes 10000 100000 1000000 2000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from storage import ResultStorage
+
+RECORD = ('{{"timestamp": "{ts}", "connection_name": "conn-{c}", '
+          '"ping": {{"avg_latency": {lat:.3f}, "min_latency": 10.0, "max_latency": 90.0, '
+          '"jitter": 4.2, "packet_loss": 0.0}}, '
+          '"speed": {{"download_speed": 12.5, "upload_speed": 3.1}}}}\n')
+
+
+def build_history(data_dir, size, connections=8):
+    """Write `size` synthetic results into a single log segment."""
+    log_dir = os.path.join(data_dir, 'results_log')
+    os.makedirs(log_dir, exist_ok=True)
+    start = datetime(2024, 1, 1)
+    with open(os.path.join(log_dir, '0000000000001-bench.jsonl'), 'w', encoding='utf-8') as f:
+        batch = []
+        for i in range(size):
+            ts = (start + timedelta(seconds=30 * i)).isoformat()
+            batch.append(RECORD.format(ts=ts, c=i % connections, lat=20 + (i % 97)))
+            if len(batch) == 10000:
+                f.writelines(batch)
+                batch.clear()
+        f.writelines(batch)
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--full-load-max', type=int, default=100_000,
+                        help='skip the full load_results() reference above this size')
+    args = parser.parse_args()
+
+    print(f"{'records':>10} {'startup ms':>11} {'peak KiB':>9} {'full load ms':>13} {'peak MiB':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            build_history(data_dir, size)
+
+            def startup():
+                return ResultStorage(data_dir).tail(10)
+
+            rows, elapsed, peak = measure(startup)
+            assert len(rows) == min(10, size)
+
+            full = ''
+            if size <= args.full_load_max:
+                records, full_elapsed, full_peak = measure(lambda: ResultStorage(data_dir).load_results())
+                assert len(records) == size
+                full = f"{full_elapsed * 1000:13.1f} {full_peak / 2**20:9.1f}"
+            print(f"{size:>10} {elapsed * 1000:11.2f} {peak / 1024:9.1f} {full}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark: ICMP probe rate and RTT spread on loopback, ping3 vs the shared-socket engine.
+
+ping3 opens a socket per packet and times RTT in user space, from a thread pool.
+IcmpTransport keeps one socket, matches replies by sequence number and uses
+kernel receive timestamps. Needs root/CAP_NET_RAW, or a gid inside
+net.ipv4.ping_group_range.
+
+    python benchmarks/bench_icmp.py --count 2000 --in-flight 256
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from engine import Ping3Transport, ProbeEngine
+from icmp import IcmpTransport
+
+
+def run(name, transport, targets, count, in_flight):
+    engine = ProbeEngine(transport=transport, max_in_flight=in_flight, timeout=1.0)
+    t0 = time.perf_counter()
+    results = engine.run_sync(targets, count=count, interval=0)
+    elapsed = time.perf_counter() - t0
+    engine.close()
+    probes = len(targets) * count
+    for target, r in results.items():
+        print(f"{name:<6} {target:<10} avg {r['avg_latency']:.3f} ms  stdev {r['jitter']:.3f} ms  "
+              f"p99 {r['p99_latency']:.3f} ms  loss {r['packet_loss']:.1f}%")
+    print(f"{name:<6} {probes} probes in {elapsed:.2f} s -> {probes / elapsed:,.0f} probes/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=2000, help='Probes per target')
+    parser.add_argument('--in-flight', type=int, default=256)
+    parser.add_argument('--targets', nargs='*', default=['127.0.0.1', 'localhost'])
+    args = parser.parse_args()
+
+    icmp = IcmpTransport()
+    print(f"IcmpTransport mode: {icmp.mode}")
+    run('icmp', icmp, args.targets, args.count, args.in_flight)
+    run('ping3', Ping3Transport(max_workers=min(args.in_flight, 64)), args.targets,
+        max(1, args.count // 10), args.in_flight)
+
+
+if __name__ == '__main__':
+    main()
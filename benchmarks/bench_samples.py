@@ -0,0 +1,98 @@
+"""
+Benchmark: raw sample store, covering append throughput and mmap time-window slicing.
+
+1. Appends --append samples through SampleStore.record, the on_sample path
+   that live probing uses.
+2. Writes --size synthetic samples as segments. numpy writes them directly,
+   using the same header and record layout. The samples cover 1000 targets at
+   one sample per target every 10 s, spread over several segments.
+3. Slices time windows of different widths. It reports latency and RSS growth,
+   and compares the file size with the same samples stored as JSON lines.
+
+    python benchmarks/bench_samples.py --size 100000000
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from samples import HEADER, MAGIC, RECORD, VERSION, SampleStore, sample_dtype, target_id
+
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def write_synthetic(directory, size, segments=8, targets=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    dtype = sample_dtype()
+    start = time.time() - size / targets * 10
+    per_segment = -(-size // segments)
+    ids = np.array([target_id(f"10.0.{i // 256}.{i % 256}") for i in range(targets)], dtype='<u4')
+    for s in range(segments):
+        n = min(per_segment, size - s * per_segment)
+        first = s * per_segment
+        records = np.empty(n, dtype=dtype)
+        index = np.arange(first, first + n)
+        records['timestamp'] = start + index / targets * 10
+        records['target'] = ids[index % targets]
+        records['rtt'] = rng.lognormal(3.0, 0.4, n).astype('<f4')
+        lost = rng.random(n) < 0.01
+        records['rtt'][lost] = np.nan
+        records['status'] = lost.astype('u1')
+        name = f"{int(records['timestamp'][0] * 1000):013d}-0-{s:08x}.bin"
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            records.tofile(f)
+    return start, start + size / targets * 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=50_000_000, help='Synthetic samples to slice')
+    parser.add_argument('--append', type=int, default=1_000_000, help='Samples to append via record()')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SampleStore(os.path.join(directory, 'live'))
+        t0 = time.perf_counter()
+        for i in range(args.append):
+            store.record('127.0.0.1', i, 12.5 if i % 100 else None, None)
+        store.close()
+        elapsed = time.perf_counter() - t0
+        print(f"append: {args.append / elapsed:,.0f} samples/s via record()")
+
+        bulk = os.path.join(directory, 'bulk')
+        os.makedirs(bulk)
+        first, last = write_synthetic(bulk, args.size)
+        store = SampleStore(bulk)
+        total = sum(os.path.getsize(p) for p in store.segments())
+        json_line = json.dumps({'timestamp': '2026-01-01T00:00:00.000000', 'target': '10.0.0.1',
+                                'rtt': 20.123456, 'status': 'ok'})
+        print(f"store: {args.size:,} samples, {total / 2**20:,.0f} MiB on disk "
+              f"(~{args.size * (len(json_line) + 1) / 2**20:,.0f} MiB as JSON lines)")
+
+        base = rss_mb()
+        middle = (first + last) / 2
+        for width in (60, 3600, 86400):
+            t0 = time.perf_counter()
+            records = store.window(middle, middle + width)
+            elapsed = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            one = store.window(middle, middle + width, target='10.0.0.1')
+            filtered = (time.perf_counter() - t0) * 1000
+            print(f"window {width:>6} s: {len(records):>10,} samples in {elapsed:7.2f} ms "
+                  f"(view: {not records.flags.owndata}), one target {len(one):>7,} in {filtered:7.2f} ms, "
+                  f"RSS +{rss_mb() - base:.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup budget check for the CLI's ping and history paths.
+
+Runs `main.py` subcommands in fresh interpreters with `-X importtime`,
+sums the import time of everything they load, and exits non-zero if a
+path goes over its budget or imports a module it should not need.
+tests/test_startup.py runs the same check under pytest.
+
+    python benchmarks/bench_startup.py            # check budgets
+    python benchmarks/bench_startup.py --report   # also list the slowest imports
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Heavy modules that the fast paths must not load
+FORBIDDEN = ('speedtest', 'matplotlib', 'pandas', 'numpy', 'tkinter')
+
+# Import-time budgets (ms) of the fast paths
+PING_BUDGET_MS = 250.0
+HISTORY_BUDGET_MS = 120.0
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_importtime(args, cwd):
+    proc = subprocess.run([sys.executable, '-X', 'importtime', os.path.join(SRC, 'main.py'), *args],
+                          cwd=cwd, capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        raise RuntimeError(f"main.py {' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    imports = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def startup_paths(data_dir, ping_target='127.0.0.1'):
+    """{label: main.py arguments} of the paths that have a startup budget."""
+    return {
+        'ping': ['ping', ping_target, '-c', '1', '-i', '0', '--data-dir', data_dir],
+        'history': ['history', '-n', '10', '--data-dir', data_dir],
+    }
+
+
+def measure(cli_args, cwd=SRC):
+    """Returns (total self import time in ms, sorted forbidden modules loaded, imports)."""
+    imports = run_importtime(cli_args, cwd=cwd)
+    total_ms = sum(self_us for _, self_us, _, _ in imports) / 1000
+    loaded = {name.split('.')[0] for name, _, _, _ in imports}
+    return total_ms, sorted(loaded.intersection(FORBIDDEN)), imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ping-budget-ms', type=float, default=PING_BUDGET_MS)
+    parser.add_argument('--history-budget-ms', type=float, default=HISTORY_BUDGET_MS)
+    parser.add_argument('--ping-target', default='127.0.0.1')
+    parser.add_argument('--report', action='store_true')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        budgets = {'ping': args.ping_budget_ms, 'history': args.history_budget_ms}
+        for label, cli_args in startup_paths(data_dir, args.ping_target).items():
+            budget = budgets[label]
+            total_ms, bad, imports = measure(cli_args)
+            status = 'ok' if total_ms <= budget and not bad else 'FAIL'
+            print(f"{label:<8} imports {total_ms:7.1f} ms (budget {budget:.0f} ms) {status}")
+            if bad:
+                print(f"         unexpected heavy imports: {', '.join(bad)}")
+            if status != 'ok':
+                failures.append(label)
+            if args.report:
+                top = sorted((i for i in imports if i[3] == 0), key=lambda i: -i[2])[:8]
+                for name, _, cumulative_us, _ in top:
+                    print(f"         {cumulative_us / 1000:7.1f} ms  {name}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""
+Offline benchmark suite with machine-readable baselines and a regression gate.
+
+No case touches the network. The suite uses synthetic result histories, and
+FakeTransport and FakeSpeedTarget stand in for the ping and speed tests.
+Every metric carries a unit and says whether higher or lower is better, so
+a later run can be compared with a saved baseline.
+
+Cases:
+  save      save_result / save_batch throughput and peak memory per backend
+  load      load_results throughput and peak memory on histories of --sizes records.
+            Above --full-load-max, streaming iter_results is measured instead.
+            tail(10) is measured at every size.
+  stats     LatencyStats.add per sample and result() with percentiles
+  schedule  ProbeEngine multi-target scheduling, CPU-bound probes/s and the
+            timing overhead with simulated latency
+  fulltest  NetworkTester ping + speed test + BufferedResultWriter, end to end
+  history   NetSpectorApp.load_history as run at GUI startup. This uses a real
+            Tk treeview when a display is available and a headless one otherwise.
+
+    python benchmarks/bench_suite.py --save              # record the baseline
+    python benchmarks/bench_suite.py --compare           # exit 1 on regressions above --threshold
+    python benchmarks/bench_suite.py --cases load history --sizes 10000 100000 1000000 10000000
+
+The committed baseline is benchmarks/baselines/baseline.json, recorded with the
+default sizes. It is shared by every host. Each run also times a fixed
+pure-Python calibration workload, and --compare divides every timing and
+throughput metric by the calibration ratio of the two runs. A baseline from a
+slower or faster machine therefore still gates regressions. Memory metrics are
+compared as they are. History metrics are compared only when both runs used
+the same kind of treeview (Tk or headless). Re-record the baseline with --save
+whenever the numbers move on purpose. Sizes that are missing from the baseline
+show up as "new".
+"""
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+
+from bench_history import build_history
+from engine import FakeTransport, ProbeEngine
+from speed import FakeSpeedTarget
+from stats import LatencyStats
+from storage import ResultStorage
+
+DEFAULT_BASELINE = os.path.join(HERE, 'baselines', 'baseline.json')
+PING = {'avg_latency': 21.5, 'min_latency': 10.0, 'max_latency': 90.0, 'jitter': 4.2, 'packet_loss': 0.0,
+        'p50_latency': 20.0, 'p95_latency': 40.0, 'p99_latency': 80.0, 'rfc3550_jitter': 2.1}
+SPEED = {'download_speed': 12.5, 'upload_speed': 3.1}
+
+
+class Results:
+    """Collects metrics as {name: {value, unit, better, min_delta}}."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.environment = {}
+
+    def add(self, name, value, unit, better, min_delta=0.0):
+        self.metrics[name] = {'value': value, 'unit': unit, 'better': better, 'min_delta': min_delta}
+        print(f"  {name:<48} {value:>14,.2f} {unit}")
+
+    def rate(self, name, count, seconds, unit='records/s'):
+        self.add(name, count / seconds, unit, 'higher')
+
+    def millis(self, name, seconds):
+        # tiny timings jitter by fractions of a millisecond between runs
+        self.add(name, seconds * 1000, 'ms', 'lower', min_delta=0.5)
+
+    def memory(self, name, peak_bytes):
+        self.add(name, peak_bytes / 2**20, 'MiB', 'lower', min_delta=0.25)
+
+
+def calibrate(repeat=5):
+    """
+    Fastest time in ms of a fixed workload of dict building, JSON round trips and sorting.
+
+    It is close to what the storage and statistics cases do, so the ratio between
+    two hosts approximates how their timings should differ.
+    """
+    def workload():
+        rows = [{'timestamp': f'2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}', 'value': i * 0.5}
+                for i in range(20_000)]
+        rows = [json.loads(json.dumps(row)) for row in rows]
+        rows.sort(key=lambda row: (row['value'] % 7, row['timestamp']))
+        return sum(row['value'] for row in rows)
+
+    return best_of(workload, repeat)[1] * 1000
+
+
+def best_of(fn, repeat=3):
+    """Returns (result of the last run, fastest wall time)."""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def peak_memory(fn):
+    """Peak Python allocation of fn() in bytes (run separately from timing; tracemalloc slows code down)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Histories:
+    """Synthetic result logs, built once per size and shared by the cases."""
+
+    def __init__(self, root):
+        self.root = root
+        self._built = {}
+
+    def get(self, size):
+        if size not in self._built:
+            data_dir = os.path.join(self.root, f'history-{size}')
+            t0 = time.perf_counter()
+            build_history(data_dir, size)
+            print(f"  (built {size:,} record history in {time.perf_counter() - t0:.1f} s)")
+            self._built[size] = data_dir
+        return self._built[size]
+
+
+def open_storage(data_dir, backend='log'):
+    return ResultStorage(data_dir=data_dir, backend=backend, record_samples=False)
+
+
+def case_save(results, args, histories):
+    count = args.save_records
+    for backend in ('log', 'sqlite'):
+        def save_results():
+            with tempfile.TemporaryDirectory() as data_dir:
+                storage = open_storage(data_dir, backend)
+                for i in range(count):
+                    storage.save_result(f'conn-{i % 8}', PING, SPEED)
+                storage.close()
+
+        def save_batches():
+            with tempfile.TemporaryDirectory() as data_dir:
+                storage = open_storage(data_dir, backend)
+                now = datetime.now()
+                for start in range(0, count, 256):
+                    storage.save_batch((f'conn-{i % 8}', PING, SPEED, 'icmp', now)
+                                       for i in range(start, min(count, start + 256)))
+                storage.close()
+
+        _, elapsed = best_of(save_results)
+        results.rate(f'save.save_result[{backend}]', count, elapsed)
+        _, elapsed = best_of(save_batches)
+        results.rate(f'save.save_batch[{backend}]', count, elapsed)
+        results.memory(f'save.save_result[{backend}].peak', peak_memory(save_results))
+
+
+def case_load(results, args, histories):
+    for size in args.sizes:
+        data_dir = histories.get(size)
+        if size <= args.full_load_max:
+            def load():
+                with contextlib.closing(open_storage(data_dir)) as storage:
+                    return storage.load_results()
+            name = f'load.load_results[{size}]'
+        else:
+            def load():
+                with contextlib.closing(open_storage(data_dir)) as storage:
+                    return sum(1 for _ in storage.iter_results())
+            name = f'load.iter_results[{size}]'
+        loaded, elapsed = best_of(load, repeat=1 if size >= 1_000_000 else 3)
+        assert (loaded if isinstance(loaded, int) else len(loaded)) == size
+        del loaded
+        results.rate(name, size, elapsed)
+        if size > args.full_load_max:
+            # streaming memory does not grow with the history; trace a prefix to keep the run short
+            def load():
+                with contextlib.closing(open_storage(data_dir)) as storage:
+                    return sum(1 for _ in itertools.islice(storage.iter_results(), args.full_load_max))
+        results.memory(f'{name}.peak', peak_memory(load))
+
+        def tail():
+            with contextlib.closing(open_storage(data_dir)) as storage:
+                return storage.tail(10)
+        _, elapsed = best_of(tail)
+        results.millis(f'load.tail[{size}]', elapsed)
+
+
+def case_stats(results, args, histories):
+    import random
+    rng = random.Random(0)
+    samples = [rng.lognormvariate(3.0, 0.4) for _ in range(args.stats_samples)]
+
+    def add_all():
+        stats = LatencyStats()
+        for delay in samples:
+            stats.add(delay)
+        return stats
+
+    stats, elapsed = best_of(add_all)
+    results.add('stats.add', elapsed / len(samples) * 1e9, 'ns/sample', 'lower')
+    _, elapsed = best_of(stats.result)
+    results.millis('stats.result', elapsed)
+
+
+def case_schedule(results, args, histories):
+    hosts = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.targets)]
+
+    def cpu_bound():
+        engine = ProbeEngine(transport=FakeTransport(latency_ms=20, jitter_ms=5, loss=0.01, seed=1, sleep=False),
+                             max_in_flight=1024)
+        return engine.run_sync(hosts, count=50, interval=0)
+
+    _, elapsed = best_of(cpu_bound)
+    results.rate(f'schedule.cpu[{args.targets}x50]', args.targets * 50, elapsed, unit='probes/s')
+
+    # with real sleeps the ideal duration is the last send time plus one RTT
+    count, interval, latency = 20, 0.05, 5.0
+
+    def timed():
+        engine = ProbeEngine(transport=FakeTransport(latency_ms=latency, seed=1), max_in_flight=1024)
+        return engine.run_sync(hosts[:200], count=count, interval=interval)
+
+    _, elapsed = best_of(timed)
+    ideal = (count - 1) * interval + latency / 1000
+    results.millis('schedule.timed[200x20].overhead', elapsed - ideal)
+
+
+def case_fulltest(results, args, histories):
+    from tester import NetworkTester
+    from writer import BufferedResultWriter
+
+    tests = 200
+
+    def run_tests():
+        with tempfile.TemporaryDirectory() as data_dir:
+            storage = open_storage(data_dir)
+            writer = BufferedResultWriter(storage)
+            tester = NetworkTester('10.0.0.1', transport=FakeTransport(latency_ms=20, jitter_ms=5, seed=1, sleep=False),
+                                   speed_target=FakeSpeedTarget(seed=1))
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(tests):
+                    ping = tester.run_ping_test(count=10, interval=0)
+                    speed = tester.run_speed_test()
+                    writer.save_result('Bench', ping, speed, probe_type=tester.probe_type)
+                writer.close()
+            storage.close()
+
+    _, elapsed = best_of(run_tests)
+    results.rate('fulltest.ping_speed_save', tests, elapsed, unit='tests/s')
+
+
+class HeadlessTree:
+    """Minimal ttk.Treeview stand-in (used only when no display is available)."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get_children(self):
+        return list(self.rows)
+
+    def delete(self, item):
+        del self.rows[item]
+
+    def insert(self, parent, index, values):
+        item = f'I{len(self.rows):03d}'
+        self.rows[item] = values
+        return item
+
+
+def make_tree():
+    """Returns (treeview, kind, cleanup)."""
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception:
+        return HeadlessTree(), 'headless', lambda: None
+    root.withdraw()
+    return ttk.Treeview(root, columns=('a', 'b', 'c', 'd', 'e'), show='headings'), 'tk', root.destroy
+
+
+def case_history(results, args, histories):
+    from gui import NetSpectorApp
+
+    tree, kind, cleanup = make_tree()
+    results.environment['treeview'] = kind
+    try:
+        for size in args.sizes:
+            data_dir = histories.get(size)
+
+            def startup():
+                # what NetSpectorApp.__init__ does before the window shows: open storage, fill the history table
+                app = SimpleNamespace(storage=open_storage(data_dir), history_tree=tree)
+                with contextlib.closing(app.storage):
+                    NetSpectorApp.load_history(app)
+                if kind == 'tk':
+                    tree.update_idletasks()
+                return app
+
+            app, elapsed = best_of(startup)
+            assert len(tree.get_children()) == min(10, size)
+            results.millis(f'history.load_history[{size}]', elapsed)
+    finally:
+        cleanup()
+
+
+CASES = {
+    'save': case_save,
+    'load': case_load,
+    'stats': case_stats,
+    'schedule': case_schedule,
+    'fulltest': case_fulltest,
+    'history': case_history,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# metric prefixes whose value depends on an environment key; compared only when the key matches
+DEPENDS_ON = {'history.': 'treeview'}
+UNSCALED_UNITS = {'MiB'}
+
+
+def compare(baseline, metrics, environment, threshold):
+    """Prints a comparison table. Returns the names of regressed metrics."""
+    regressions = []
+    speed = 1.0
+    if baseline.get('calibration_ms') and environment.get('calibration_ms'):
+        # > 1 when this host is slower than the one that recorded the baseline
+        speed = environment['calibration_ms'] / baseline['calibration_ms']
+    print(f"\nComparison with baseline {baseline.get('commit') or '?'} "
+          f"({baseline.get('created', '?')}), threshold {threshold:.0%}, "
+          f"timings normalized by host speed x{speed:.2f}:")
+    if baseline.get('cpus') != environment.get('cpus'):
+        print(f"  note: baseline host had {baseline.get('cpus')} CPUs, this one has {environment.get('cpus')}")
+    for name, current in metrics.items():
+        base = baseline['metrics'].get(name)
+        if base is None:
+            print(f"  {name:<48} {'new':>10}")
+            continue
+        key = next((key for prefix, key in DEPENDS_ON.items() if name.startswith(prefix)), None)
+        if key is not None and baseline.get(key) != environment.get(key):
+            print(f"  {name:<48} {'skipped':>10} ({key} {baseline.get(key)} -> {environment.get(key)})")
+            continue
+        old, new = base['value'], current['value']
+        if current['unit'] not in UNSCALED_UNITS:
+            new = new * speed if current['better'] == 'higher' else new / speed
+        change = (new - old) / old if old else 0.0
+        worse = new < old if current['better'] == 'higher' else new > old
+        status = 'ok'
+        if abs(new - old) > current.get('min_delta', 0.0) and abs(change) > threshold:
+            status = 'REGRESSION' if worse else 'improved'
+        if status == 'REGRESSION':
+            regressions.append(name)
+        print(f"  {name:<48} {old:>12,.2f} -> {new:>12,.2f} {current['unit']:<10} {change:>+7.1%}  {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='History sizes for the load and history cases')
+    parser.add_argument('--full-load-max', type=int, default=1_000_000,
+                        help='Above this size measure streaming iter_results instead of load_results')
+    parser.add_argument('--save-records', type=int, default=20_000)
+    parser.add_argument('--stats-samples', type=int, default=1_000_000)
+    parser.add_argument('--targets', type=int, default=1000, help='Targets for the schedule case')
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help=f'Write the results as a baseline (default: {os.path.relpath(DEFAULT_BASELINE)})')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help='Compare with a saved baseline and exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Relative change that counts as a regression (default: 0.25)')
+    args = parser.parse_args()
+    if args.compare and not os.path.exists(args.compare):
+        sys.exit(f"Baseline {args.compare} not found. Record one with "
+                 f"'python benchmarks/bench_suite.py --save {args.compare}'.")
+
+    results = Results()
+    results.environment.update({
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'calibration_ms': calibrate(),
+    })
+    print(f"[calibration] {results.environment['calibration_ms']:.1f} ms")
+    with tempfile.TemporaryDirectory() as root:
+        histories = Histories(root)
+        for name in args.cases:
+            print(f"[{name}]")
+            CASES[name](results, args, histories)
+
+    failed = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            failed = compare(json.load(f), results.metrics, results.environment, args.threshold)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({**results.environment, 'version': 1, 'metrics': results.metrics}, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+    if failed:
+        print(f"\n{len(failed)} regression(s): {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
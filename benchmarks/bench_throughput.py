@@ -0,0 +1,55 @@
+"""
+Benchmark: loopback throughput of the built-in server/client.
+
+Starts a ThroughputServer on 127.0.0.1 and measures download and upload with
+1 and N parallel streams, plus a rate-limited UDP run. It fails (exit 1) if
+the best TCP rate stays below --min-gbps. That would mean Python overhead,
+not the network, is capping the measurement.
+
+    python benchmarks/bench_throughput.py --streams 4 --duration 3
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from throughput import ThroughputClient, ThroughputServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--udp-mbps', type=float, default=200.0)
+    parser.add_argument('--min-gbps', type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = ThroughputServer('127.0.0.1', 0).start()
+    best = 0.0
+    try:
+        for streams in sorted({1, args.streams}):
+            client = ThroughputClient('127.0.0.1', server.port, streams=streams,
+                                      duration=args.duration, interval=1.0)
+            for direction in ('download', 'upload'):
+                result = getattr(client, direction)()
+                best = max(best, result['bps'])
+                intervals = ' '.join(f"{bps / 1e9:.1f}" for bps in result['interval_bps'])
+                print(f"{direction:<8} {streams} stream(s): {result['bps'] / 1e9:6.2f} Gbit/s "
+                      f"(per-interval Gbit/s: {intervals})")
+
+        client = ThroughputClient('127.0.0.1', server.port, duration=args.duration)
+        udp = client.udp_upload(bitrate=args.udp_mbps * 1e6)
+        print(f"udp      target {args.udp_mbps:.0f} Mbit/s: {udp['bps'] / 1e6:6.1f} Mbit/s, "
+              f"loss {udp['packet_loss']:.2f}% ({udp['packets']}/{udp['sent']} packets)")
+    finally:
+        server.shutdown()
+
+    if best < args.min_gbps * 1e9:
+        print(f"FAIL: best TCP rate {best / 1e9:.2f} Gbit/s below {args.min_gbps} Gbit/s")
+        sys.exit(1)
+    print(f"OK: best TCP rate {best / 1e9:.2f} Gbit/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import math
+
+# دلیل‌هایی که نمونه‌برداری را متراکم می‌کنند
+TRIGGERS = ('variance', 'loss', 'change')
+
+
+class ProbeBudget:
+    """
+    سقف سراسری تعداد پروب در ثانیه (token bucket) که بین همه مقصدها مشترک است.
+
+    ساعت از بیرون داده می‌شود (loop.time() در موتور، زمان شبیه‌سازی در بنچمارک)،
+    پس همین کلاس در اجرای واقعی و بازپخش trace یکسان رفتار می‌کند.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate (float): حداکثر میانگین پروب در ثانیه.
+            burst (float): حداکثر پروب پشت سر هم. پیش‌فرض یک ثانیه (rate).
+        """
+        if rate <= 0:
+            raise ValueError("Probe budget must be positive")
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._updated = None
+
+    def _refill(self, now):
+        if self._updated is not None:
+            # ساعتی که عقب برود (مثلاً ترتیب رویدادها در بازپخش) token کم نمی‌کند
+            self._tokens = min(self.burst, self._tokens + max(0.0, now - self._updated) * self.rate)
+        self._updated = now if self._updated is None else max(self._updated, now)
+
+    def try_take(self, now):
+        """اگر token موجود باشد آن را برمی‌دارد. Returns: bool."""
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def reserve(self, now):
+        """
+        یک token رزرو می‌کند، حتی اگر هنوز پر نشده باشد.
+
+        Returns:
+            float: چند ثانیه باید صبر کرد تا پروب در سقف بماند (۰ یعنی همین حالا).
+        """
+        self._refill(now)
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptiveSampler:
+    """
+    کنترل‌کننده نرخ پروب برای یک مقصد.
+
+    تا وقتی تاخیر و loss پایدارند، فاصله پروب‌ها هر بار backoff برابر می‌شود تا به
+    max_interval برسد. با یکی از این رخدادها فاصله فوراً به min_interval برمی‌گردد و حداقل
+    hold پروب متراکم می‌ماند:
+
+    - variance: نمونه‌ای بیش از z_threshold انحراف معیار از میانگین نمایی فاصله دارد؛
+    - loss: پروب بی‌پاسخ ماند (timeout یا خطا)؛
+    - change: آشکارساز CUSUM دوطرفه روی باقیمانده‌های نرمال‌شده، تغییر پایدار سطح تاخیر را
+      دید (بعد از آن مبنا از نو یاد گرفته می‌شود).
+
+    وضعیت بین دورهای یک مقصد حفظ می‌شود، پس در monitor یک نمونه برای هر مقصد نگه داشته می‌شود.
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=5.0, backoff=1.5, hold=10, alpha=0.1,
+                 z_threshold=4.0, cusum_drift=0.5, cusum_threshold=8.0, warmup=5):
+        """
+        Args:
+            min_interval (float): فاصله پروب‌ها در حالت متراکم (ثانیه).
+            max_interval (float): بیشترین فاصله در حالت پایدار (ثانیه).
+            backoff (float): ضریب افزایش فاصله بعد از هر نمونه پایدار.
+            hold (int): تعداد پروب متراکم بعد از هر رخداد.
+            alpha (float): ضریب میانگین و واریانس نمایی مبنا.
+            z_threshold (float): آستانه انحراف یک نمونه برای رخداد variance.
+            cusum_drift (float), cusum_threshold (float): پارامترهای k و h آشکارساز CUSUM.
+            warmup (int): تعداد نمونه متراکم برای یاد گرفتن مبنا.
+        """
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Adaptive sampling needs 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.hold = hold
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.cusum_drift = cusum_drift
+        self.cusum_threshold = cusum_threshold
+        self.warmup = warmup
+        self.interval = min_interval
+        self._hold_left = 0
+        self._seen = 0
+        self._mean = 0.0
+        self._var = 0.0
+        self._cusum_high = 0.0
+        self._cusum_low = 0.0
+
+    @property
+    def dense(self):
+        """آیا مقصد الان در حالت متراکم (یادگیری یا بعد از رخداد) است."""
+        return self._seen < self.warmup or self._hold_left > 0 or self.interval <= self.min_interval
+
+    def _learn(self, delay):
+        if self._seen == 0:
+            self._mean = delay
+        diff = delay - self._mean
+        self._mean += self.alpha * diff
+        self._var = (1 - self.alpha) * (self._var + self.alpha * diff * diff)
+
+    def _check(self, delay):
+        # کف انحراف معیار تا روی لینک‌های خیلی پایدار هر نوسان کوچک رخداد نشود
+        scale = max(math.sqrt(self._var), 0.05 * self._mean, 0.1)
+        z = (delay - self._mean) / scale
+        # سهم هر نمونه در CUSUM به z_threshold محدود است تا یک نمونه پرت به تنهایی «تغییر سطح»
+        # حساب نشود (و مبنا را به مقدار پرت نبرد)؛ آن نمونه رخداد variance است
+        clipped = max(-self.z_threshold, min(self.z_threshold, z))
+        self._cusum_high = max(0.0, self._cusum_high + clipped - self.cusum_drift)
+        self._cusum_low = max(0.0, self._cusum_low - clipped - self.cusum_drift)
+        if self._cusum_high > self.cusum_threshold or self._cusum_low > self.cusum_threshold:
+            # سطح جدید: مبنا از نمونه فعلی دوباره شروع می‌شود
+            self._cusum_high = self._cusum_low = 0.0
+            self._mean = delay
+            return 'change'
+        if abs(z) > self.z_threshold:
+            return 'variance'
+        return None
+
+    def observe(self, delay):
+        """
+        نتیجه یک پروب را ثبت کرده و فاصله پروب بعدی (self.interval) را تنظیم می‌کند.
+
+        Args:
+            delay (float | None): RTT به میلی‌ثانیه یا None برای پروب بی‌پاسخ.
+
+        Returns:
+            str | None: دلیل متراکم شدن ('variance'، 'loss' یا 'change') یا None.
+        """
+        reason = None
+        if delay is None:
+            reason = 'loss'
+        else:
+            if self._seen >= self.warmup:
+                reason = self._check(delay)
+            if reason != 'variance':
+                # نمونه‌های پرت مبنا را جابه‌جا نمی‌کنند
+                self._learn(delay)
+            self._seen += 1
+        if reason is not None:
+            self.interval = self.min_interval
+            self._hold_left = self.hold
+        elif self._hold_left > 0 or self._seen < self.warmup:
+            self._hold_left = max(0, self._hold_left - 1)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return reason
@@ -0,0 +1,185 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from rollup import Rollup, results_to_frame, rows_to_frame
+
+METRICS = ['avg_latency', 'packet_loss', 'download_speed', 'upload_speed']
+
+
+def load_frame(storage, connection_name=None, start=None, end=None, chunksize=100_000):
+    """
+    تاریخچه نتایج را به صورت تکه‌تکه از ResultStorage خوانده و یک DataFrame ستونی می‌سازد.
+
+    هر تکه جداگانه به ستون‌های numpy تبدیل می‌شود، پس حافظه موقت به اندازه یک تکه است
+    نه کل تاریخچه به صورت دیکشنری.
+
+    Returns:
+        pd.DataFrame: مرتب بر اساس timestamp (ستون‌های results_to_frame).
+    """
+    records = storage.iter_results(connection_name, start, end)
+    chunks = []
+    while True:
+        chunk = list(itertools.islice(records, chunksize))
+        if not chunk:
+            break
+        chunks.append(results_to_frame(chunk))
+    if not chunks:
+        return results_to_frame([])
+    frame = pd.concat(chunks, ignore_index=True)
+    frame['connection_name'] = frame['connection_name'].astype('category')
+    return frame.sort_values('timestamp', kind='stable', ignore_index=True)
+
+
+def load_history(storage, connection_name=None, start=None):
+    """
+    تاریخچه بازه [start, اکنون) را با وضوح خودکار Rollup بارگذاری می‌کند.
+
+    بازه‌های کوتاه از نتایج خام (load_frame) و بازه‌های طولانی از سطوح تجمیع خوانده
+    می‌شوند، که شامل داده‌های قدیمی‌تر از پنجره نگهداری خام هم هست.
+
+    Args:
+        start (str): تاریخ ISO یا None برای کل تاریخچه.
+
+    Returns:
+        tuple: (resolution, pd.DataFrame). در سطوح تجمیع هر سطر یک سطل است
+            (ستون‌های rows_to_frame به علاوه count).
+    """
+    from datetime import datetime
+    rollup = Rollup(storage)
+    start_dt = datetime.fromisoformat(start) if start else None
+    resolution = rollup.resolution_for(start_dt)
+    if resolution == 'raw':
+        return resolution, load_frame(storage, connection_name=connection_name, start=start)
+    _, rows = rollup.query(connection_name, start_dt, resolution=resolution)
+    frame = rows_to_frame(rows)
+    frame['connection_name'] = frame['connection_name'].astype('category')
+    return resolution, frame
+
+
+def summarize(frame):
+    """
+    خلاصه هر اتصال: تعداد تست، بازه زمانی، میانگین/میانه/صدک ۹۵ تاخیر، میانگین loss و سرعت‌ها.
+
+    روی سطرهای تجمیع‌شده (ستون count) تعداد تست مجموع count سطل‌هاست.
+    """
+    grouped = frame.groupby('connection_name', observed=True)
+    summary = grouped.agg(
+        tests=('count', 'sum') if 'count' in frame else ('avg_latency', 'size'),
+        first=('timestamp', 'min'),
+        last=('timestamp', 'max'),
+        latency_mean=('avg_latency', 'mean'),
+        latency_median=('avg_latency', 'median'),
+        packet_loss_mean=('packet_loss', 'mean'),
+        download_mean=('download_speed', 'mean'),
+        upload_mean=('upload_speed', 'mean'),
+    )
+    summary['latency_p95'] = grouped['avg_latency'].quantile(0.95)
+    return summary
+
+
+def time_of_day_profile(frame, metric='avg_latency'):
+    """
+    میانگین یک شاخص برای هر اتصال در هر ساعت از شبانه‌روز.
+
+    Returns:
+        pd.DataFrame: سطرها اتصال‌ها، ستون‌ها ساعت ۰ تا ۲۳.
+    """
+    hours = frame['timestamp'].dt.hour.rename('hour')
+    profile = frame.groupby(['connection_name', hours], observed=True)[metric].mean()
+    return profile.unstack('hour').reindex(columns=range(24))
+
+
+def trends(frame, metrics=METRICS):
+    """
+    شیب رگرسیون خطی هر شاخص نسبت به زمان (واحد: تغییر در روز) برای هر اتصال.
+
+    شیب با فرمول بسته حداقل مربعات از مجموع‌های گروهی محاسبه می‌شود
+    (بدون حلقه روی رکوردها یا گروه‌ها).
+    """
+    days = (frame['timestamp'] - frame['timestamp'].min()).dt.total_seconds() / 86400
+    slopes = {}
+    for metric in metrics:
+        y = frame[metric]
+        valid = y.notna()
+        x = days.where(valid)
+        parts = pd.DataFrame({
+            'connection_name': frame['connection_name'],
+            'n': valid.astype('float64'),
+            'x': x, 'y': y, 'xx': x * x, 'xy': x * y,
+        }).groupby('connection_name', observed=True).sum(min_count=1)
+        denominator = parts['n'] * parts['xx'] - parts['x'] ** 2
+        slope = (parts['n'] * parts['xy'] - parts['x'] * parts['y']) / denominator
+        slopes[f"{metric}_per_day"] = slope.where(denominator.abs() > 1e-12)
+    return pd.DataFrame(slopes)
+
+
+def anomalies(frame, metrics=('avg_latency', 'packet_loss', 'download_speed'),
+              window=48, z_threshold=3.0, ewma_span=24, ewma_threshold=3.0):
+    """
+    نتایج غیرعادی را با دو روش برای هر اتصال علامت می‌زند:
+        - z-score نسبت به میانگین و انحراف معیار پنجره متحرک قبلی (window تست)
+        - فاصله از EWMA بر حسب انحراف معیار نمایی (ewma_span)
+
+    هر دو آماره فقط از نتایج قبلی محاسبه می‌شوند (shift) تا خود نقطه روی مبنا اثر نگذارد.
+
+    Returns:
+        pd.DataFrame: frame به علاوه ستون‌های <metric>_z، <metric>_ewma_dev و <metric>_anomaly
+            و ستون کلی anomaly.
+    """
+    out = frame.copy()
+    grouped = out.groupby('connection_name', observed=True)
+    flags = np.zeros(len(out), dtype=bool)
+    for metric in metrics:
+        series = grouped[metric]
+        rolling_mean = series.transform(lambda s: s.shift().rolling(window, min_periods=window // 2).mean())
+        rolling_std = series.transform(lambda s: s.shift().rolling(window, min_periods=window // 2).std())
+        ewma = series.transform(lambda s: s.shift().ewm(span=ewma_span, ignore_na=True).mean())
+        ewm_std = series.transform(lambda s: s.shift().ewm(span=ewma_span, ignore_na=True).std())
+
+        z = (out[metric] - rolling_mean) / rolling_std.where(rolling_std > 0)
+        ewma_dev = (out[metric] - ewma) / ewm_std.where(ewm_std > 0)
+        out[f"{metric}_z"] = z
+        out[f"{metric}_ewma_dev"] = ewma_dev
+        flag = ((z.abs() > z_threshold) | (ewma_dev.abs() > ewma_threshold)).to_numpy()
+        out[f"{metric}_anomaly"] = flag
+        flags |= flag
+    out['anomaly'] = flags
+    return out
+
+
+def run_analysis(data_dir='../data', backend='log', report='summary', connection_name=None,
+                 since=None, csv_path=None):
+    """نقطه ورود زیرفرمان analyze در main.py."""
+    from storage import ResultStorage
+    storage = ResultStorage(data_dir=data_dir, backend=backend)
+    try:
+        resolution, frame = load_history(storage, connection_name=connection_name, start=since)
+    finally:
+        storage.close()
+    if frame.empty:
+        print("[-] No results to analyze.")
+        return None
+    if resolution != 'raw':
+        print(f"[+] Long range: analyzing {resolution} rollups ({len(frame)} buckets).")
+
+    if report == 'summary':
+        table = summarize(frame)
+    elif report == 'profile':
+        table = time_of_day_profile(frame)
+    elif report == 'trend':
+        table = trends(frame)
+    elif report == 'anomalies':
+        flagged = anomalies(frame)
+        table = flagged.loc[flagged['anomaly'], ['timestamp', 'connection_name', *METRICS[:3]]]
+    else:
+        raise ValueError(f"Unknown report: {report!r}")
+
+    with pd.option_context('display.width', 160, 'display.max_columns', 30,
+                           'display.float_format', '{:.2f}'.format):
+        print(table.to_string())
+    if csv_path:
+        table.to_csv(csv_path)
+        print(f"[+] Report saved to '{csv_path}'.")
+    return table
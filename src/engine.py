@@ -0,0 +1,291 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from probes import probe_type
+from stats import LatencyStats
+
+
+class Ping3Transport:
+    """
+    ترنسپورت پیش‌فرض که هر پروب را با ping3 انجام می‌دهد.
+
+    ping3 یک تابع blocking است، پس هر فراخوانی در یک thread pool اجرا می‌شود
+    تا event loop آزاد بماند و چند پروب همزمان در جریان باشند.
+    """
+
+    def __init__(self, max_workers=64):
+        """
+        Args:
+            max_workers (int): حداکثر تعداد threadهایی که همزمان پینگ می‌فرستند.
+        """
+        self.max_workers = max_workers
+        self._executor = None
+
+    async def probe(self, target, timeout):
+        """
+        یک پینگ به target می‌فرستد.
+
+        Returns:
+            float | None: زمان رفت و برگشت (میلی‌ثانیه) یا None در صورت timeout.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='netspector-ping')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._ping, target, timeout)
+
+    @staticmethod
+    def _ping(target, timeout):
+        from ping3 import ping
+        delay = ping(target, unit='ms', timeout=timeout)
+        if delay is None or delay is False:
+            return None
+        return delay
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class FakeTransport:
+    """
+    ترنسپورت ساختگی برای تست و بنچمارک آفلاین (بدون ارسال بسته واقعی).
+    """
+
+    def __init__(self, latency_ms=1.0, jitter_ms=0.0, loss=0.0, seed=None, sleep=True):
+        """
+        Args:
+            latency_ms (float): تاخیر پایه شبیه‌سازی‌شده.
+            jitter_ms (float): انحراف معیار نویز گاوسی روی تاخیر.
+            loss (float): احتمال گم شدن هر پروب (بین ۰ و ۱).
+            seed (int): seed برای تولید اعداد تصادفی تکرارپذیر.
+            sleep (bool): اگر True باشد واقعاً به اندازه تاخیر صبر می‌کند.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.sleep = sleep
+        self._random = random.Random(seed)
+        self.sent = 0
+
+    async def probe(self, target, timeout):
+        self.sent += 1
+        if self._random.random() < self.loss:
+            if self.sleep:
+                await asyncio.sleep(timeout)
+            return None
+        delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms))
+        if delay > timeout * 1000:
+            if self.sleep:
+                await asyncio.sleep(timeout)
+            return None
+        if self.sleep:
+            await asyncio.sleep(delay / 1000)
+        return delay
+
+    def close(self):
+        pass
+
+
+def default_transport(max_workers=64):
+    """
+    ترنسپورت پیش‌فرض: موتور ICMP با سوکت مشترک اگر سیستم اجازه باز کردن سوکت ICMP بدهد،
+    در غیر این صورت ping3.
+    """
+    from icmp import IcmpTransport
+    try:
+        return IcmpTransport()
+    except OSError:
+        return Ping3Transport(max_workers=max_workers)
+
+
+class ProbeEngine:
+    """
+    موتور پروب همزمان: چندین مقصد روی یک event loop با سقف تعداد پروب در جریان.
+    """
+
+    def __init__(self, transport=None, max_in_flight=64, timeout=1.0):
+        """
+        Args:
+            transport: شیئی با متد async probe(target, timeout). پیش‌فرض default_transport().
+            max_in_flight (int): حداکثر تعداد پروب‌هایی که همزمان منتظر پاسخ هستند.
+            timeout (float): مهلت هر پروب (ثانیه).
+        """
+        self.transport = transport if transport is not None else default_transport(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.kind = probe_type(self.transport)
+
+    async def _probe_once(self, semaphore, target, seq, stats, on_sample):
+        async with semaphore:
+            # مسیر داغ: در حالت خاموش شاخص‌ها فقط یک بررسی metrics.enabled هزینه دارد
+            start = time.perf_counter() if metrics.enabled else None
+            try:
+                delay = await self.transport.probe(target, self.timeout)
+                error = None
+            except Exception as e:
+                delay, error = None, e
+        if start is not None:
+            metrics.observe('probe', time.perf_counter() - start, probe=self.kind)
+            metrics.count('probes', probe=self.kind)
+            if error is not None:
+                metrics.count('probe_errors', probe=self.kind)
+            elif delay is None:
+                metrics.count('probe_timeouts', probe=self.kind)
+        # آمار به ترتیب رسیدن پاسخ‌ها به‌روز می‌شود (همان ترتیبی که RFC 3550 فرض می‌کند)
+        if delay is None:
+            stats.add_loss()
+        else:
+            stats.add(delay)
+        if on_sample is not None:
+            on_sample(target, seq, delay, error)
+
+    async def probe_target(self, target, count, interval, semaphore=None, on_sample=None):
+        """
+        count پروب به یک مقصد می‌فرستد؛ زمان ارسال‌ها با فاصله interval تنظیم می‌شود
+        و یک پاسخ کند، ارسال بعدی را عقب نمی‌اندازد.
+
+        Returns:
+            dict: نتایج به شکل LatencyStats.result()
+        """
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        stats = LatencyStats()
+        # فقط پروب‌های در جریان نگه داشته می‌شوند، نه همه نمونه‌ها
+        pending = set()
+        for seq in range(count):
+            # زمان ارسال بر اساس شروع محاسبه می‌شود تا خطای sleep انباشته نشود
+            wait = start + seq * interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            task = asyncio.ensure_future(self._probe_once(semaphore, target, seq, stats, on_sample))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+        with metrics.timer('stats', probe=self.kind):
+            return stats.result()
+
+    async def probe_adaptive(self, target, duration, sampler, semaphore=None, on_sample=None, budget=None):
+        """
+        مقصد را در یک پنجره duration ثانیه‌ای با نرخ تطبیقی پروب می‌کند.
+
+        هر پروب پس از رسیدن پاسخ به sampler (AdaptiveSampler) داده می‌شود و زمان ارسال بعدی
+        از فاصله‌ای که sampler تعیین کرده به دست می‌آید. با budget (ProbeBudget مشترک):
+        پروب‌های حالت متراکم و اولین پروب پنجره تا آزاد شدن سهمیه صبر می‌کنند، ولی پروب‌های
+        حالت پایدار اگر سهمیه نباشد به نوبت بعد موکول می‌شوند.
+
+        Returns:
+            dict: نتایج به شکل LatencyStats.result() به علاوه 'sampling' با تصمیم‌های نمونه‌برداری:
+                mode، sent، dense (پروب‌های متراکم)، deferred (موکول‌شده به خاطر budget)،
+                triggers (تعداد هر دلیل)، events ([seq, دلیل]) و interval (فاصله نهایی، ثانیه).
+        """
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        stats = LatencyStats()
+        sampling = {'mode': 'adaptive', 'sent': 0, 'dense': 0, 'deferred': 0,
+                    'triggers': dict.fromkeys(('variance', 'loss', 'change'), 0), 'events': []}
+
+        def observe(target, seq, delay, error):
+            reason = sampler.observe(delay)
+            if reason is not None:
+                sampling['triggers'][reason] += 1
+                sampling['events'].append([seq, reason])
+            if on_sample is not None:
+                on_sample(target, seq, delay, error)
+
+        seq = 0
+        while True:
+            now = loop.time()
+            if now >= end and seq:
+                break
+            dense = sampler.dense
+            if budget is not None:
+                if dense or not seq:
+                    wait = budget.reserve(now)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                elif not budget.try_take(now):
+                    sampling['deferred'] += 1
+                    await asyncio.sleep(min(sampler.interval, max(0.0, end - now)))
+                    continue
+            sent_at = loop.time()
+            await self._probe_once(semaphore, target, seq, stats, observe)
+            sampling['sent'] += 1
+            sampling['dense'] += dense
+            seq += 1
+            wait = sent_at + sampler.interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(min(wait, max(0.0, end - loop.time())))
+        sampling['interval'] = sampler.interval
+        with metrics.timer('stats', probe=self.kind):
+            results = stats.result()
+        results['sampling'] = sampling
+        return results
+
+    async def run(self, targets, count=10, interval=0.5, intervals=None, on_sample=None,
+                  samplers=None, budget=None):
+        """
+        همه مقصدها را همزمان پروب می‌کند.
+
+        Args:
+            targets (list): لیست آدرس‌ها.
+            count (int): تعداد پروب برای هر مقصد.
+            interval (float): فاصله پیش‌فرض بین ارسال‌ها (ثانیه).
+            intervals (dict): فاصله اختصاصی برای بعضی مقصدها {target: seconds}.
+            on_sample (callable): تابعی با امضای (target, seq, delay, error) که بعد از هر پروب صدا زده می‌شود.
+            samplers (dict): {target: AdaptiveSampler}. برای این مقصدها به جای count پروب با فاصله
+                ثابت، پنجره count * interval ثانیه‌ای با probe_adaptive پروب می‌شود.
+            budget (ProbeBudget): سقف مشترک پروب در ثانیه برای مقصدهای تطبیقی.
+
+        Returns:
+            dict: {target: results}
+        """
+        intervals = intervals or {}
+        samplers = samplers or {}
+        targets = list(dict.fromkeys(targets))
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        def probe(t):
+            spacing = intervals.get(t, interval)
+            if t in samplers:
+                return self.probe_adaptive(t, count * spacing, samplers[t], semaphore, on_sample, budget)
+            return self.probe_target(t, count, spacing, semaphore, on_sample)
+
+        results = await asyncio.gather(*(probe(t) for t in targets))
+        return dict(zip(targets, results))
+
+    def run_sync(self, targets, count=10, interval=0.5, intervals=None, on_sample=None,
+                 samplers=None, budget=None):
+        """نسخه همگام run برای فراخوانی از کد غیر async (کنسول یا thread رابط گرافیکی)."""
+        async def run_and_release():
+            try:
+                return await self.run(targets, count, interval, intervals, on_sample, samplers, budget)
+            finally:
+                # سوکت‌ها و اتصال‌های ترنسپورت که به این loop وابسته‌اند قبل از بسته شدن آن آزاد می‌شوند
+                release = getattr(self.transport, 'release', None)
+                if release is not None:
+                    release()
+                    await asyncio.sleep(0)
+        return asyncio.run(run_and_release())
+
+    def close(self):
+        self.transport.close()
+
+
+# بنچمارک آفلاین: ۱۰۰ مقصد × ۱۰ پروب با ترنسپورت ساختگی
+if __name__ == "__main__":
+    engine = ProbeEngine(transport=FakeTransport(latency_ms=20, jitter_ms=5, loss=0.01, seed=1), max_in_flight=256)
+    hosts = [f"10.0.{i // 256}.{i % 256}" for i in range(100)]
+    t0 = time.perf_counter()
+    sweep = engine.run_sync(hosts, count=10, interval=0.5)
+    elapsed = time.perf_counter() - t0
+    print(f"Probed {len(sweep)} targets x 10 in {elapsed:.2f} s (sequential estimate: {len(hosts) * 10 * 0.52:.0f} s)")
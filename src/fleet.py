@@ -0,0 +1,331 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from multiprocessing.connection import wait
+
+from monitor import NO_SPEED, Monitor, start_metrics
+from samples import SampleStore
+
+# فیلدهای عددی نتیجه که از worker به aggregator فرستاده می‌شوند
+FIELDS = ('avg_latency', 'min_latency', 'max_latency', 'jitter', 'packet_loss',
+          'p50_latency', 'p95_latency', 'p99_latency', 'rfc3550_jitter')
+# شمارنده‌های نمونه‌برداری تطبیقی (فهرست events فرستاده نمی‌شود)
+SAMPLING = ('sent', 'dense', 'deferred', 'variance', 'loss', 'change')
+# هر نتیجه یک بخش با طول ثابت دارد: اندیس مقصد در shard، timestamp، فیلدهای بالا،
+# پرچم تطبیقی بودن و شمارنده‌های نمونه‌برداری
+RESULT = struct.Struct(f'<Id{len(FIELDS)}dB{len(SAMPLING)}I')
+NO_SAMPLING = (0,) * (1 + len(SAMPLING))
+# و بعد از آن هیستوگرام تاخیر (LatencyHistogram) تا rollup بتواند صدک‌ها را ادغام کند:
+# relative_accuracy (صفر یعنی نتیجه هیستوگرام ندارد)، zero_count، تعداد باکت‌ها و
+# سپس برای هر باکت (اندیس، شمارش)
+HISTOGRAM = struct.Struct('<dIH')
+BUCKET = struct.Struct('<iI')
+
+
+def shard_of(target, shards):
+    """
+    shard یک مقصد با hash پایدار (crc32)، تا هر مقصد در همه اجراها به همان worker برسد.
+    """
+    key = f"{target.get('probe', 'icmp')}|{target['host']}|{target.get('port')}|{target['name']}"
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def shard_targets(targets, shards):
+    """مقصدها را بین shards قسمت می‌کند. Returns: لیستی از لیست مقصدها (بعضی ممکن است خالی باشند)."""
+    assigned = [[] for _ in range(shards)]
+    for target in targets:
+        assigned[shard_of(target, shards)].append(target)
+    return assigned
+
+
+class BatchWriter:
+    """
+    سمت worker: به جای ResultStorage به Monitor داده می‌شود.
+
+    هر نتیجه در یک بافر از پیش تخصیص‌یافته به صورت رکورد باینری (بخش ثابت و باکت‌های
+    هیستوگرام) نوشته می‌شود و کل دسته با یک send_bytes روی pipe فرستاده می‌شود؛ نه pickle و نه یک
+    پیام برای هر نتیجه. دسته وقتی batch_size نتیجه جمع شد یا flush_interval ثانیه
+    از ارسال قبلی گذشت فرستاده می‌شود؛ یک thread پس‌زمینه دسته نیمه‌پر را هم سر وقت
+    می‌فرستد تا نتیجه‌ای که بعد از یک ارسال رسیده منتظر نتیجه بعدی (شاید یک interval کامل) نماند.
+    """
+
+    def __init__(self, conn, targets, batch_size=256, flush_interval=1.0, samples=None):
+        """
+        Args:
+            conn: سر نوشتنی multiprocessing.Pipe.
+            targets (list): مقصدهای این shard؛ اندیس هر مقصد در رکوردها فرستاده می‌شود.
+            batch_size (int): حداکثر تعداد نتیجه در هر دسته.
+            flush_interval (float): حداکثر فاصله بین دو ارسال (ثانیه).
+            samples (SampleStore): نمونه‌های خام مستقیم در سگمنت‌های همین worker نوشته می‌شوند.
+        """
+        self.conn = conn
+        self.index = {(t['name'], t.get('probe', 'icmp')): i for i, t in enumerate(targets)}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # جای بخش ثابت و حدود ۶۴ باکت برای هر نتیجه؛ در صورت نیاز بزرگ‌تر می‌شود
+        self._buffer = bytearray(batch_size * (RESULT.size + HISTOGRAM.size + 64 * BUCKET.size))
+        self._size = 0
+        self._count = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()  # save_result (event loop) و thread زمان‌سنج
+        self._closed = threading.Event()
+        self.batches = 0
+        self.samples = samples
+        self._timer = None
+        if flush_interval > 0:
+            self._timer = threading.Thread(target=self._flush_periodically, name='netspector-batch', daemon=True)
+            self._timer.start()
+
+    def record_sample(self, target, seq, delay, error):
+        if self.samples is not None:
+            self.samples.record(target, seq, delay, error)
+
+    def save_result(self, connection_name, ping_results, speed_results, probe_type='icmp'):
+        with self._lock:
+            self._pack(connection_name, ping_results, probe_type)
+            if self._count >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def _pack(self, connection_name, ping_results, probe_type):
+        sampling = ping_results.get('sampling')
+        if sampling:
+            counters = (1, sampling['sent'], sampling['dense'], sampling['deferred'],
+                        *(sampling['triggers'][k] for k in SAMPLING[3:]))
+        else:
+            counters = NO_SAMPLING
+        histogram = ping_results.get('histogram')
+        buckets = histogram['buckets'] if histogram else {}
+        end = self._size + RESULT.size + HISTOGRAM.size + len(buckets) * BUCKET.size
+        if end > len(self._buffer):
+            self._buffer.extend(bytes(max(end, 2 * len(self._buffer)) - len(self._buffer)))
+        RESULT.pack_into(self._buffer, self._size, self.index[connection_name, probe_type],
+                         time.time(), *(ping_results[f] for f in FIELDS), *counters)
+        offset = self._size + RESULT.size
+        if histogram:
+            HISTOGRAM.pack_into(self._buffer, offset, histogram['relative_accuracy'],
+                                histogram['zero_count'], len(buckets))
+        else:
+            HISTOGRAM.pack_into(self._buffer, offset, 0.0, 0, 0)
+        offset += HISTOGRAM.size
+        for key, count in buckets.items():
+            BUCKET.pack_into(self._buffer, offset, int(key), count)
+            offset += BUCKET.size
+        self._size = end
+        self._count += 1
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                if time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._count:
+            self.conn.send_bytes(self._buffer, 0, self._size)
+            self._size = 0
+            self._count = 0
+            self.batches += 1
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+        self.conn.close()
+        if self.samples is not None:
+            self.samples.close()
+
+
+def decode_batch(data):
+    """
+    Returns:
+        iterator: تاپل‌های (اندیس مقصد، timestamp، ping_results).
+    """
+    offset = 0
+    while offset < len(data):
+        index, timestamp, *values = RESULT.unpack_from(data, offset)
+        offset += RESULT.size
+        ping_results = dict(zip(FIELDS, values))
+        adaptive, sent, dense, deferred, *triggers = values[len(FIELDS):]
+        if adaptive:
+            ping_results['sampling'] = {'mode': 'adaptive', 'sent': sent, 'dense': dense, 'deferred': deferred,
+                                        'triggers': dict(zip(SAMPLING[3:], triggers))}
+        relative_accuracy, zero_count, buckets = HISTOGRAM.unpack_from(data, offset)
+        offset += HISTOGRAM.size
+        if relative_accuracy:
+            ping_results['histogram'] = {
+                'relative_accuracy': relative_accuracy,
+                'zero_count': zero_count,
+                'buckets': {str(key): count for key, count in
+                            BUCKET.iter_unpack(data[offset:offset + buckets * BUCKET.size])},
+            }
+        offset += buckets * BUCKET.size
+        yield index, timestamp, ping_results
+
+
+def _worker_main(config, conn, transport_factory, rounds, batch_size, flush_interval, index=0):
+    # هر worker شاخص‌های پروب خودش را روی پورت جداگانه (port + 1 + index) صادر می‌کند
+    server = start_metrics(config, offset=1 + index)
+    storage = config['storage']
+    samples = None
+    if storage.get('record_samples', True):
+        # هر worker سگمنت‌های نمونه خودش را می‌نویسد؛ SampleStore برای چند نویسنده طراحی شده
+        samples = SampleStore(os.path.join(storage.get('data_dir', '../data'),
+                                           storage.get('samples_dirname', 'samples')))
+    sink = BatchWriter(conn, config['targets'], batch_size, flush_interval, samples)
+    transport = transport_factory() if transport_factory is not None else None
+    monitor = Monitor(config, storage=sink, transport=transport, buffered=False)
+    try:
+        if rounds is None:
+            asyncio.run(monitor.run())
+        else:
+            asyncio.run(monitor.run_rounds(rounds))
+    finally:
+        monitor.close()  # sink را هم flush و بسته می‌کند
+        if server is not None:
+            server.close()
+
+
+class Fleet:
+    """
+    حالت fleet: مانیتورینگ تعداد زیادی مقصد با چند پروسس.
+
+    - مقصدها با hash پایدار بین workerها تقسیم می‌شوند؛ هر worker یک Monitor کامل
+      (event loop، موتورهای پروب و محاسبه آمار) روی shard خودش اجرا می‌کند، پس
+      پارس پاسخ‌ها و آمار روی چند هسته پخش می‌شود.
+    - workerها نتایج را به صورت دسته‌های باینری (BatchWriter) روی pipe می‌فرستند
+      و فقط پروسس اصلی (aggregator) از طریق ResultStorage می‌نویسد.
+    - probe_budget به نسبت تعداد مقصدها بین workerها تقسیم می‌شود.
+    - با metrics، aggregator نتایج و زمان نوشتن را روی port و worker شماره i شاخص‌های
+      پروب را روی port + 1 + i صادر می‌کند.
+    - تست سرعت و compaction در حالت fleet اجرا نمی‌شوند؛ برای آن‌ها از monitor استفاده کنید.
+    """
+
+    def __init__(self, config, workers=None, storage=None, transport_factory=None,
+                 batch_size=256, flush_interval=1.0):
+        """
+        Args:
+            config (dict): خروجی monitor.load_config.
+            workers (int): تعداد پروسس‌ها. پیش‌فرض تعداد هسته‌ها.
+            storage (ResultStorage): ذخیره‌سازی aggregator. پیش‌فرض از بخش storage پیکربندی.
+            transport_factory (callable): سازنده ترنسپورت در هر worker (باید قابل pickle باشد،
+                مثلاً functools.partial(FakeTransport, sleep=False)). پیش‌فرض ترنسپورت پیش‌فرض موتور.
+            batch_size (int), flush_interval (float): تنظیمات BatchWriter.
+        """
+        self.config = config
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.storage = storage
+        self.transport_factory = transport_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.shards = [s for s in shard_targets(config['targets'], self.workers) if s]
+        self.results = 0
+        self.batches = 0
+
+    def _worker_config(self, shard):
+        config = {**self.config, 'targets': shard, 'speed_test': None, 'compaction': None}
+        if config.get('probe_budget'):
+            # سقف سراسری بین workerها به نسبت تعداد مقصدهای هر shard تقسیم می‌شود
+            config['probe_budget'] = config['probe_budget'] * len(shard) / len(self.config['targets'])
+        return config
+
+    def run(self, rounds=None):
+        """
+        workerها را اجرا کرده و نتایج را تا پایان کار همه آن‌ها ذخیره می‌کند.
+
+        Args:
+            rounds (int): اگر داده شود هر worker همین تعداد دور را بدون زمان‌بندی اجرا
+                کرده و تمام می‌شود؛ None یعنی مانیتورینگ پیوسته تا SIGINT/SIGTERM.
+
+        Returns:
+            float: مدت اجرا (ثانیه).
+        """
+        processes, readers = [], {}
+        for index, shard in enumerate(self.shards):
+            reader, writer = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_worker_main, name='netspector-fleet', daemon=True,
+                args=(self._worker_config(shard), writer, self.transport_factory, rounds,
+                      self.batch_size, self.flush_interval, index))
+            process.start()
+            writer.close()  # فقط worker سر نوشتنی را نگه می‌دارد تا پایان آن EOF بدهد
+            processes.append(process)
+            readers[reader] = index, shard
+
+        def forward(signum, frame):
+            # workerها با SIGTERM دورهای جاری را تمام و دسته آخر را ارسال می‌کنند
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+        previous = {}
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                previous[sig] = signal.signal(sig, forward)
+            except ValueError:
+                pass  # خارج از thread اصلی؛ توقف با پایان rounds یا سیگنال مستقیم به workerها
+        if self.storage is None:
+            from storage import ResultStorage
+            self.storage = ResultStorage(**self.config['storage'])
+        print(f"[+] Fleet: {len(self.config['targets'])} targets on {len(processes)} workers.")
+        start = time.perf_counter()
+        try:
+            while readers:
+                for reader in wait(list(readers)):
+                    worker, shard = readers[reader]
+                    try:
+                        data = reader.recv_bytes()
+                    except EOFError:
+                        del readers[reader]
+                        continue
+                    # نتایج هر worker به ترتیب زمانی می‌رسند؛ با جریان جدا برای هر worker
+                    # دسته‌های workerهای مختلف ترتیب زمانی سگمنت‌های لاگ را به هم نمی‌زنند
+                    self.results += self.storage.save_batch(
+                        ((shard[index]['name'], ping_results, dict(NO_SPEED),
+                          shard[index].get('probe', 'icmp'), datetime.fromtimestamp(timestamp))
+                         for index, timestamp, ping_results in decode_batch(data)),
+                        stream=worker)
+                    self.batches += 1
+        except BaseException:
+            # aggregator دیگر از pipeها نمی‌خواند؛ workerها روی send_bytes می‌مانند و join تمام نمی‌شد
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            raise
+        finally:
+            for process in processes:
+                process.join()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        return time.perf_counter() - start
+
+    def close(self):
+        if self.storage is not None:
+            self.storage.close()
+
+
+def run_fleet(config_path, workers=None, metrics_port=None, metrics_host=None):
+    """نقطه ورود حالت fleet از main.py."""
+    from monitor import load_config, override_metrics
+    config = load_config(config_path)
+    override_metrics(config, metrics_port, metrics_host)
+    fleet = Fleet(config, workers=workers)
+    server = start_metrics(config)
+    try:
+        fleet.run()
+    finally:
+        fleet.close()
+        if server is not None:
+            server.close()
+        print(f"[+] Fleet stopped: {fleet.results} results in {fleet.batches} batches; results flushed.")
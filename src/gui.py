@@ -5,28 +5,37 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import threading
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import pandas as pd
 from datetime import datetime
 
 # Import our own modules
 from tester import NetworkTester
 from storage import ResultStorage
+from live_chart import LiveChart
+from writer import BufferedResultWriter
+
+FRAME_INTERVAL_MS = 50  # cap text/chart refreshes at 20 frames per second
 
 class NetSpectorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("NetSpector - Network Monitoring Tool")
-        self.root.geometry("800x700")  # Set initial window size
+        self.root.geometry("1300x700")  # Set initial window size
 
         self.tester = NetworkTester()
         self.storage = ResultStorage()
+        # Results are written in the background so disk stalls never block a test
+        self.writer = BufferedResultWriter(self.storage)
         self.is_testing = False
 
+        # Text updates from worker threads are queued and applied once per frame
+        self._pending_messages = []
+        self._messages_lock = threading.Lock()
+
         self.setup_gui()
         self.load_history()
+        self.root.after(FRAME_INTERVAL_MS, self.refresh_frame)
 
     def setup_gui(self):
         # Create main frames
@@ -103,10 +112,20 @@ class NetSpectorApp:
         self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         history_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Live chart frame
+        chart_frame = ttk.LabelFrame(main_frame, text="Live Latency", padding="5")
+        chart_frame.grid(row=0, column=2, rowspan=5, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(10, 0), pady=5)
+
+        self.chart_figure = Figure(figsize=(5, 5), dpi=100)
+        self.chart_canvas = FigureCanvasTkAgg(self.chart_figure, master=chart_frame)
+        self.chart_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.live_chart = LiveChart(self.chart_figure, self.chart_canvas)
+
         # Configure grid weights for resizing
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(0, weight=1)
+        main_frame.columnconfigure(2, weight=1)
         main_frame.rowconfigure(3, weight=1)
         main_frame.rowconfigure(4, weight=1)
 
@@ -136,7 +155,7 @@ class NetSpectorApp:
 
             # Run ping test
             self.update_results("Running ping test...\n")
-            ping_results = self.tester.run_ping_test(count=ping_count)
+            ping_results = self.tester.run_ping_test(count=ping_count, on_sample=self.on_ping_sample)
 
             speed_results = None
             if not ping_only:
@@ -146,9 +165,10 @@ class NetSpectorApp:
             else:
                 speed_results = {'download_speed': 0.0, 'upload_speed': 0.0}
 
-            # Save results
+            # Queue results for the background writer
             self.update_results("Saving results...\n")
-            self.storage.save_result(connection_name, ping_results, speed_results)
+            self.writer.save_result(connection_name, ping_results, speed_results,
+                                    probe_type=self.tester.probe_type)
 
             # Display results
             self.update_results("\n=== TEST RESULTS ===\n")
@@ -156,15 +176,21 @@ class NetSpectorApp:
             self.update_results(f"Avg Latency: {ping_results['avg_latency']:.2f} ms\n")
             self.update_results(f"Min Latency: {ping_results['min_latency']:.2f} ms\n")
             self.update_results(f"Max Latency: {ping_results['max_latency']:.2f} ms\n")
-            self.update_results(f"Jitter: {ping_results['jitter']:.2f} ms\n")
+            self.update_results(f"P50 / P95 / P99 Latency: {ping_results['p50_latency']:.2f} / "
+                                f"{ping_results['p95_latency']:.2f} / {ping_results['p99_latency']:.2f} ms\n")
+            self.update_results(f"Jitter: {ping_results['jitter']:.2f} ms "
+                                f"(RFC 3550: {ping_results['rfc3550_jitter']:.2f} ms)\n")
             self.update_results(f"Packet Loss: {ping_results['packet_loss']:.0f}%\n")
             
             if not ping_only:
                 self.update_results(f"Download Speed: {speed_results['download_speed']} Mbps\n")
                 self.update_results(f"Upload Speed: {speed_results['upload_speed']} Mbps\n")
 
-            # Reload history
-            self.load_history()
+            # Wait for the write here, off the Tk thread, then reload history
+            # in the main thread (Tk widgets are not thread-safe)
+            self.writer.flush()
+            self.update_results(f"Storage: {self.writer.report()}\n")
+            self.root.after(0, self.load_history)
 
         except Exception as e:
             error_msg = f"Error during test: {str(e)}\n"
@@ -183,12 +209,33 @@ class NetSpectorApp:
         self.ping_only_button.config(state='normal')
         self.is_testing = False
 
+    def close(self):
+        """Flush queued results and release storage and probe sockets."""
+        try:
+            self.writer.close()
+        finally:
+            self.storage.close()
+            self.tester.engine.close()
+
     def update_results(self, message):
-        """Update the results text widget (thread-safe)."""
-        def _update():
-            self.results_text.insert(tk.END, message)
+        """Queue a message for the results text widget (thread-safe)."""
+        with self._messages_lock:
+            self._pending_messages.append(message)
+
+    def on_ping_sample(self, target, seq, delay, error):
+        """Feed each ping reply to the live chart and the raw sample store (called from the test thread)."""
+        self.live_chart.push(target, delay)
+        self.storage.record_sample(target, seq, delay, error)
+
+    def refresh_frame(self):
+        """Apply all queued text updates and chart samples in a single Tk update."""
+        with self._messages_lock:
+            messages, self._pending_messages = self._pending_messages, []
+        if messages:
+            self.results_text.insert(tk.END, ''.join(messages))
             self.results_text.see(tk.END)
-        self.root.after(0, _update)
+        self.live_chart.draw_frame()
+        self.root.after(FRAME_INTERVAL_MS, self.refresh_frame)
 
     def load_history(self):
         """Load and display test history."""
@@ -196,11 +243,11 @@ class NetSpectorApp:
         for item in self.history_tree.get_children():
             self.history_tree.delete(item)
 
-        # Load results from storage
-        results = self.storage.load_results()
+        # Load only the last 10 results; the storage reads them from the end of the history
+        results = self.storage.tail(10)
 
         # Add results to treeview (show latest first)
-        for result in reversed(results[-10:]):  # Show last 10 results
+        for result in reversed(results):
             timestamp = result['timestamp']
             try:
                 # Format timestamp for display
@@ -222,6 +269,7 @@ def main():
     root = tk.Tk()
     app = NetSpectorApp(root)
     root.mainloop()
+    app.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,245 @@
+import asyncio
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+
+import metrics
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_HEADER = struct.Struct('!BBHHH')  # type، code، checksum، identifier، sequence
+# در Python ثابت SO_TIMESTAMPNS تعریف نشده؛ مقدار لینوکس ۳۵ است
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35 if sys.platform.startswith('linux') else None)
+TIMESPEC = struct.Struct('@ll')
+PAYLOAD = b'NetSpector-probe'
+RECV_BUFFER = 4 * 1024 * 1024
+RESOLVE_TTL = 300.0  # مدت اعتبار آدرس resolve‌شده هر مقصد (ثانیه)
+
+# identifierهای در حال استفاده در این پروسس؛ هر IcmpTransport یکی جداگانه می‌گیرد تا سوکت‌های
+# raw همزمان (مثلاً موتور monitor و تستر سرعت) پاسخ‌های هم را مصرف نکنند
+_identifiers = set()
+_identifiers_lock = threading.Lock()
+
+
+def _allocate_identifier():
+    with _identifiers_lock:
+        if len(_identifiers) >= 0x10000:
+            raise OSError("No free ICMP identifier in this process")
+        while True:
+            identifier = random.getrandbits(16)
+            if identifier not in _identifiers:
+                _identifiers.add(identifier)
+                return identifier
+
+
+def _release_identifier(identifier):
+    with _identifiers_lock:
+        _identifiers.discard(identifier)
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def parse_echo_reply(data, raw):
+    """
+    بسته دریافتی را به عنوان echo reply تجزیه می‌کند.
+
+    Args:
+        data (bytes): داده دریافتی از سوکت.
+        raw (bool): سوکت raw است و بسته با هدر IP (با طول متغیر) شروع می‌شود.
+
+    Returns:
+        tuple | None: (identifier, sequence) یا None اگر بسته echo reply معتبر نباشد.
+    """
+    if raw:
+        if not data:
+            return None
+        data = data[(data[0] & 0x0F) * 4:]  # حذف هدر IP
+    if len(data) < ICMP_HEADER.size:
+        return None
+    kind, _, _, identifier, seq = ICMP_HEADER.unpack_from(data)
+    if kind != ICMP_ECHO_REPLY:
+        return None
+    return identifier, seq
+
+
+def _open_socket():
+    """
+    سوکت ICMP را باز می‌کند: اول raw (نیاز به root یا CAP_NET_RAW)، در غیر این صورت
+    سوکت datagram بدون امتیاز (لینوکس، وقتی gid در net.ipv4.ping_group_range باشد).
+
+    Returns:
+        tuple: (socket, raw) که raw یعنی بسته‌های دریافتی هدر IP دارند.
+
+    Raises:
+        OSError: اگر هیچ‌کدام از دو نوع سوکت قابل باز شدن نباشد.
+    """
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+    except PermissionError:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+
+
+class IcmpTransport:
+    """
+    ترنسپورت ICMP با یک سوکت مشترک برای همه مقصدها.
+
+    - همه پروب‌ها از یک سوکت باز فرستاده می‌شوند (ping3 برای هر بسته سوکت باز و بسته می‌کند).
+    - پاسخ‌ها با identifier و شماره ترتیب به پروب منتظر نسبت داده می‌شوند و خواندن
+      سوکت با add_reader روی همان event loop انجام می‌شود، بدون thread.
+    - زمان دریافت از timestamp کرنل (SO_TIMESTAMPNS) خوانده می‌شود، پس تاخیر
+      زمان‌بندی event loop در RTT اثر نمی‌گذارد. زمان ارسال درست قبل از sendto ثبت می‌شود.
+    - هر نمونه identifier یکتای خودش را در پروسس دارد، پس چند ترنسپورت همزمان پاسخ‌های
+      یکدیگر را نمی‌گیرند. آدرس مقصدها resolve_ttl ثانیه کش می‌شود.
+    """
+
+    def __init__(self, resolve_ttl=RESOLVE_TTL):
+        """
+        Args:
+            resolve_ttl (float): بعد از این مدت (ثانیه) نام مقصد دوباره resolve می‌شود.
+
+        Raises:
+            OSError: اگر باز کردن سوکت ICMP مجاز نباشد.
+        """
+        self._sock, self._raw = _open_socket()
+        self._sock.setblocking(False)
+        # با صدها پروب در جریان، بافر پیش‌فرض دریافت پر می‌شود و پاسخ‌ها دور ریخته می‌شوند
+        try:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+        except OSError:
+            pass
+        self._kernel_timestamps = False
+        if SO_TIMESTAMPNS is not None:
+            try:
+                self._sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                self._kernel_timestamps = True
+            except OSError:
+                pass
+        # در سوکت datagram کرنل identifier را با شماره پورت محلی جایگزین می‌کند
+        self._identifier = _allocate_identifier()
+        self._seq = 0
+        self._pending = {}  # seq -> (future, target_ip, send_ns)
+        self.resolve_ttl = resolve_ttl
+        self._addresses = {}  # target -> (address, زمان انقضا روی ساعت monotonic)
+        self._loop = None
+
+    @property
+    def mode(self):
+        return 'raw' if self._raw else 'dgram'
+
+    def _attach(self, loop):
+        """خواندن سوکت را روی event loop جاری ثبت می‌کند (run_sync هر بار loop تازه می‌سازد)."""
+        if self._loop is loop:
+            return
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self._sock)
+        self._pending.clear()
+        self._loop = loop
+        loop.add_reader(self._sock, self._on_readable)
+
+    async def _resolve(self, target):
+        cached = self._addresses.get(target)
+        now = time.monotonic()
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        try:
+            infos = await self._loop.getaddrinfo(target, None, family=socket.AF_INET)
+        except OSError:
+            if cached is None:
+                raise
+            return cached[0]  # DNS موقتاً در دسترس نیست؛ آدرس قبلی تا resolve بعدی
+        address = infos[0][4][0]
+        self._addresses[target] = (address, now + self.resolve_ttl)
+        return address
+
+    def _next_seq(self):
+        # شماره‌هایی که هنوز منتظر پاسخ‌اند دوباره استفاده نمی‌شوند
+        for _ in range(0x10000):
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._pending:
+                return self._seq
+        raise RuntimeError("All ICMP sequence numbers are in flight")
+
+    async def probe(self, target, timeout):
+        """
+        یک echo request به target می‌فرستد.
+
+        Returns:
+            float | None: زمان رفت و برگشت (میلی‌ثانیه) یا None در صورت timeout.
+        """
+        self._attach(asyncio.get_running_loop())
+        address = await self._resolve(target)
+        seq = self._next_seq()
+        header = ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, self._identifier, seq)
+        checksum = _checksum(header + PAYLOAD)
+        packet = ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, self._identifier, seq) + PAYLOAD
+
+        future = self._loop.create_future()
+        self._pending[seq] = (future, address, time.time_ns())
+        try:
+            if metrics.enabled:
+                with metrics.timer('probe_send', probe='icmp'):
+                    self._sock.sendto(packet, (address, 0))
+            else:
+                self._sock.sendto(packet, (address, 0))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop(seq, None)
+
+    def _on_readable(self):
+        # همه بسته‌های آماده یکجا خوانده می‌شوند
+        while True:
+            try:
+                data, ancdata, _, (source, _) = self._sock.recvmsg(1024, socket.CMSG_SPACE(TIMESPEC.size))
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            receive_ns = None
+            for level, kind, value in ancdata:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(value) >= TIMESPEC.size:
+                    seconds, nanoseconds = TIMESPEC.unpack_from(value)
+                    receive_ns = seconds * 1_000_000_000 + nanoseconds
+            if receive_ns is None:
+                receive_ns = time.time_ns()
+            if metrics.enabled:
+                with metrics.timer('probe_recv', probe='icmp'):
+                    self._dispatch(data, source, receive_ns)
+            else:
+                self._dispatch(data, source, receive_ns)
+
+    def _dispatch(self, data, source, receive_ns):
+        reply = parse_echo_reply(data, self._raw)
+        if reply is None:
+            return
+        identifier, seq = reply
+        # سوکت raw همه پاسخ‌های ICMP سیستم (و روی loopback درخواست‌های خودمان) را هم می‌بیند
+        if self._raw and identifier != self._identifier:
+            return
+        entry = self._pending.get(seq)
+        if entry is None:
+            return
+        future, address, send_ns = entry
+        if address != source or future.done():
+            return
+        future.set_result(max(0.0, (receive_ns - send_ns) / 1e6))
+
+    def close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self._sock)
+        self._loop = None
+        self._sock.close()
+        if self._identifier is not None:
+            _release_identifier(self._identifier)
+            self._identifier = None
@@ -0,0 +1,169 @@
+import threading
+import time
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size numpy ring buffer of (time, value) samples."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.full(capacity, np.nan)
+        self.values = np.full(capacity, np.nan)
+        self.size = 0
+        self._head = 0  # next write position
+
+    def extend(self, times, values):
+        """Append many samples at once (vectorized, wraps around)."""
+        times = np.asarray(times, dtype=np.float64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+        n = len(times)
+        if n == 0:
+            return
+        first = min(n, self.capacity - self._head)
+        self.times[self._head:self._head + first] = times[:first]
+        self.values[self._head:self._head + first] = values[:first]
+        rest = n - first
+        if rest:
+            self.times[:rest] = times[first:]
+            self.values[:rest] = values[first:]
+        self._head = (self._head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def append(self, t, value):
+        self.extend([t], [value])
+
+    def view(self):
+        """Return (times, values) in chronological order."""
+        if self.size < self.capacity:
+            return self.times[:self.size], self.values[:self.size]
+        order = np.r_[self._head:self.capacity, 0:self._head]
+        return self.times[order], self.values[order]
+
+
+class LiveChart:
+    """
+    Live latency / loss chart drawn with blitting.
+
+    Samples are pushed from any thread with push(); draw_frame() is meant to
+    be called from the GUI loop at a capped frame rate. Each frame drains all
+    pending samples into per-target ring buffers and only redraws the line
+    artists on top of a cached background. A full redraw happens only when
+    the latency axis needs rescaling or the canvas was resized.
+    """
+
+    def __init__(self, figure, canvas, window=120.0, capacity=2048, loss_window=20):
+        """
+        Args:
+            figure: matplotlib Figure to draw into.
+            canvas: The figure's canvas (FigureCanvasTkAgg, or FigureCanvasAgg headless).
+            window (float): Seconds of history shown on the x axis.
+            capacity (int): Samples kept per target.
+            loss_window (int): Number of recent probes used for the rolling loss percentage.
+        """
+        self.figure = figure
+        self.canvas = canvas
+        self.window = window
+        self.capacity = capacity
+        self.loss_window = loss_window
+
+        self.latency_ax, self.loss_ax = figure.subplots(2, 1, sharex=True,
+                                                        gridspec_kw={'height_ratios': [3, 1]})
+        self.latency_ax.set_ylabel('Latency (ms)')
+        self.latency_ax.set_xlim(-window, 0)
+        self.latency_ax.set_ylim(0, 100)
+        self.latency_ax.grid(True, alpha=0.3)
+        self.loss_ax.set_ylabel('Loss (%)')
+        self.loss_ax.set_xlabel('Seconds ago')
+        self.loss_ax.set_ylim(0, 105)
+        self.loss_ax.grid(True, alpha=0.3)
+        figure.tight_layout()
+
+        self._buffers = {}
+        self._lines = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._background = None
+        self._needs_full_draw = True
+        canvas.mpl_connect('resize_event', self._on_resize)
+
+    def _on_resize(self, event):
+        self._needs_full_draw = True
+
+    def push(self, target, delay, t=None):
+        """Queue one sample (thread-safe). delay is None for a lost probe."""
+        with self._lock:
+            self._pending.append((target, time.time() if t is None else t,
+                                  np.nan if delay is None else delay))
+
+    def _add_target(self, target):
+        self._buffers[target] = RingBuffer(self.capacity)
+        latency_line, = self.latency_ax.plot([], [], lw=1.2, label=target, animated=True)
+        loss_line, = self.loss_ax.plot([], [], lw=1.0, color=latency_line.get_color(), animated=True)
+        self._lines[target] = (latency_line, loss_line)
+        self.latency_ax.legend(loc='upper left', fontsize='small')
+        self._needs_full_draw = True
+
+    def _drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        by_target = {}
+        for target, t, value in pending:
+            by_target.setdefault(target, ([], []))
+            by_target[target][0].append(t)
+            by_target[target][1].append(value)
+        for target, (times, values) in by_target.items():
+            if target not in self._buffers:
+                self._add_target(target)
+            self._buffers[target].extend(times, values)
+        return len(pending)
+
+    def _update_lines(self, now):
+        peak = 0.0
+        for target, buffer in self._buffers.items():
+            times, values = buffer.view()
+            x = times - now
+            lost = np.isnan(values).astype(np.float64)
+            # rolling loss percentage over the last loss_window probes; the first points divide
+            # by the probes actually seen so far, not by the full window
+            cumulative = np.concatenate(([0.0], np.cumsum(lost)))
+            ends = np.arange(1, len(lost) + 1)
+            starts = np.maximum(0, ends - self.loss_window)
+            loss = (cumulative[ends] - cumulative[starts]) / (ends - starts) * 100
+            latency_line, loss_line = self._lines[target]
+            latency_line.set_data(x, values)
+            loss_line.set_data(x, loss)
+            visible = values[x >= -self.window]
+            if visible.size and not np.all(np.isnan(visible)):
+                peak = max(peak, float(np.nanmax(visible)))
+        return peak
+
+    def draw_frame(self, now=None):
+        """
+        Drain pending samples and redraw. Returns the number of samples consumed.
+        """
+        consumed = self._drain()
+        if not self._buffers:
+            return consumed
+        peak = self._update_lines(time.time() if now is None else now)
+
+        # rescale (full redraw) only when the data leaves the axis or uses a small part of it
+        _, top = self.latency_ax.get_ylim()
+        if peak > top or (peak > 0 and peak < top * 0.3 and top > 10):
+            self.latency_ax.set_ylim(0, max(10.0, peak * 1.5))
+            self._needs_full_draw = True
+
+        if self._needs_full_draw or self._background is None:
+            self.canvas.draw()
+            self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self._needs_full_draw = False
+        else:
+            self.canvas.restore_region(self._background)
+        for latency_line, loss_line in self._lines.values():
+            self.latency_ax.draw_artist(latency_line)
+            self.loss_ax.draw_artist(loss_line)
+        self.canvas.blit(self.figure.bbox)
+        return consumed
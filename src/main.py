@@ -1,8 +1,32 @@
-from tester import NetworkTester
-from storage import ResultStorage
-
 import argparse
 
+# ماژول‌های سنگین (speedtest، ping3، matplotlib، pandas) فقط داخل زیرفرمانی که به آن‌ها
+# نیاز دارد import می‌شوند تا اجرای ping یا history سریع شروع شود.
+
+
+def print_summary(connection_name, ping_results, speed_results=None):
+    """Print the summary block shown at the end of a test."""
+    print("\n--- SUMMARY RESULTS ---")
+    print(f"Connection: {connection_name}")
+    print(f"Average Latency: {ping_results['avg_latency']:.2f} ms")
+    print(f"P95 Latency: {ping_results['p95_latency']:.2f} ms")
+    print(f"Jitter: {ping_results['jitter']:.2f} ms (RFC 3550: {ping_results['rfc3550_jitter']:.2f} ms)")
+    print(f"Packet Loss: {ping_results['packet_loss']:.0f}%")
+    sampling = ping_results.get('sampling')
+    if sampling:
+        triggers = ', '.join(f"{k} {v}" for k, v in sampling['triggers'].items() if v) or 'none'
+        print(f"Sampling: {sampling['sent']} probes ({sampling['dense']} dense, "
+              f"{sampling['deferred']} deferred by budget), triggers: {triggers}")
+    if speed_results is None:
+        return
+    print(f"Download Speed: {speed_results['download_speed']} Mbps")
+    print(f"Upload Speed: {speed_results['upload_speed']} Mbps")
+    intervals = speed_results.get('intervals')
+    if intervals:
+        for direction in ('download', 'upload'):
+            values = ' '.join(f"{v:.1f}" for v in intervals[f"{direction}_mbps"])
+            print(f"  {direction.capitalize()} per interval (Mbps): {values}")
+
 
 # def main():
 def console_main():
@@ -14,9 +38,14 @@ def console_main():
 
     print("="*50)
 
+    from tester import NetworkTester
+    from storage import ResultStorage
+    from writer import BufferedResultWriter
+
     # ۱. ایجاد نمونه‌ها
     tester = NetworkTester()
     storage = ResultStorage()
+    writer = BufferedResultWriter(storage)  # نوشتن روی دیسک در پس‌زمینه
 
     # ۲. گرفتن نام اتصال از کاربر
     # connection_name = input("لطفاً یک نام برای این اتصال شبکه وارد کنید (مثلاً Irancell-NearWindow): ").strip()
@@ -27,7 +56,8 @@ def console_main():
     # ۳. اجرای تست پینگ
     # print("\n--- مرحله ۱: اجرای تست پینگ ---")
     print("--- Step 1: Running Ping Test ---")
-    ping_results = tester.run_ping_test(count=10) # میتوانید count را افزایش دهید
+    # نمونه‌های خام هر پینگ هم در کنار خلاصه نتایج ثبت می‌شوند
+    ping_results = tester.run_ping_test(count=10, on_sample=storage.record_sample) # میتوانید count را افزایش دهید
 
     # ۴. اجرای تست سرعت
     # print("\n--- مرحله ۲: اجرای تست سرعت ---")
@@ -39,7 +69,7 @@ def console_main():
     # print("[+] در حال ذخیره نتایج...")
     print("\n --- Step 3: Saving Results ---")
     print("[+] Saving results...")
-    storage.save_result(connection_name, ping_results, speed_results)
+    writer.save_result(connection_name, ping_results, speed_results, probe_type=tester.probe_type)
 
     # ۶. نمایش خلاصه نتایج به کاربر
 
@@ -52,23 +82,296 @@ def console_main():
     # print(f"سرعت آپلود: {speed_results['upload_speed']} Mbps")
     # print("\nبرنامه با موفقیت به پایان رسید!")
 
-    print("\n--- SUMMARY RESULTS ---")
-    print(f"Connection: {connection_name}")
-    print(f"Average Latency: {ping_results['avg_latency']:.2f} ms")
-    print(f"Jitter: {ping_results['jitter']:.2f} ms")
-    print(f"Packet Loss: {ping_results['packet_loss']:.0f}%")
-    print(f"Download Speed: {speed_results['download_speed']} Mbps")
-    print(f"Upload Speed: {speed_results['upload_speed']} Mbps")
+    print_summary(connection_name, ping_results, speed_results)
+
+    # خروج فقط بعد از نوشته شدن همه نتایج صف
+    writer.close()
+    storage.close()
+    print(f"[+] Results saved to '{storage.data_dir}' ({writer.report()}).")
     print("\nProgram completed successfully!")
 
-# نقطه ورود اسکریپت
-if __name__ == "__main__":
+def ping_main(args):
+    """Non-interactive ping test of one or more targets."""
+    from probes import make_probe
+    from tester import NetworkTester
+
+    transport = make_probe(args.probe, port=args.port, path=args.path, query_name=args.query)
+    tester = NetworkTester(args.target[0], transport=transport)
+    storage = None if args.no_save else open_storage(args)
+    on_sample = storage.record_sample if storage is not None else None
+    samplers, budget = {}, None
+    if args.adaptive:
+        from adaptive import AdaptiveSampler, ProbeBudget
+        samplers = {t: AdaptiveSampler(min_interval=args.interval,
+                                       max_interval=args.max_interval or args.interval * 10)
+                    for t in args.target}
+        budget = ProbeBudget(args.budget) if args.budget else None
+    if len(args.target) == 1:
+        results = {args.target[0]: tester.run_ping_test(count=args.count, interval=args.interval,
+                                                        on_sample=on_sample, budget=budget,
+                                                        sampler=samplers.get(args.target[0]))}
+    else:
+        results = tester.run_multi_ping_test(args.target, count=args.count, interval=args.interval,
+                                             on_sample=on_sample, samplers=samplers, budget=budget)
+    tester.engine.close()
+
+    for target, ping_results in results.items():
+        name = args.name or target
+        if len(results) > 1 and args.name:
+            name = f"{args.name}/{target}"
+        print_summary(name, ping_results)
+        if storage is not None:
+            storage.save_result(name, ping_results, {'download_speed': 0.0, 'upload_speed': 0.0},
+                                probe_type=tester.probe_type)
+    if storage is not None:
+        storage.close()
+        print(f"[+] Results saved to '{storage.data_dir}'.")
+
+
+def speed_main(args):
+    """Non-interactive full test: ping followed by a speed test."""
+    from tester import NetworkTester
+
+    speed_target = None
+    if args.server:
+        from throughput import DEFAULT_PORT, ThroughputClient
+        host, _, port = args.server.partition(':')
+        speed_target = ThroughputClient(host, int(port or DEFAULT_PORT), streams=args.streams or 4,
+                                        duration=args.duration)
+    tester = NetworkTester(args.target, speed_target=speed_target, speed_streams=args.streams)
+    storage = None if args.no_save else open_storage(args)
+    ping_results = tester.run_ping_test(count=args.count,
+                                        on_sample=storage.record_sample if storage is not None else None)
+    speed_results = tester.run_speed_test()
+    tester.engine.close()
+
+    print_summary(args.name, ping_results, speed_results)
+    if storage is not None:
+        storage.save_result(args.name, ping_results, speed_results, probe_type=tester.probe_type)
+        storage.close()
+        print(f"[+] Results saved to '{storage.data_dir}'.")
+
+
+def serve_main(args):
+    """Run the built-in throughput server for `speed --server`."""
+    from throughput import ThroughputServer
+    ThroughputServer(args.bind, args.port, udp=not args.no_udp, max_duration=args.max_duration).serve_forever()
+
+
+def history_main(args):
+    """Print the most recent stored results, or a time range via the rollup tiers."""
+    storage = open_storage(args)
+    if args.since:
+        try:
+            rollup_history(storage, args)
+        finally:
+            storage.close()
+        return
+    results = storage.tail(args.n or 10, args.connection)
+    storage.close()
+
+    print(f"{'Timestamp':<17} {'Connection':<24} {'Probe':<5} {'Latency':>9} {'Loss':>6} {'Down':>8} {'Up':>8}")
+    for result in reversed(results):
+        ping = result.get('ping') or {}
+        speed = result.get('speed') or {}
+        print(f"{result['timestamp'][:16]:<17} {result['connection_name'][:24]:<24} "
+              f"{result.get('probe_type', 'icmp'):<5} "
+              f"{ping.get('avg_latency', 0.0):>9.1f} {ping.get('packet_loss', 0.0):>5.0f}% "
+              f"{speed.get('download_speed', 0.0):>8} {speed.get('upload_speed', 0.0):>8}")
+
+
+def rollup_history(storage, args):
+    """Print results since --since; long ranges come from the rollup tiers."""
+    from datetime import datetime
+    from rollup import Rollup
+
+    resolution, rows = Rollup(storage).query(args.connection, datetime.fromisoformat(args.since))
+    if args.n:
+        rows = rows[-args.n:]
+    if resolution == 'raw':
+        rows = [{'bucket': r['timestamp'], 'connection_name': r['connection_name'], 'count': 1,
+                 'mean_latency': (r.get('ping') or {}).get('avg_latency'),
+                 'p99_latency': (r.get('ping') or {}).get('p99_latency'),
+                 'packet_loss': (r.get('ping') or {}).get('packet_loss'),
+                 'download_speed': (r.get('speed') or {}).get('download_speed') or None,
+                 'upload_speed': (r.get('speed') or {}).get('upload_speed') or None} for r in rows]
+
+    def number(value, width, digits=1):
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    print(f"Resolution: {resolution}")
+    print(f"{'Time':<17} {'Connection':<24} {'Tests':>5} {'Latency':>9} {'P99':>9} {'Loss':>6} "
+          f"{'Down':>8} {'Up':>8}")
+    for row in rows:
+        print(f"{row['bucket'][:16]:<17} {row['connection_name'][:24]:<24} {row['count']:>5} "
+              f"{number(row['mean_latency'], 9)} {number(row['p99_latency'], 9)} "
+              f"{number(row['packet_loss'], 5, 0)}% "
+              f"{number(row['download_speed'], 8, 2)} {number(row['upload_speed'], 8, 2)}")
+
+
+def samples_main(args):
+    """Summarize raw per-probe samples in a time window and list the slowest ones."""
+    import os
+    from datetime import datetime
+    import numpy as np
+    from samples import STATUS_NAMES, STATUS_OK, SampleStore
+
+    store = SampleStore(os.path.join(args.data_dir, 'samples'))
+    start = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    end = datetime.fromisoformat(args.until).timestamp() if args.until else None
+    records = store.window(start, end, target=args.target)
+    if not len(records):
+        print("[-] No samples in this window.")
+        return
+
+    names = store.targets()
+    ok = records[records['status'] == STATUS_OK]
+    print(f"Samples: {len(records)}  lost: {100 * (1 - len(ok) / len(records)):.2f}%")
+    if len(ok):
+        p50, p95, p99 = np.percentile(ok['rtt'], [50, 95, 99])
+        print(f"RTT ms  p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}  max {ok['rtt'].max():.2f}")
+    print(f"\n{'Time':<23} {'Target':<24} {'RTT':>9} Status")
+    for record in ok[np.argsort(ok['rtt'])[::-1][:args.top]]:
+        print(f"{datetime.fromtimestamp(record['timestamp']).isoformat(timespec='milliseconds'):<23} "
+              f"{names.get(int(record['target']), '?')[:24]:<24} {record['rtt']:>9.2f} "
+              f"{STATUS_NAMES[int(record['status'])]}")
+
+
+def open_storage(args):
+    from storage import ResultStorage
+    return ResultStorage(data_dir=args.data_dir, backend=args.backend)
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description='NetSpector Network Monitoring Tool')
     parser.add_argument('--gui', action='store_true', help='Run in GUI mode')
-    args = parser.parse_args()
+    subparsers = parser.add_subparsers(dest='command')
+
+    # گزینه‌های مشترک ذخیره‌سازی
+    storage_args = argparse.ArgumentParser(add_help=False)
+    storage_args.add_argument('--data-dir', default='../data', help='Results directory')
+    storage_args.add_argument('--backend', default='log', choices=['log', 'sqlite', 'json'])
+
+    ping_parser = subparsers.add_parser('ping', parents=[storage_args], help='Run a ping test')
+    ping_parser.add_argument('target', nargs='*', default=['8.8.8.8'],
+                             help='Hosts to ping (default: 8.8.8.8)')
+    ping_parser.add_argument('-c', '--count', type=int, default=10, help='Pings per target')
+    ping_parser.add_argument('-i', '--interval', type=float, default=0.5, help='Seconds between pings')
+    ping_parser.add_argument('--name', help='Connection name to store results under')
+    ping_parser.add_argument('--no-save', action='store_true', help='Do not store the results')
+    ping_parser.add_argument('--probe', default='icmp', choices=['icmp', 'tcp', 'udp', 'dns', 'http'],
+                             help='Probe type (default: icmp)')
+    ping_parser.add_argument('--port', type=int, help='Port for tcp/udp/dns/http probes')
+    ping_parser.add_argument('--path', help='Request path for http probes (default: /)')
+    ping_parser.add_argument('--query', help='Name to resolve for dns probes (default: example.com)')
+    ping_parser.add_argument('--adaptive', action='store_true',
+                             help='Probe sparsely while the link is stable and densely on jitter, loss or '
+                                  'a level change, within a window of count x interval seconds')
+    ping_parser.add_argument('--max-interval', type=float,
+                             help='Longest gap between adaptive probes (default: 10 x interval)')
+    ping_parser.add_argument('--budget', type=float, help='Global cap on adaptive probes per second')
 
-    if args.gui:
-        from gui import main
-        main()
+    speed_parser = subparsers.add_parser('speed', parents=[storage_args],
+                                         help='Run a full ping + speed test')
+    speed_parser.add_argument('--name', default='Unknown-Connection', help='Connection name')
+    speed_parser.add_argument('--target', default='8.8.8.8', help='Host to ping')
+    speed_parser.add_argument('-c', '--count', type=int, default=10, help='Number of pings')
+    speed_parser.add_argument('--no-save', action='store_true', help='Do not store the results')
+    speed_parser.add_argument('--server', metavar='HOST[:PORT]',
+                              help='Measure against a NetSpector throughput server instead of speedtest.net')
+    speed_parser.add_argument('--streams', type=int, help='Parallel streams')
+    speed_parser.add_argument('--duration', type=float, default=5.0,
+                              help='Seconds per direction with --server (default: 5)')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the throughput server')
+    serve_parser.add_argument('--bind', default='0.0.0.0', help='Address to listen on')
+    serve_parser.add_argument('--port', type=int, default=5201, help='TCP/UDP port (default: 5201)')
+    serve_parser.add_argument('--no-udp', action='store_true', help='Only serve TCP streams')
+    serve_parser.add_argument('--max-duration', type=float, default=60.0,
+                              help='Longest stream a client may request, in seconds (default: 60)')
+
+    history_parser = subparsers.add_parser('history', parents=[storage_args],
+                                           help='Show the most recent results')
+    history_parser.add_argument('-n', type=int, help='Number of results to show '
+                                '(default: 10, or all of the --since range)')
+    history_parser.add_argument('--connection', help='Only show this connection')
+    history_parser.add_argument('--since', help='Show results since this ISO date; long ranges are '
+                                'read from the rollup tiers (1min/1h/1d buckets)')
+
+    samples_parser = subparsers.add_parser('samples', parents=[storage_args],
+                                           help='Inspect raw per-probe samples in a time window')
+    samples_parser.add_argument('--since', help='Window start (ISO date/time)')
+    samples_parser.add_argument('--until', help='Window end (ISO date/time)')
+    samples_parser.add_argument('--target', help='Only this target')
+    samples_parser.add_argument('--top', type=int, default=10, help='Number of slowest samples to list')
+
+    subparsers.add_parser('gui', help='Run the graphical interface')
+
+    monitor_parser = subparsers.add_parser('monitor', help='Run headless continuous monitoring')
+    monitor_parser.add_argument('config', help='Path to the monitor JSON config file')
+    monitor_parser.add_argument('--metrics-port', type=int,
+                                help='Serve OpenMetrics on this port at /metrics (overrides the config)')
+    monitor_parser.add_argument('--metrics-host',
+                                help='Address for /metrics (default: the config, else 127.0.0.1; '
+                                     'use 0.0.0.0 to allow remote scrapes)')
+
+    fleet_parser = subparsers.add_parser('fleet', help='Run monitoring sharded across worker processes')
+    fleet_parser.add_argument('config', help='Path to the monitor JSON config file')
+    fleet_parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: CPU count)')
+    fleet_parser.add_argument('--metrics-port', type=int,
+                              help='Serve OpenMetrics at /metrics on this port (workers use the next ports)')
+    fleet_parser.add_argument('--metrics-host',
+                              help='Address for /metrics (default: the config, else 127.0.0.1; '
+                                   'use 0.0.0.0 to allow remote scrapes)')
+
+    compact_parser = subparsers.add_parser('compact', parents=[storage_args],
+                                           help='Roll up stored results and prune old raw data')
+    compact_parser.add_argument('--retention-days', type=float, default=7,
+                                help='Days of raw results to keep (default: 7)')
+
+    analyze_parser = subparsers.add_parser('analyze', parents=[storage_args],
+                                           help='Analyze stored results')
+    analyze_parser.add_argument('report', nargs='?', default='summary',
+                                choices=['summary', 'profile', 'trend', 'anomalies'])
+    analyze_parser.add_argument('--connection', help='Only analyze this connection')
+    analyze_parser.add_argument('--since', help='Only analyze results since this ISO date')
+    analyze_parser.add_argument('--csv', help='Also write the report to this CSV file')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'ping':
+        ping_main(args)
+    elif args.command == 'speed':
+        speed_main(args)
+    elif args.command == 'history':
+        history_main(args)
+    elif args.command == 'samples':
+        samples_main(args)
+    elif args.command == 'serve':
+        serve_main(args)
+    elif args.command == 'monitor':
+        from monitor import run_monitor
+        run_monitor(args.config, args.metrics_port, args.metrics_host)
+    elif args.command == 'fleet':
+        from fleet import run_fleet
+        run_fleet(args.config, args.workers, args.metrics_port, args.metrics_host)
+    elif args.command == 'compact':
+        from rollup import run_compaction
+        run_compaction(args.data_dir, args.backend, args.retention_days)
+    elif args.command == 'analyze':
+        from analytics import run_analysis
+        run_analysis(args.data_dir, args.backend, args.report, args.connection, args.since, args.csv)
+    elif args.command == 'gui' or args.gui:
+        from gui import main as gui_main
+        gui_main()
     else:
-        console_main()
\ No newline at end of file
+        # بدون زیرفرمان: همان حالت تعاملی قبلی
+        console_main()
+
+
+# نقطه ورود اسکریپت
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import bisect
+import threading
+import time
+
+# تا enable() صدا زده نشود هیچ چیز ثبت نمی‌شود؛ مسیرهای داغ (هر پروب) قبل از ساختن
+# برچسب‌ها همین متغیر را چک می‌کنند، پس هزینه حالت خاموش یک lookup است.
+enabled = False
+
+# مرزهای سطل‌های هیستوگرام زمان مراحل (ثانیه)، از ده میکروثانیه تا یک دقیقه
+BUCKETS = (1e-05, 5e-05, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+# سرور /metrics پیش‌فرض فقط روی loopback گوش می‌دهد؛ برای scrape از ماشین دیگر
+# host باید صریحاً (مثلاً '0.0.0.0') تنظیم شود
+DEFAULT_HOST = '127.0.0.1'
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+COUNTERS = {
+    'probes': 'Probes sent.',
+    'probe_timeouts': 'Probes without a reply before the timeout.',
+    'probe_errors': 'Probes that failed with an error.',
+    'results': 'Test results written to storage.',
+    'speed_tests': 'Speed tests run.',
+    'speed_test_errors': 'Speed tests that failed.',
+}
+
+# gaugeهای نتایج شبکه: (نام خانواده، توضیح)
+RESULT_GAUGES = (
+    ('netspector_latency_milliseconds', 'Latency of the last result by statistic.'),
+    ('netspector_jitter_milliseconds', 'Jitter of the last result (stdev or RFC 3550).'),
+    ('netspector_packet_loss_ratio', 'Packet loss of the last result (0-1).'),
+    ('netspector_download_bits_per_second', 'Download speed of the last speed test.'),
+    ('netspector_upload_bits_per_second', 'Upload speed of the last speed test.'),
+    ('netspector_last_result_timestamp_seconds', 'Time of the last result.'),
+)
+LATENCY_STATS = ('avg', 'min', 'max', 'p50', 'p95', 'p99')
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        # یک خانه اضافه برای مقادیر بزرگ‌تر از آخرین مرز (+Inf)
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer:
+    __slots__ = ('phase', 'labels', 'start')
+
+    def __init__(self, phase, labels):
+        self.phase = phase
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.phase, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+_NOOP = _NoopTimer()
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (phase, labels) -> _Histogram
+_results = {}     # (connection, probe) -> (ping, speed, timestamp)
+_collectors = []
+
+
+def enable():
+    """ثبت شاخص‌ها را روشن می‌کند (معمولاً همراه با MetricsServer)."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """همه مقادیر ثبت‌شده را پاک می‌کند (برای بنچمارک‌ها)."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _results.clear()
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def count(name, value=1, **labels):
+    """شمارنده name (یکی از COUNTERS) را با برچسب‌های داده‌شده افزایش می‌دهد."""
+    if not enabled:
+        return
+    key = (name, _key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(phase, seconds, **labels):
+    """مدت یک مرحله (ثانیه) را در هیستوگرام netspector_phase_seconds ثبت می‌کند."""
+    if not enabled:
+        return
+    key = (phase, _key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.observe(seconds)
+
+
+def timer(phase, **labels):
+    """
+    context manager که مدت بلوک را برای phase ثبت می‌کند؛ در حالت خاموش یک شیء بی‌اثر مشترک.
+
+        with metrics.timer('storage_write'):
+            ...
+    """
+    if not enabled:
+        return _NOOP
+    return _Timer(phase, labels)
+
+
+def record_result(connection_name, ping_results, speed_results, probe_type='icmp', timestamp=None):
+    """آخرین نتیجه هر اتصال/نوع پروب را برای صادر شدن به صورت gauge نگه می‌دارد."""
+    if not enabled:
+        return
+    with _lock:
+        _results[connection_name, probe_type] = (ping_results, speed_results,
+                                                 time.time() if timestamp is None else timestamp)
+        key = ('results', ())
+        _counters[key] = _counters.get(key, 0) + 1
+
+
+def add_collector(collect):
+    """
+    شاخص‌های لحظه‌ای (مثلاً عمق صف نویسنده) را اضافه می‌کند.
+
+    Args:
+        collect (callable): بدون آرگومان؛ لیستی از (نام، help، {labels}، مقدار) برمی‌گرداند
+            که هنگام render به صورت gauge نوشته می‌شوند؛ نام‌هایی که با _total تمام می‌شوند
+            مقدار تجمعی اند و به صورت counter نوشته می‌شوند.
+    """
+    _collectors.append(collect)
+
+
+def remove_collector(collect):
+    if collect in _collectors:
+        _collectors.remove(collect)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _result_samples(results):
+    """نمونه‌های gauge نتایج شبکه به ترتیب RESULT_GAUGES."""
+    families = {name: [] for name, _ in RESULT_GAUGES}
+    for (connection, probe), (ping, speed, timestamp) in sorted(results.items()):
+        base = (('connection', connection), ('probe', probe))
+        families['netspector_last_result_timestamp_seconds'].append((base, timestamp))
+        if ping.get('packet_loss') is not None:
+            families['netspector_packet_loss_ratio'].append((base, ping['packet_loss'] / 100))
+        # تست‌های فقط-پینگ سرعت را 0 ذخیره می‌کنند؛ یعنی اندازه‌گیری نشده
+        for field, name in (('download_speed', 'netspector_download_bits_per_second'),
+                            ('upload_speed', 'netspector_upload_bits_per_second')):
+            if speed and speed.get(field):
+                families[name].append((base, speed[field] * 1_000_000))
+        if ping.get('packet_loss') == 100:
+            continue  # بدون هیچ پاسخی تاخیر 0 ثبت شده که نباید به عنوان تاخیر صادر شود
+        for stat in LATENCY_STATS:
+            value = ping.get(f'{stat}_latency')
+            if value is not None:
+                families['netspector_latency_milliseconds'].append((base + (('stat', stat),), value))
+        for kind, field in (('stdev', 'jitter'), ('rfc3550', 'rfc3550_jitter')):
+            if ping.get(field) is not None:
+                families['netspector_jitter_milliseconds'].append((base + (('kind', kind),), ping[field]))
+    return families
+
+
+def render():
+    """
+    همه شاخص‌ها را در قالب متنی OpenMetrics برمی‌گرداند.
+
+    Returns:
+        str: شامل شمارنده‌ها (netspector_<name>_total)، هیستوگرام netspector_phase_seconds،
+            gaugeهای نتایج شبکه، gaugeها و counterهای collectorها و خط پایانی '# EOF'.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(h.counts), h.count, h.sum) for key, h in _histograms.items()}
+        results = dict(_results)
+    lines = []
+    for name, help_text in COUNTERS.items():
+        family = f'netspector_{name}'
+        samples = sorted((labels, value) for (n, labels), value in counters.items() if n == name)
+        lines.append(f'# TYPE {family} counter')
+        lines.append(f'# HELP {family} {help_text}')
+        lines.extend(f'{family}_total{_labels(labels)} {_number(value)}' for labels, value in samples)
+
+    lines.append('# TYPE netspector_phase_seconds histogram')
+    lines.append('# HELP netspector_phase_seconds Time spent in each phase of probing, statistics, '
+                 'speed tests and storage.')
+    for (phase, labels), (counts, total, seconds) in sorted(histograms.items()):
+        labels = (('phase', phase),) + labels
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, counts):
+            cumulative += bucket
+            lines.append(f'netspector_phase_seconds_bucket{_labels(labels + (("le", _number(bound)),))} '
+                         f'{cumulative}')
+        lines.append(f'netspector_phase_seconds_bucket{_labels(labels + (("le", "+Inf"),))} {total}')
+        lines.append(f'netspector_phase_seconds_count{_labels(labels)} {total}')
+        lines.append(f'netspector_phase_seconds_sum{_labels(labels)} {_number(seconds)}')
+
+    families = _result_samples(results)
+    for family, help_text in RESULT_GAUGES:
+        lines.append(f'# TYPE {family} gauge')
+        lines.append(f'# HELP {family} {help_text}')
+        lines.extend(f'{family}{_labels(labels)} {_number(value)}' for labels, value in families[family])
+
+    collected = {}
+    for collect in list(_collectors):
+        for name, help_text, labels, value in collect():
+            collected.setdefault(name, (help_text, []))[1].append((_key(labels), value))
+    for name, (help_text, samples) in collected.items():
+        # در OpenMetrics خانواده counter بدون پسوند _total نام برده می‌شود
+        family, kind = (name[:-len('_total')], 'counter') if name.endswith('_total') else (name, 'gauge')
+        lines.append(f'# TYPE {family} {kind}')
+        lines.append(f'# HELP {family} {help_text}')
+        lines.extend(f'{name}{_labels(labels)} {_number(value)}' for labels, value in samples)
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    سرور HTTP سبک که render() را روی /metrics برمی‌گرداند (برای scrape با Prometheus).
+
+    در یک thread پس‌زمینه اجرا می‌شود و ثبت شاخص‌ها را روشن می‌کند.
+    """
+
+    def __init__(self, port=9108, host=DEFAULT_HOST):
+        """
+        Args:
+            port (int): پورت گوش دادن (0 یعنی یک پورت آزاد؛ پورت واقعی در self.port).
+            host (str): آدرس گوش دادن. پیش‌فرض فقط loopback؛ '0.0.0.0' شاخص‌ها را برای همه شبکه باز می‌کند.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # هر scrape در کنسول چاپ نشود
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        # فقط بعد از bind موفق؛ اگر پورت در دسترس نباشد ثبت شاخص‌ها روی مسیر داغ روشن نمی‌ماند
+        enable()
+        self.host = host
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='netspector-metrics',
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        print(f"[+] Metrics available at http://{self.host}:{self.port}/metrics")
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,368 @@
+import asyncio
+import json
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from engine import ProbeEngine
+from metrics import DEFAULT_HOST
+from storage import ResultStorage
+from writer import BufferedResultWriter
+
+DEFAULTS = {
+    'connection_name': 'Monitor',
+    'max_in_flight': 64,
+    'timeout': 1.0,
+    'start_jitter': 0.5,
+    'shutdown_grace': 5.0,
+    'storage': {},
+    'speed_test': None,
+    'compaction': None,
+    'probe_budget': None,   # سقف سراسری پروب در ثانیه برای مقصدهای تطبیقی
+    'metrics': None,        # {"port": 9108} برای سرور /metrics؛ "host": "0.0.0.0" برای دسترسی از شبکه
+}
+
+TARGET_DEFAULTS = {
+    'interval': 60.0,       # فاصله بین دورهای پروب (ثانیه)
+    'count': 10,            # تعداد پینگ در هر دور
+    'probe_interval': 0.5,  # فاصله بین پینگ‌های یک دور
+    'probe': 'icmp',        # نوع پروب: icmp، tcp، udp، dns یا http
+    'adaptive': False,      # نمونه‌برداری تطبیقی در پنجره count * probe_interval
+    'max_interval': None,   # بیشترین فاصله پروب‌های تطبیقی (پیش‌فرض ۱۰ برابر probe_interval)
+}
+
+NO_SPEED = {'download_speed': 0.0, 'upload_speed': 0.0}
+
+
+def load_config(path):
+    """
+    فایل پیکربندی حالت monitor را می‌خواند و مقادیر پیش‌فرض را اعمال می‌کند.
+
+    نمونه:
+        {
+            "connection_name": "Office-Uplink",
+            "storage": {"backend": "log", "fsync_every": 10},
+            "targets": [
+                {"host": "8.8.8.8", "interval": 30},
+                {"host": "1.1.1.1", "name": "Cloudflare", "interval": 60, "count": 5},
+                {"host": "1.1.1.1", "name": "Cloudflare-DNS", "probe": "dns", "query": "example.com"},
+                {"host": "example.com", "name": "Example-HTTP", "probe": "http", "port": 443},
+                {"host": "9.9.9.9", "adaptive": true, "max_interval": 10}
+            ],
+            "probe_budget": 200,
+            "speed_test": {"interval": 3600, "target": "8.8.8.8"},
+            "compaction": {"interval": 3600, "retention_days": 7},
+            "metrics": {"port": 9108}
+        }
+
+    Returns:
+        dict: پیکربندی کامل.
+
+    Raises:
+        ValueError: اگر پیکربندی ناقص یا نامعتبر باشد.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+
+    config = {**DEFAULTS, **raw}
+    targets = []
+    for item in raw.get('targets', []):
+        if isinstance(item, str):
+            item = {'host': item}
+        if 'host' not in item:
+            raise ValueError(f"Monitor target without 'host': {item!r}")
+        target = {**TARGET_DEFAULTS, **item}
+        target.setdefault('name', target['host'])
+        if target['probe'] not in ('icmp', 'tcp', 'udp', 'dns', 'http'):
+            raise ValueError(f"Target {target['host']!r} has an unknown probe type {target['probe']!r}")
+        if target['interval'] <= 0 or target['count'] <= 0:
+            raise ValueError(f"Target {target['host']!r} needs a positive interval and count")
+        if target['adaptive'] and target['probe_interval'] <= 0:
+            raise ValueError(f"Adaptive target {target['host']!r} needs a positive probe_interval")
+        targets.append(target)
+    if config['probe_budget'] is not None and config['probe_budget'] <= 0:
+        raise ValueError("probe_budget must be a positive number of probes per second")
+    if not targets and not config['speed_test']:
+        raise ValueError("Monitor config has no targets and no speed_test schedule")
+    config['targets'] = targets
+
+    if config['speed_test']:
+        speed = {'interval': 3600.0, 'count': 10, **config['speed_test']}
+        speed.setdefault('target', targets[0]['host'] if targets else '8.8.8.8')
+        speed.setdefault('name', config['connection_name'])
+        config['speed_test'] = speed
+
+    if config['compaction']:
+        config['compaction'] = {'interval': 3600.0, 'retention_days': 7, **config['compaction']}
+    if config['metrics']:
+        config['metrics'] = {'port': 9108, 'host': DEFAULT_HOST, **config['metrics']}
+    return config
+
+
+def override_metrics(config, port=None, host=None):
+    """
+    پورت و آدرس سرور /metrics را از خط فرمان روی پیکربندی اعمال می‌کند.
+
+    بدون host همان آدرس پیکربندی (پیش‌فرض loopback) می‌ماند؛ گوش دادن روی آدرس‌های
+    دیگر فقط با تنظیم صریح host ممکن است.
+    """
+    if port is None and host is None:
+        return
+    metrics = {'port': 9108, 'host': DEFAULT_HOST, **(config['metrics'] or {})}
+    if port is not None:
+        metrics['port'] = port
+    if host is not None:
+        metrics['host'] = host
+    config['metrics'] = metrics
+
+
+class Monitor:
+    """
+    حالت مانیتورینگ پیوسته: یک پروسس ماندگار که مقصدها را طبق زمان‌بندی پروب می‌کند.
+
+    - هر مقصد حلقه زمان‌بندی مستقل خودش را دارد و شروع آن به صورت تصادفی جابه‌جا
+      می‌شود تا همه مقصدها همزمان شروع نکنند.
+    - همه حلقه‌ها یک سمافور مشترک دارند، پس تعداد پروب‌های در جریان محدود است.
+    - مقصدهای adaptive با AdaptiveSampler نمونه‌برداری می‌شوند (وضعیت هر مقصد بین دورها
+      حفظ می‌شود) و همه آن‌ها در سقف مشترک probe_budget می‌مانند.
+    - تست سرعت با زمان‌بندی جداگانه (معمولاً کم‌تکرارتر) در یک thread اجرا می‌شود.
+    - در صورت تنظیم compaction، تجمیع و حذف داده‌های خام قدیمی هم دوره‌ای (در thread جداگانه)
+      اجرا می‌شود.
+    - در صورت تنظیم metrics، شاخص‌های ابزار و آخرین نتایج روی /metrics صادر می‌شوند.
+    - با SIGINT/SIGTERM دورهای در حال اجرا تا shutdown_grace ثانیه فرصت تمام شدن دارند
+      و سپس ذخیره‌سازی flush و بسته می‌شود.
+    """
+
+    def __init__(self, config, storage=None, tester=None, transport=None, buffered=True):
+        """
+        Args:
+            config (dict): خروجی load_config.
+            storage (ResultStorage): ذخیره‌سازی نتایج. پیش‌فرض از بخش storage پیکربندی ساخته می‌شود.
+            tester (NetworkTester): برای تست سرعت. پیش‌فرض هنگام نیاز ساخته می‌شود.
+            transport: ترنسپورت پروب (مثلاً FakeTransport). پیش‌فرض موتور ICMP (یا ping3 بدون دسترسی).
+            buffered (bool): نتایج از طریق BufferedResultWriter در پس‌زمینه نوشته شوند. False
+                یعنی save_result مستقیم روی storage (مثلاً وقتی storage خودش دسته‌ای می‌فرستد).
+        """
+        self.config = config
+        self.storage = storage if storage is not None else ResultStorage(**config['storage'])
+        self.writer = BufferedResultWriter(self.storage) if buffered else self.storage
+        self.tester = tester
+        self.engine = ProbeEngine(transport=transport, max_in_flight=config['max_in_flight'],
+                                  timeout=config['timeout'])
+        self._stop = None
+        self._semaphore = None
+        self._engines = {}
+        self._samplers = {}
+        self._budget = None
+        if config.get('probe_budget'):
+            from adaptive import ProbeBudget
+            self._budget = ProbeBudget(config['probe_budget'])
+        self._speed_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='netspector-speed')
+        # فشرده‌سازی thread خودش را دارد تا با تست سرعت منتظر هم نمانند
+        self._compaction_executor = ThreadPoolExecutor(max_workers=1,
+                                                       thread_name_prefix='netspector-compaction')
+        self._rollup = None
+        self.rounds = 0
+
+    def stop(self):
+        """درخواست توقف (از داخل event loop یا signal handler)."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _sleep_until(self, deadline):
+        """تا زمان deadline یا درخواست توقف صبر می‌کند. True یعنی باید متوقف شد."""
+        if self._stop.is_set():
+            # wait_for با مهلت صفر (دور عقب‌افتاده) حتی برای Event تنظیم‌شده timeout می‌دهد
+            return True
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _schedule(self, interval, job):
+        """job را هر interval ثانیه با شروع تصادفی جابه‌جاشده اجرا می‌کند."""
+        loop = asyncio.get_running_loop()
+        next_run = loop.time() + random.uniform(0, interval * self.config['start_jitter'])
+        while not await self._sleep_until(next_run):
+            try:
+                await job()
+            except Exception as e:
+                print(f"[-] Monitor job failed: {e}")
+            next_run += interval
+            if next_run < loop.time():
+                # اگر یک دور بیش از interval طول کشید، دورهای عقب‌افتاده را جبران نمی‌کنیم
+                next_run = loop.time()
+
+    def _engine_for(self, target):
+        """
+        موتور پروب مقصد. پروب‌های غیر ICMP با تنظیمات یکسان یک موتور (و سوکت‌ها و
+        اتصال‌های آن) را به اشتراک می‌گذارند؛ همه روی همان event loop و سمافور اجرا می‌شوند.
+        """
+        if target['probe'] == 'icmp':
+            return self.engine
+        key = (target['probe'], target.get('port'), target.get('path'), target.get('query'))
+        engine = self._engines.get(key)
+        if engine is None:
+            from probes import make_probe
+            transport = make_probe(target['probe'], port=target.get('port'), path=target.get('path'),
+                                   query_name=target.get('query'))
+            engine = self._engines[key] = ProbeEngine(transport=transport,
+                                                      max_in_flight=self.config['max_in_flight'],
+                                                      timeout=self.config['timeout'])
+        return engine
+
+    def _sampler_for(self, target):
+        key = (target['name'], target['probe'])
+        sampler = self._samplers.get(key)
+        if sampler is None:
+            from adaptive import AdaptiveSampler
+            sampler = self._samplers[key] = AdaptiveSampler(
+                min_interval=target['probe_interval'],
+                max_interval=target['max_interval'] or target['probe_interval'] * 10)
+        return sampler
+
+    async def _ping_round(self, target):
+        # نمونه‌های خام با نام مقصد ثبت می‌شوند تا پروب‌های مختلف یک host جدا بمانند
+        name = target['name']
+        engine = self._engine_for(target)
+
+        def on_sample(host, seq, delay, error):
+            self.storage.record_sample(name, seq, delay, error)
+
+        if target['adaptive']:
+            results = await engine.probe_adaptive(
+                target['host'], target['count'] * target['probe_interval'], self._sampler_for(target),
+                self._semaphore, on_sample=on_sample, budget=self._budget)
+        else:
+            results = await engine.probe_target(target['host'], target['count'], target['probe_interval'],
+                                                self._semaphore, on_sample=on_sample)
+        self.writer.save_result(target['name'], results, dict(NO_SPEED), probe_type=target['probe'])
+        self.rounds += 1
+
+    def _sample_key(self, host):
+        """
+        کلید نمونه‌های خام پینگ ICMP به host: نام مقصد ICMP پیکربندی‌شده با همان host
+        (پیش‌فرض خود host)، تا نمونه‌های دور تست سرعت و دورهای پینگ یک سری باشند.
+        """
+        for target in self.config['targets']:
+            if target['host'] == host and target['probe'] == 'icmp':
+                return target['name']
+        return host
+
+    async def _speed_round(self):
+        speed = self.config['speed_test']
+        name = self._sample_key(speed['target'])
+
+        def on_sample(host, seq, delay, error):
+            self.storage.record_sample(name, seq, delay, error)
+
+        ping_results = await self.engine.probe_target(speed['target'], speed['count'], 0.5,
+                                                      self._semaphore, on_sample=on_sample)
+        if self.tester is None:
+            from tester import NetworkTester
+            # ترنسپورت موتور monitor مشترک است تا تستر سوکت ICMP دومی باز نکند
+            self.tester = NetworkTester(speed['target'], transport=self.engine.transport)
+        loop = asyncio.get_running_loop()
+        speed_results = await loop.run_in_executor(self._speed_executor, self.tester.run_speed_test)
+        self.writer.save_result(speed['name'], ping_results, speed_results)
+        self.rounds += 1
+
+    async def _compaction_round(self):
+        from rollup import Rollup
+        if self._rollup is None:
+            retention = timedelta(days=self.config['compaction']['retention_days'])
+            self._rollup = Rollup(self.storage, retention=retention)
+        loop = asyncio.get_running_loop()
+        summary = await loop.run_in_executor(self._compaction_executor, self._rollup.compact)
+        print(f"[+] Compaction done: {summary}")
+
+    async def run_rounds(self, rounds=1):
+        """
+        دور پینگ همه مقصدها را rounds بار پشت سر هم و بدون زمان‌بندی اجرا می‌کند
+        (برای پیمایش یک‌باره و بنچمارک‌ها).
+        """
+        self._semaphore = asyncio.Semaphore(self.config['max_in_flight'])
+        for _ in range(rounds):
+            await asyncio.gather(*(self._ping_round(t) for t in self.config['targets']))
+
+    async def run(self):
+        """حلقه اصلی تا زمان درخواست توقف."""
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.config['max_in_flight'])
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # مثلاً در ویندوز یا وقتی در thread اصلی نیستیم
+
+        jobs = [self._schedule(t['interval'], lambda t=t: self._ping_round(t))
+                for t in self.config['targets']]
+        if self.config['speed_test']:
+            jobs.append(self._schedule(self.config['speed_test']['interval'], self._speed_round))
+        if self.config['compaction']:
+            jobs.append(self._schedule(self.config['compaction']['interval'], self._compaction_round))
+
+        print(f"[+] Monitoring {len(self.config['targets'])} targets "
+              f"(speed test: {'on' if self.config['speed_test'] else 'off'}). Press Ctrl+C to stop.")
+        tasks = [asyncio.ensure_future(job) for job in jobs]
+        await self._stop.wait()
+
+        # فرصت برای تمام شدن دورهای در حال اجرا، سپس لغو بقیه
+        print("[+] Stopping monitor, finishing in-flight rounds...")
+        done, pending = await asyncio.wait(tasks, timeout=self.config['shutdown_grace'])
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    def close(self):
+        try:
+            if self.writer is not self.storage:
+                # خطای نوشتن نتایج نگه‌داشته بعد از آزاد کردن منابع به فراخواننده می‌رسد
+                try:
+                    self.writer.close()
+                finally:
+                    print(f"[+] Storage: {self.writer.report()}")
+        finally:
+            self.storage.close()
+            self.engine.close()
+            for engine in self._engines.values():
+                engine.close()
+            self._speed_executor.shutdown(wait=False)
+            self._compaction_executor.shutdown(wait=False)
+
+
+def start_metrics(config, offset=0):
+    """
+    اگر پیکربندی بخش metrics داشته باشد سرور /metrics را روی port + offset راه می‌اندازد.
+
+    Returns:
+        MetricsServer | None
+    """
+    if not config.get('metrics'):
+        return None
+    from metrics import MetricsServer
+    return MetricsServer(config['metrics']['port'] + offset, config['metrics']['host']).start()
+
+
+def run_monitor(config_path, metrics_port=None, metrics_host=None):
+    """نقطه ورود حالت monitor از main.py."""
+    config = load_config(config_path)
+    override_metrics(config, metrics_port, metrics_host)
+    monitor = Monitor(config)
+    server = start_metrics(config)
+    try:
+        asyncio.run(monitor.run())
+    finally:
+        monitor.close()
+        if server is not None:
+            server.close()
+        print(f"[+] Monitor stopped after {monitor.rounds} rounds; results flushed.")
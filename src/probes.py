@@ -0,0 +1,418 @@
+import asyncio
+import inspect
+import os
+import socket
+import struct
+import time
+
+from icmp import RESOLVE_TTL
+
+
+def _split_target(target, default_port):
+    """'host:port' یا 'host' -> (host, port)."""
+    host, sep, port = target.rpartition(':')
+    if sep and port.isdigit() and ':' not in host:
+        return host, int(port)
+    return target, default_port
+
+
+class TcpConnectProbe:
+    """
+    زمان برقراری اتصال TCP (SYN تا SYN-ACK) به host:port.
+
+    خود handshake چیزی است که اندازه‌گیری می‌شود، پس اتصال‌ها بلافاصله بسته می‌شوند
+    و قابل استفاده مجدد نیستند.
+    """
+
+    kind = 'tcp'
+
+    def __init__(self, port=443, resolve_ttl=RESOLVE_TTL):
+        """
+        Args:
+            port (int): پورت پیش‌فرض مقصدها.
+            resolve_ttl (float): بعد از این مدت (ثانیه) نام مقصد دوباره resolve می‌شود.
+        """
+        self.port = port
+        self.resolve_ttl = resolve_ttl
+        self._addresses = {}  # (host, port) -> (address, زمان انقضا روی ساعت monotonic)
+
+    async def _resolve(self, host, port):
+        # آدرس کش می‌شود تا زمان DNS در زمان اتصال نیاید، ولی تغییر رکورد DNS بعد از TTL دیده می‌شود
+        key = (host, port)
+        cached = self._addresses.get(key)
+        now = time.monotonic()
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            if cached is None:
+                raise
+            return cached[0]  # DNS موقتاً در دسترس نیست؛ آدرس قبلی تا resolve بعدی
+        address = infos[0][4][0]
+        self._addresses[key] = (address, now + self.resolve_ttl)
+        return address
+
+    async def probe(self, target, timeout):
+        """
+        Returns:
+            float | None: زمان اتصال (میلی‌ثانیه) یا None در صورت timeout.
+
+        Raises:
+            OSError: اگر اتصال رد شود (مثلاً پورت بسته).
+        """
+        host, port = _split_target(target, self.port)
+        address = await self._resolve(host, port)
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+        except asyncio.TimeoutError:
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        writer.transport.abort()  # بدون FIN handshake؛ سوکت فوراً آزاد می‌شود
+        return elapsed
+
+    def close(self):
+        pass
+
+
+class _DatagramClient(asyncio.DatagramProtocol):
+    """
+    یک سوکت UDP متصل که چند درخواست همزمان روی آن در جریان است؛
+    پاسخ‌ها با یک token (شماره ترتیب یا شناسه DNS) به درخواست منتظر نسبت داده می‌شوند.
+    """
+
+    def __init__(self, token_of):
+        self.token_of = token_of
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        receive = time.perf_counter()
+        future = self.pending.get(self.token_of(data))
+        if future is not None and not future.done():
+            future.set_result(receive)
+
+    def error_received(self, exc):
+        # مثلاً ICMP port unreachable؛ همه درخواست‌های منتظر با خطا تمام می‌شوند
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def request(self, token, payload, timeout):
+        future = asyncio.get_running_loop().create_future()
+        self.pending[token] = future
+        try:
+            start = time.perf_counter()
+            self.transport.sendto(payload)
+            receive = await asyncio.wait_for(future, timeout)
+            return (receive - start) * 1000
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.pending.pop(token, None)
+
+
+class _DatagramProbe:
+    """پایه پروب‌های UDP: یک سوکت برای هر مقصد روی هر event loop نگه داشته می‌شود."""
+
+    def __init__(self, port, token_of):
+        """
+        Args:
+            port (int): پورت پیش‌فرض مقصدها.
+            token_of (callable): token یک پاسخ (bytes -> token یا None) برای یافتن درخواست منتظر آن.
+        """
+        self.port = port
+        self.token_of = token_of
+        self._clients = {}
+        self._sockets = []
+        self._loop = None
+
+    async def _client(self, target):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # run_sync برای هر اجرا loop تازه می‌سازد؛ سوکت‌های loop قبلی کنار گذاشته می‌شوند
+            self.close()
+            self._loop = loop
+        creating = self._clients.get(target)
+        if creating is None:
+            # پروب‌های همزمان به یک مقصد منتظر همان سوکت می‌مانند
+            creating = self._clients[target] = asyncio.ensure_future(self._create(loop, target))
+        return await creating
+
+    async def _create(self, loop, target):
+        host, port = _split_target(target, self.port)
+        infos = await loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sockets.append(sock)
+        sock.setblocking(False)
+        sock.connect(infos[0][4])
+        _, client = await loop.create_datagram_endpoint(lambda: _DatagramClient(self.token_of), sock=sock)
+        return client
+
+    def release(self):
+        """سوکت‌های وابسته به event loop جاری را می‌بندد؛ ProbeEngine.run_sync پیش از بستن loop صدا می‌زند."""
+        self.close()
+
+    def close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            for creating in self._clients.values():
+                if creating.done() and not creating.cancelled() and creating.exception() is None:
+                    creating.result().transport.close()
+                else:
+                    creating.cancel()
+        # بعد از بسته شدن loop (یا برای سوکتی که endpoint آن ساخته نشد) خود سوکت بسته می‌شود
+        for sock in self._sockets:
+            sock.close()
+        self._clients = {}
+        self._sockets = []
+
+
+class UdpEchoProbe(_DatagramProbe):
+    """
+    RTT یک datagram تا سرور echo (RFC 862، پورت ۷ یا serve_udp_echo) و برگشت.
+    """
+
+    kind = 'udp'
+    HEADER = struct.Struct('!4sQ')
+
+    def __init__(self, port=7, payload_size=32):
+        super().__init__(port, self._token)
+        self.payload_size = max(payload_size, self.HEADER.size)
+        self._seq = 0
+
+    @classmethod
+    def _token(cls, data):
+        if len(data) < cls.HEADER.size:
+            return None
+        return cls.HEADER.unpack_from(data)[1]
+
+    async def probe(self, target, timeout):
+        client = await self._client(target)
+        self._seq += 1
+        payload = bytearray(self.payload_size)
+        self.HEADER.pack_into(payload, 0, b'NSPE', self._seq)
+        return await client.request(self._seq, bytes(payload), timeout)
+
+
+class DnsProbe(_DatagramProbe):
+    """
+    زمان پاسخ یک resolver به پرس‌وجوی DNS (رکورد A برای query_name). مقصد آدرس resolver است.
+
+    هر پاسخی با شناسه درست (حتی NXDOMAIN) یعنی resolver در دسترس است و شمرده می‌شود.
+    """
+
+    kind = 'dns'
+
+    def __init__(self, query_name='example.com', port=53):
+        super().__init__(port, self._token)
+        self.query_name = query_name
+        self._question = b''.join(
+            bytes([len(label)]) + label.encode('ascii') for label in query_name.rstrip('.').split('.')
+        ) + b'\0' + struct.pack('!HH', 1, 1)  # QTYPE=A، QCLASS=IN
+
+    @staticmethod
+    def _token(data):
+        if len(data) < 2:
+            return None
+        return struct.unpack_from('!H', data)[0]
+
+    async def probe(self, target, timeout):
+        client = await self._client(target)
+        while True:
+            query_id = struct.unpack('!H', os.urandom(2))[0]
+            if query_id not in client.pending:
+                break
+        # شناسه، flags (recursion desired)، یک سؤال
+        header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+        return await client.request(query_id, header + self._question, timeout)
+
+
+class HttpTtfbProbe:
+    """
+    زمان تا اولین بایت (TTFB) پاسخ HTTP/1.1.
+
+    اتصال‌های keep-alive برای هر مقصد نگه داشته و دوباره استفاده می‌شوند، پس زمان
+    اندازه‌گیری‌شده از ارسال درخواست تا رسیدن خط وضعیت پاسخ است و برقراری اتصال/TLS
+    (که پروب tcp اندازه می‌گیرد) در آن نیست.
+    """
+
+    kind = 'http'
+
+    def __init__(self, port=80, path='/', method='HEAD', tls=None):
+        """
+        Args:
+            port (int): پورت پیش‌فرض مقصدها.
+            path (str): مسیر درخواست.
+            method (str): HEAD (پیش‌فرض) یا GET.
+            tls (bool): استفاده از HTTPS. None یعنی فقط برای پورت ۴۴۳.
+        """
+        self.port = port
+        self.path = path
+        self.method = method
+        self.tls = tls
+        self._idle = {}
+        self._loop = None
+
+    async def _connect(self, target):
+        host, port = _split_target(target, self.port)
+        use_tls = self.tls if self.tls is not None else port == 443
+        context = None
+        if use_tls:
+            import ssl
+            context = ssl.create_default_context()
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        family, _, _, _, address = infos[0]
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, address)
+            reader, writer = await asyncio.open_connection(
+                sock=sock, ssl=context, server_hostname=host if context else None)
+        except BaseException:
+            sock.close()
+            raise
+        return host, reader, writer, sock
+
+    async def _exchange(self, connection, timeout):
+        host, reader, writer, _ = connection
+        request = (f"{self.method} {self.path} HTTP/1.1\r\nHost: {host}\r\n"
+                   f"User-Agent: NetSpector\r\nConnection: keep-alive\r\n\r\n").encode('ascii')
+        start = time.perf_counter()
+        writer.write(request)
+        status = await asyncio.wait_for(reader.readuntil(b'\r\n'), timeout)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not status.startswith(b'HTTP/'):
+            raise ConnectionError(f"Invalid HTTP response from {host}")
+
+        # بقیه پاسخ خوانده می‌شود تا اتصال برای درخواست بعدی قابل استفاده باشد
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readuntil(b'\r\n'), timeout)
+            if line == b'\r\n':
+                break
+            name, _, value = line.partition(b':')
+            headers[name.strip().lower()] = value.strip().lower()
+        connection_header = headers.get(b'connection', b'')
+        if status.startswith(b'HTTP/1.0'):
+            reusable = connection_header == b'keep-alive'
+        else:
+            reusable = connection_header != b'close'
+        length = headers.get(b'content-length')
+        if self.method != 'HEAD':
+            if length is None:
+                reusable = False  # chunked یا تا بسته شدن؛ برای یک پروب ارزش خواندن ندارد
+            elif int(length):
+                await asyncio.wait_for(reader.readexactly(int(length)), timeout)
+        return elapsed, reusable
+
+    async def probe(self, target, timeout):
+        """
+        Returns:
+            float | None: TTFB (میلی‌ثانیه) یا None در صورت timeout.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self.close()
+            self._loop = loop
+        idle = self._idle.setdefault(target, [])
+        while True:
+            connection = idle.pop() if idle else None
+            reused = connection is not None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(self._connect(target), timeout)
+                elapsed, reusable = await self._exchange(connection, timeout)
+            except asyncio.TimeoutError:
+                if connection is not None:
+                    connection[2].close()
+                return None
+            except (asyncio.IncompleteReadError, ConnectionError):
+                if connection is not None:
+                    connection[2].close()
+                if reused:
+                    continue  # سرور اتصال بیکار را بسته است؛ با اتصال تازه دوباره امتحان می‌شود
+                raise
+            break
+        if reusable:
+            idle.append(connection)
+        else:
+            connection[2].close()
+        return elapsed
+
+    def release(self):
+        """سوکت‌های وابسته به event loop جاری را می‌بندد؛ ProbeEngine.run_sync پیش از بستن loop صدا می‌زند."""
+        self.close()
+
+    def close(self):
+        loop_open = self._loop is not None and not self._loop.is_closed()
+        for connections in self._idle.values():
+            for _, _, writer, sock in connections:
+                if loop_open:
+                    writer.close()
+                else:
+                    sock.close()
+        self._idle = {}
+
+
+PROBE_TYPES = {
+    'tcp': TcpConnectProbe,
+    'udp': UdpEchoProbe,
+    'dns': DnsProbe,
+    'http': HttpTtfbProbe,
+}
+
+
+def make_probe(kind='icmp', **options):
+    """
+    ترنسپورت پروب برای ProbeEngine بر اساس نوع آن.
+
+    Args:
+        kind (str): icmp، tcp، udp، dns یا http.
+        **options: پارامترهای سازنده پروب (مثلاً port، path، query_name). مقادیر None نادیده گرفته می‌شوند.
+
+    Returns:
+        شیئی با متد async probe(target, timeout) و ویژگی kind.
+
+    Raises:
+        ValueError: اگر نوع پروب ناشناخته باشد.
+    """
+    if kind == 'icmp':
+        from engine import default_transport
+        return default_transport()
+    if kind not in PROBE_TYPES:
+        raise ValueError(f"Unknown probe type: {kind!r}")
+    cls = PROBE_TYPES[kind]
+    # گزینه‌هایی که به این نوع پروب مربوط نیستند (مثلاً path برای dns) نادیده گرفته می‌شوند
+    accepted = inspect.signature(cls).parameters
+    return cls(**{k: v for k, v in options.items() if v is not None and k in accepted})
+
+
+def probe_type(transport):
+    """نوع پروب یک ترنسپورت؛ ICMP برای ترنسپورت‌هایی که kind ندارند (ping3، FakeTransport)."""
+    return getattr(transport, 'kind', 'icmp')
+
+
+def serve_udp_echo(host='127.0.0.1', port=0):
+    """
+    یک سرور UDP echo در یک thread پس‌زمینه (برای تست آفلاین UdpEchoProbe).
+
+    Returns:
+        socketserver.UDPServer: برای توقف shutdown() را صدا بزنید.
+    """
+    import socketserver
+    import threading
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            data, sock = self.request
+            sock.sendto(data, self.client_address)
+
+    server = socketserver.ThreadingUDPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
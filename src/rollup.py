@@ -0,0 +1,510 @@
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from stats import LatencyHistogram
+
+# سطوح تجمیع: نام سطح -> فرکانس pandas
+TIERS = {
+    '1min': '1min',
+    '1h': '1h',
+    '1d': '1D',
+}
+
+# انتخاب خودکار سطح بر اساس طول بازه پرس‌وجو
+AUTO_RESOLUTION = [
+    (timedelta(days=30), '1d'),
+    (timedelta(days=2), '1h'),
+    (timedelta(hours=6), '1min'),
+]
+
+QUANTILES = {'p50_latency': 0.50, 'p95_latency': 0.95, 'p99_latency': 0.99}
+
+ROW_COLUMNS = ['connection_name', 'bucket', 'count', 'mean_latency', 'min_latency', 'max_latency',
+               'packet_loss', 'download_speed', 'upload_speed', *QUANTILES]
+
+# ستون میانگین -> تعداد مقادیر معتبر آن در سطل؛ وزن میانگین هنگام ادغام سطل‌ها در سطح بزرگ‌تر
+WEIGHTS = {'mean_latency': 'latency_count', 'packet_loss': 'loss_count',
+           'download_speed': 'download_count', 'upload_speed': 'upload_count'}
+# ستون‌هایی که فقط برای ساختن سطح بعدی از سطرهای همین سطح ذخیره می‌شوند
+MERGE_COLUMNS = [*WEIGHTS.values(), 'histogram']
+
+# هر سطح از سطرهای سطح کوچک‌تر ساخته می‌شود؛ فقط 1min از نتایج خام
+SOURCES = {'1h': '1min', '1d': '1h'}
+
+BUCKET_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def results_to_frame(records, histograms=False):
+    """
+    لیست (یا generator) رکوردهای ResultStorage را به یک DataFrame ستونی تبدیل می‌کند.
+
+    تست‌های فقط-پینگ سرعت را 0 ذخیره می‌کنند؛ این مقادیر NaN (اندازه‌گیری نشده) می‌شوند.
+
+    Args:
+        histograms (bool): ستون histogram (دیکشنری LatencyHistogram هر نتیجه یا None) هم
+            ساخته شود. برای تجمیع صدک‌ها لازم است؛ پیش‌فرض خاموش تا تحلیل‌های بزرگ
+            دیکشنری‌ها را در حافظه نگه ندارند.
+
+    Returns:
+        pd.DataFrame: ستون‌های timestamp, connection_name, avg_latency, min_latency,
+            max_latency, packet_loss, download_speed, upload_speed (و histogram)
+    """
+    columns = {'timestamp': [], 'connection_name': [], 'avg_latency': [], 'min_latency': [],
+               'max_latency': [], 'packet_loss': [], 'download_speed': [], 'upload_speed': []}
+    if histograms:
+        columns['histogram'] = []
+    for r in records:
+        ping = r.get('ping') or {}
+        speed = r.get('speed') or {}
+        columns['timestamp'].append(r['timestamp'])
+        columns['connection_name'].append(r['connection_name'])
+        columns['avg_latency'].append(ping.get('avg_latency', np.nan))
+        columns['min_latency'].append(ping.get('min_latency', np.nan))
+        columns['max_latency'].append(ping.get('max_latency', np.nan))
+        columns['packet_loss'].append(ping.get('packet_loss', np.nan))
+        columns['download_speed'].append(speed.get('download_speed', np.nan))
+        columns['upload_speed'].append(speed.get('upload_speed', np.nan))
+        if histograms:
+            columns['histogram'].append(ping.get('histogram'))
+    frame = pd.DataFrame(columns)
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], format='ISO8601')
+    for column in ('avg_latency', 'min_latency', 'max_latency', 'packet_loss',
+                   'download_speed', 'upload_speed'):
+        frame[column] = frame[column].astype('float64')
+    for column in ('download_speed', 'upload_speed'):
+        frame[column] = frame[column].where(frame[column] > 0)
+    return frame
+
+
+def _merge_histograms(histograms):
+    """ادغام هیستوگرام‌های تاخیر (دیکشنری to_dict) یک سطل؛ None اگر هیچ‌کدام نباشد."""
+    merged = None
+    for data in histograms:
+        if isinstance(data, dict):
+            histogram = LatencyHistogram.from_dict(data)
+            merged = histogram if merged is None else merged.merge(histogram)
+    return merged
+
+
+def _with_quantiles(rolled, histograms):
+    """
+    ستون histogram (ادغام هیستوگرام‌های هر سطل) و صدک‌های QUANTILES را به rolled اضافه می‌کند.
+
+    Args:
+        rolled (pd.DataFrame): سطرهای تجمیع با اندیس (connection_name, bucket).
+        histograms (list): برای هر سطر rolled دنباله هیستوگرام‌های آن سطل، یا None.
+    """
+    if histograms is None:
+        rolled['histogram'] = None
+        quantiles = pd.DataFrame(np.nan, index=rolled.index, columns=list(QUANTILES))
+    else:
+        merged = [_merge_histograms(h) for h in histograms]
+        rolled['histogram'] = pd.Series([m.to_dict() if m is not None else None for m in merged],
+                                        index=rolled.index, dtype=object)
+        values = [[m.quantile(q) for q in QUANTILES.values()] if m is not None and m.count
+                  else [math.nan] * len(QUANTILES) for m in merged]
+        quantiles = pd.DataFrame(values, index=rolled.index, columns=list(QUANTILES), dtype='float64')
+        # مثل LatencyStats.result صدک‌ها به بازه [min, max] واقعی محدود می‌شوند
+        quantiles = quantiles.clip(lower=rolled['min_latency'], upper=rolled['max_latency'], axis=0)
+    return rolled.join(quantiles).reset_index()[ROW_COLUMNS + MERGE_COLUMNS]
+
+
+def aggregate(frame, freq):
+    """
+    نتایج خام را برای هر اتصال در سطل‌های زمانی با طول freq تجمیع می‌کند.
+
+    شاخص‌های ستونی برداری محاسبه می‌شوند. صدک‌ها از ادغام هیستوگرام‌های تاخیر نتایج هر
+    سطل به دست می‌آیند (توزیع واقعی تاخیرها، نه صدک میانگین‌ها)، پس frame باید با
+    results_to_frame(..., histograms=True) ساخته شده باشد؛ بدون ستون histogram صدک‌ها NaN اند.
+
+    Returns:
+        pd.DataFrame: یک سطر برای هر (connection_name, bucket) با ستون‌های ROW_COLUMNS و
+            ستون‌های MERGE_COLUMNS که merge_rows برای ساختن سطح بزرگ‌تر لازم دارد.
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=ROW_COLUMNS + MERGE_COLUMNS)
+    frame = frame.assign(bucket=frame['timestamp'].dt.floor(freq))
+    grouped = frame.groupby(['connection_name', 'bucket'], sort=True)
+    rolled = grouped.agg(
+        count=('avg_latency', 'size'),
+        mean_latency=('avg_latency', 'mean'),
+        min_latency=('min_latency', 'min'),
+        max_latency=('max_latency', 'max'),
+        packet_loss=('packet_loss', 'mean'),
+        download_speed=('download_speed', 'mean'),
+        upload_speed=('upload_speed', 'mean'),
+        latency_count=('avg_latency', 'count'),
+        loss_count=('packet_loss', 'count'),
+        download_count=('download_speed', 'count'),
+        upload_count=('upload_speed', 'count'),
+    )
+    histograms = [h for _, h in grouped['histogram']] if 'histogram' in frame else None
+    return _with_quantiles(rolled, histograms)
+
+
+def merge_rows(rows, freq):
+    """
+    سطرهای یک سطح (خروجی tier_frame) را در سطل‌های بزرگ‌تر freq ادغام می‌کند.
+
+    نتیجه همان است که aggregate روی نتایج خام آن سطل‌ها می‌داد: میانگین‌ها با تعداد مقادیر
+    معتبر وزن داده می‌شوند و صدک‌ها از ادغام هیستوگرام‌ها به دست می‌آیند، پس سطح‌های
+    بزرگ‌تر بدون خواندن دوباره نتایج خام ساخته می‌شوند.
+    """
+    if rows.empty:
+        return pd.DataFrame(columns=ROW_COLUMNS + MERGE_COLUMNS)
+    frame = rows.assign(bucket=rows['bucket'].dt.floor(freq))
+    for mean, count in WEIGHTS.items():
+        frame[mean] = frame[mean].fillna(0.0) * frame[count]
+    grouped = frame.groupby(['connection_name', 'bucket'], sort=True)
+    rolled = grouped.agg(
+        count=('count', 'sum'),
+        min_latency=('min_latency', 'min'),
+        max_latency=('max_latency', 'max'),
+        **{column: (column, 'sum') for column in (*WEIGHTS, *WEIGHTS.values())},
+    )
+    for mean, count in WEIGHTS.items():
+        rolled[mean] = rolled[mean] / rolled[count].where(rolled[count] > 0)
+    return _with_quantiles(rolled, [h for _, h in grouped['histogram']])
+
+
+def tier_frame(rows):
+    """
+    سطرهای ذخیره‌شده یک سطح را به DataFrame ورودی merge_rows تبدیل می‌کند.
+
+    سطرهای قدیمی بدون ستون‌های MERGE_COLUMNS هم پذیرفته می‌شوند: وزن هر میانگین count
+    سطل است و صدک‌های سطل بزرگ‌تر NaN می‌شوند.
+    """
+    frame = pd.DataFrame(rows, columns=ROW_COLUMNS + MERGE_COLUMNS)
+    frame['bucket'] = pd.to_datetime(frame['bucket'], format='ISO8601')
+    for column in ('count', *ROW_COLUMNS[3:]):
+        frame[column] = frame[column].astype('float64')
+    for mean, count in WEIGHTS.items():
+        fallback = frame['count'].where(frame[mean].notna(), 0.0)
+        frame[count] = frame[count].astype('float64').fillna(fallback).astype('int64')
+    frame['count'] = frame['count'].astype('int64')
+    return frame
+
+
+def _to_rows(rows):
+    """سطرهای aggregate را به دیکشنری‌های قابل ذخیره در JSON (bucket رشته ISO، NaN به None) تبدیل می‌کند."""
+    if rows.empty:
+        return []
+    rows = rows.sort_values(['bucket', 'connection_name'], kind='stable')
+    rows = rows.assign(bucket=rows['bucket'].dt.strftime(BUCKET_FORMAT))
+    # NaN در JSON معتبر نیست؛ به null تبدیل می‌شود
+    rows = rows.astype(object).where(rows.notna(), None)
+    return rows.to_dict('records')
+
+
+def rows_to_frame(rows):
+    """
+    سطرهای یک سطح تجمیع را به DataFrame با ستون‌های results_to_frame تبدیل می‌کند
+    (timestamp ابتدای سطل و avg_latency میانگین سطل است) تا تحلیل‌ها روی آن هم اجرا شوند.
+    """
+    frame = pd.DataFrame(rows, columns=ROW_COLUMNS).rename(
+        columns={'bucket': 'timestamp', 'mean_latency': 'avg_latency'})
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], format='ISO8601')
+    frame['count'] = frame['count'].astype('int64')
+    for column in frame.columns[3:]:
+        frame[column] = frame[column].astype('float64')
+    return frame
+
+
+def _lines_reversed(f, end, block_size=64 * 1024):
+    """(offset شروع، خط) خطوط فایل باینری f را از end به عقب برمی‌گرداند."""
+    pos, remainder, line_end = end, b'', end
+    while pos > 0:
+        size = min(block_size, pos)
+        pos -= size
+        f.seek(pos)
+        lines = (f.read(size) + remainder).split(b'\n')
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            start = line_end - len(line)
+            yield start, line
+            line_end = start - 1
+    if remainder:
+        yield 0, remainder
+
+
+class Rollup:
+    """
+    تجمیع (downsampling) نتایج در سطوح ۱ دقیقه، ۱ ساعت و ۱ روز و حذف داده‌های خام قدیمی.
+
+    هر سطح در یک فایل JSON Lines جداگانه (مرتب بر اساس bucket) در پوشه rollups ذخیره
+    می‌شود و یک watermark (انتهای آخرین سطل کامل تجمیع‌شده) دارد، پس هر اجرای compact
+    فقط داده‌های جدیدتر از watermark را پردازش می‌کند. فقط سطح 1min از نتایج خام ساخته
+    می‌شود؛ 1h از سطرهای 1min و 1d از سطرهای 1h با merge_rows (ادغام هیستوگرام‌ها).
+
+    نتایجی که دیر به ذخیره‌سازی می‌رسند (مثلاً هنوز در صف BufferedResultWriter یا
+    دسته‌های fleet بوده‌اند) با تجمیع دوباره سطل‌های دقیقه‌ای پنجره grace پشت watermark
+    جذب می‌شوند. در سطوح بزرگ‌تر فقط سطل‌هایی دوباره ساخته می‌شوند که این پنجره به آن‌ها
+    می‌رسد؛ سطرهای آن سطل‌ها از انتهای فایل حذف و دوباره نوشته می‌شوند. داده خام فقط
+    وقتی حذف می‌شود که هم از پنجره نگهداری قدیمی‌تر باشد و هم پشت پنجره grace باشد.
+    """
+
+    STATE_FILE = 'state.json'
+
+    def __init__(self, storage, retention=timedelta(days=7), rollup_dirname='rollups',
+                 grace=timedelta(minutes=5)):
+        """
+        Args:
+            storage (ResultStorage): ذخیره‌سازی نتایج خام.
+            retention (timedelta): مدت نگهداری نتایج خام.
+            rollup_dirname (str): نام پوشه فایل‌های تجمیع داخل data_dir.
+            grace (timedelta): نتایجی که حداکثر این مقدار دیرتر از watermark برسند هنوز در
+                تجمیع می‌آیند (سطل‌های دقیقه‌ای این پنجره در هر compact دوباره تجمیع می‌شوند).
+        """
+        self.storage = storage
+        self.retention = retention
+        self.grace = grace
+        self.rollup_dir = os.path.join(storage.data_dir, rollup_dirname)
+        os.makedirs(self.rollup_dir, exist_ok=True)
+
+    def _tier_path(self, tier):
+        return os.path.join(self.rollup_dir, f"{tier}.jsonl")
+
+    def load_state(self):
+        try:
+            with open(os.path.join(self.rollup_dir, self.STATE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self, state):
+        path = os.path.join(self.rollup_dir, self.STATE_FILE)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _append_rows(self, tier, rows):
+        rows = _to_rows(rows)
+        if not rows:
+            return
+        with open(self._tier_path(tier), 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate_tier(self, tier, bucket):
+        """
+        سطرهای انتهای فایل یک سطح با bucket >= bucket (و خط ناقص احتمالی) را حذف می‌کند.
+
+        فایل بر اساس bucket مرتب است، پس فقط انتهای آن از عقب خوانده می‌شود.
+        """
+        try:
+            f = open(self._tier_path(tier), 'r+b')
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            keep = end
+            for start, line in _lines_reversed(f, end):
+                if line.strip():
+                    try:
+                        if json.loads(line)['bucket'] < bucket:
+                            break
+                    except (ValueError, KeyError):
+                        pass  # خط ناقص یا خراب هم حذف می‌شود
+                keep = start
+            if keep < end:
+                f.truncate(keep)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _grace_start(self, watermark):
+        """ابتدای اولین سطل دقیقه‌ای که در پنجره grace پشت watermark سطح 1min قرار دارد."""
+        return (pd.Timestamp(watermark) - pd.Timedelta(self.grace)).floor(TIERS['1min'])
+
+    def _rows_since(self, tier, start):
+        """
+        سطرهای یک سطح با bucket >= start (با ستون‌های ادغام) به ترتیب فایل؛ start=None یعنی همه.
+
+        فایل بر اساس bucket مرتب است، پس فقط انتهای آن از عقب خوانده می‌شود.
+        """
+        if start is None:
+            return list(self.iter_tier(tier, merge=True))
+        bucket = start.strftime(BUCKET_FORMAT)
+        rows = []
+        try:
+            f = open(self._tier_path(tier), 'rb')
+        except FileNotFoundError:
+            return rows
+        with f:
+            for _, line in _lines_reversed(f, f.seek(0, os.SEEK_END)):
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # خط خالی یا ناقص انتهای فایل
+                if row['bucket'] < bucket:
+                    break
+                rows.append(row)
+        rows.reverse()
+        return rows
+
+    def compact(self, now=None):
+        """
+        داده‌های جدیدتر از watermark هر سطح را تجمیع کرده و داده‌های خام قدیمی را حذف می‌کند.
+
+        فقط سطل‌های کامل (تمام‌شده قبل از now) تجمیع می‌شوند. نتایج خام فقط از پنجره grace
+        پشت watermark قبلی خوانده می‌شوند و سطل‌های دقیقه‌ای آن دوباره تجمیع و جایگزین
+        می‌شوند تا نتایج دیررس هم حساب شوند؛ 1h و 1d فقط برای سطل‌هایی که این پنجره یا
+        watermark خودشان به آن‌ها می‌رسد از سطرهای سطح کوچک‌تر دوباره ساخته می‌شوند.
+
+        Args:
+            now (datetime): زمان فعلی. پیش‌فرض datetime.now().
+
+        Returns:
+            dict: تعداد سطرهای نوشته‌شده هر سطح (با سطرهای دوباره تجمیع‌شده) و تعداد
+                رکوردهای خام حذف‌شده.
+        """
+        now = pd.Timestamp(now or datetime.now())
+        state = self.load_state()
+        grace_start = self._grace_start(state['1min']) if '1min' in state else None
+
+        summary = {}
+        for tier, freq in TIERS.items():
+            cutoff = now.floor(freq)
+            start = None
+            if grace_start is not None and tier in state:
+                # اولین سطل این سطح که نتیجه دیررس یا سطل تازه کامل‌شده در آن می‌افتد
+                start = min(grace_start.floor(freq), pd.Timestamp(state[tier]))
+            if start is not None and cutoff <= start:
+                summary[tier] = 0  # چیزی کامل نشده (یا ساعت سیستم عقب رفته)
+                continue
+            if tier in SOURCES:
+                source = tier_frame(self._rows_since(SOURCES[tier], start))
+                rows = merge_rows(source[source['bucket'] < cutoff], freq)
+            else:
+                records = self.storage.iter_results(start=start.isoformat() if start is not None else None,
+                                                    end=cutoff.isoformat())
+                rows = aggregate(results_to_frame(records, histograms=True), freq)
+            if start is not None:
+                self._truncate_tier(tier, start.strftime(BUCKET_FORMAT))
+            self._append_rows(tier, rows)
+            summary[tier] = len(rows)
+            if tier not in state or cutoff > pd.Timestamp(state[tier]):
+                state[tier] = cutoff.isoformat()
+        self._save_state(state)
+
+        # داده خام فقط برای تجمیع دوباره پنجره grace سطح 1min لازم است
+        prune_before = now - pd.Timedelta(self.retention)
+        if '1min' in state:
+            prune_before = min(prune_before, self._grace_start(state['1min']))
+        summary['pruned'] = self.storage.prune(prune_before.isoformat())
+        return summary
+
+    def iter_tier(self, tier, connection_name=None, start=None, end=None, merge=False):
+        """
+        سطرهای یک سطح را (در صورت نیاز فیلترشده) یکی یکی برمی‌گرداند.
+
+        Args:
+            merge (bool): ستون‌های MERGE_COLUMNS (وزن‌ها و هیستوگرام) هم برگردانده شوند.
+        """
+        try:
+            f = open(self._tier_path(tier), 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                row = json.loads(line)
+                if connection_name is not None and row['connection_name'] != connection_name:
+                    continue
+                if start is not None and row['bucket'] < start:
+                    continue
+                if end is not None and row['bucket'] >= end:
+                    continue
+                if not merge:
+                    for column in MERGE_COLUMNS:
+                        row.pop(column, None)
+                yield row
+
+    def _first_bucket(self):
+        """ابتدای قدیمی‌ترین سطل تجمیع‌شده (datetime) یا None."""
+        for tier in reversed(list(TIERS)):
+            try:
+                with open(self._tier_path(tier), 'r', encoding='utf-8') as f:
+                    line = f.readline()
+            except FileNotFoundError:
+                continue
+            if line.endswith('\n'):
+                return datetime.fromisoformat(json.loads(line)['bucket'])
+        return None
+
+    def resolution_for(self, start=None, end=None):
+        """
+        وضوح خودکار یک بازه: 'raw' یا یکی از کلیدهای TIERS.
+
+        بدون start، بازه از قدیمی‌ترین سطل تجمیع‌شده حساب می‌شود (داده‌ای که شاید دیگر خام موجود نباشد).
+        """
+        start = start if start is not None else self._first_bucket()
+        if start is None:
+            return 'raw'
+        span = (end or datetime.now()) - start
+        for threshold, tier in AUTO_RESOLUTION:
+            if span >= threshold:
+                return tier
+        return 'raw'
+
+    def query(self, connection_name=None, start=None, end=None, resolution='auto'):
+        """
+        تاریخچه یک بازه زمانی را با وضوح مناسب برمی‌گرداند.
+
+        برای بازه‌های طولانی به جای نتایج خام از سطح تجمیع استفاده می‌شود. بخشی از بازه که
+        هنوز تجمیع نشده (بعد از watermark سطح) از نتایج خام با همان aggregate ساخته می‌شود،
+        پس سطرها تا همین حالا کامل‌اند.
+
+        Args:
+            connection_name (str): نام اتصال یا None.
+            start (datetime): ابتدای بازه.
+            end (datetime): انتهای بازه. پیش‌فرض اکنون.
+            resolution (str): 'auto'، 'raw' یا یکی از کلیدهای TIERS.
+
+        Returns:
+            tuple: (resolution, list) که resolution وضوح انتخاب‌شده است؛ list نتایج خام
+                (برای 'raw') یا سطرهای سطح مرتب بر اساس bucket است.
+        """
+        end = end or datetime.now()
+        if resolution == 'auto':
+            resolution = self.resolution_for(start, end)
+        start_iso = start.isoformat() if start is not None else None
+        if resolution == 'raw':
+            return resolution, self.storage.query(connection_name, start_iso, end.isoformat())
+        if resolution not in TIERS:
+            raise ValueError(f"Unknown rollup resolution: {resolution!r}")
+
+        watermark = self.load_state().get(resolution)
+        covered = min(end, datetime.fromisoformat(watermark)) if watermark else None
+        rows = []
+        if covered is not None:
+            rows = list(self.iter_tier(resolution, connection_name, start_iso, covered.isoformat()))
+        raw_from = max(covered, start) if covered is not None and start is not None else (covered or start)
+        if raw_from is None or raw_from < end:
+            records = self.storage.iter_results(connection_name, raw_from.isoformat() if raw_from else None,
+                                                end.isoformat())
+            rolled = aggregate(results_to_frame(records, histograms=True), TIERS[resolution])
+            rows.extend(_to_rows(rolled[ROW_COLUMNS]))
+        return resolution, rows
+
+
+def run_compaction(data_dir='../data', backend='log', retention_days=7):
+    """نقطه ورود زیرفرمان compact در main.py."""
+    from storage import ResultStorage
+    storage = ResultStorage(data_dir=data_dir, backend=backend)
+    try:
+        summary = Rollup(storage, retention=timedelta(days=retention_days)).compact()
+    finally:
+        storage.close()
+    print(f"[+] Compaction done: {summary}")
+    return summary
@@ -0,0 +1,251 @@
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+
+import metrics
+
+MAGIC = b'NSPS'
+VERSION = 1
+# هدر ثابت هر سگمنت: magic، نسخه، اندازه رکورد و فضای رزرو
+HEADER = struct.Struct('<4sHH8x')
+# هر نمونه: timestamp (ثانیه epoch)، شناسه مقصد، RTT (میلی‌ثانیه، NaN برای timeout/خطا)، وضعیت
+RECORD = struct.Struct('<dIfB')
+STATUS_OK, STATUS_TIMEOUT, STATUS_ERROR = 0, 1, 2
+STATUS_NAMES = {STATUS_OK: 'ok', STATUS_TIMEOUT: 'timeout', STATUS_ERROR: 'error'}
+NAN = float('nan')
+
+
+def sample_dtype():
+    """dtype ساختاری numpy با همان چیدمان RECORD (بدون padding)."""
+    import numpy as np
+    return np.dtype([('timestamp', '<f8'), ('target', '<u4'), ('rtt', '<f4'), ('status', 'u1')])
+
+
+def target_id(name):
+    """شناسه پایدار مقصد (crc32 نام)، پس نویسنده‌های مختلف بدون هماهنگی شناسه یکسان می‌دهند."""
+    return zlib.crc32(name.encode('utf-8'))
+
+
+class SampleStore:
+    """
+    ذخیره‌سازی باینری فشرده نمونه‌های خام پینگ (هر پروب یک رکورد ۱۷ بایتی).
+
+    - نوشتن: هر نویسنده سگمنت مخصوص خودش را دارد (مثل ResultLog) و رکوردها در یک بافر
+      از پیش تخصیص‌یافته جمع و دسته‌ای با O_APPEND نوشته می‌شوند. نوشتن به numpy نیاز ندارد.
+    - خواندن: سگمنت‌ها با np.memmap باز می‌شوند و بازه زمانی با جست‌وجوی دودویی روی ستون
+      timestamp بریده می‌شود؛ نتیجه یک view روی فایل است، بدون کپی یا parse.
+    - نام مقصدها در targets.jsonl (شناسه -> نام) نگه داشته می‌شود.
+    """
+
+    def __init__(self, directory, buffer_records=4096, flush_interval=1.0,
+                 segment_max_bytes=256 * 1024 * 1024, segment_max_age=24 * 3600):
+        """
+        Args:
+            directory (str): پوشه سگمنت‌ها.
+            buffer_records (int): تعداد رکورد در بافر پیش از نوشتن روی دیسک.
+            flush_interval (float): حداکثر ماندن یک نمونه در بافر (ثانیه).
+            segment_max_bytes (int): اندازه‌ای که پس از آن سگمنت جدید باز می‌شود.
+            segment_max_age (float): سگمنت‌های قدیمی‌تر از این (ثانیه) دیگر نوشته نمی‌شوند.
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self._buffer = bytearray(buffer_records * RECORD.size)
+        self._capacity = buffer_records
+        self._count = 0
+        self._last_flush = time.monotonic()
+        self._fd = None
+        self._segment_created = 0.0
+        self._segment_size = 0
+        self._known = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # ---- نوشتن ----
+
+    def _register(self, name):
+        if self._known is None:
+            self._known = set(self.targets().values())
+        if name not in self._known:
+            line = json.dumps({'id': target_id(name), 'name': name}, ensure_ascii=False) + '\n'
+            fd = os.open(os.path.join(self.directory, 'targets.jsonl'),
+                         os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+            self._known.add(name)
+
+    def record(self, target, seq, delay, error, timestamp=None):
+        """
+        یک نمونه را ثبت می‌کند؛ امضای آن همان on_sample موتور پروب است.
+
+        Args:
+            target (str): نام مقصد.
+            seq (int): شماره پروب (ذخیره نمی‌شود؛ ترتیب با timestamp مشخص است).
+            delay (float | None): RTT به میلی‌ثانیه یا None برای timeout.
+            error (Exception | None): خطای پروب.
+            timestamp (float): زمان epoch. پیش‌فرض اکنون.
+        """
+        if error is not None:
+            status, rtt = STATUS_ERROR, NAN
+        elif delay is None:
+            status, rtt = STATUS_TIMEOUT, NAN
+        else:
+            status, rtt = STATUS_OK, delay
+        with self._lock:
+            self._register(target)
+            RECORD.pack_into(self._buffer, self._count * RECORD.size,
+                             time.time() if timestamp is None else timestamp, target_id(target), rtt, status)
+            self._count += 1
+            if self._count >= self._capacity or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def _open_segment(self):
+        self._segment_created = time.time()
+        # نام سگمنت با timestamp اولین رکورد بافر (نه زمان باز شدن) شروع می‌شود؛ رکوردهای
+        # بافر قبل از flush ثبت شده‌اند و iter_window سگمنت‌ها را با همین نام رد می‌کند
+        first = RECORD.unpack_from(self._buffer, 0)[0]
+        name = f"{int(first * 1000):013d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.bin"
+        self._fd = os.open(os.path.join(self.directory, name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._fd, HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._segment_size = HEADER.size
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._count:
+            return
+        if (self._fd is None or self._segment_size >= self.segment_max_bytes
+                or time.time() - self._segment_created >= self.segment_max_age):
+            self._close_segment()
+            self._open_segment()
+        view = memoryview(self._buffer)[:self._count * RECORD.size]
+        with metrics.timer('samples_flush'):
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+        self._segment_size += self._count * RECORD.size
+        self._count = 0
+
+    def _close_segment(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._close_segment()
+
+    # ---- خواندن ----
+
+    def targets(self):
+        """Returns: dict {شناسه: نام} همه مقصدهای ثبت‌شده."""
+        mapping = {}
+        try:
+            with open(os.path.join(self.directory, 'targets.jsonl'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # خط ناقص انتهای فایل
+                    mapping[item['id']] = item['name']
+        except FileNotFoundError:
+            pass
+        return mapping
+
+    def segments(self):
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith('.bin'))
+        return [os.path.join(self.directory, n) for n in names]
+
+    @staticmethod
+    def _map(path):
+        """سگمنت را به صورت آرایه ساختاری memmap (فقط خواندنی) باز می‌کند؛ رکورد ناقص آخر نادیده گرفته می‌شود."""
+        import numpy as np
+        dtype = sample_dtype()
+        count = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+        if count <= 0:
+            return np.empty(0, dtype=dtype)
+        with open(path, 'rb') as f:
+            magic, version, size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or size != dtype.itemsize:
+            raise ValueError(f"Not a NetSpector sample segment: {path}")
+        return np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(count,))
+
+    def iter_window(self, start=None, end=None):
+        """
+        برای هر سگمنت، viewی از نمونه‌های بازه [start, end) را برمی‌گرداند (بدون کپی).
+
+        رکوردهای هر سگمنت به ترتیب ثبت‌اند، پس timestamp آن‌ها صعودی است و برش با
+        جست‌وجوی دودویی انجام می‌شود. bisect فقط log(n) رکورد را می‌خواند؛ searchsorted روی
+        ستون strided کل ستون را کپی می‌کرد. سگمنت‌هایی که اولین رکوردشان (نام سگمنت) بعد از
+        end است باز نمی‌شوند.
+
+        Args:
+            start, end (float): زمان epoch (ثانیه) یا None.
+        """
+        for path in self.segments():
+            first = int(os.path.basename(path).split('-', 1)[0]) / 1000
+            if end is not None and first >= end:
+                continue
+            records = self._map(path)
+            if not len(records):
+                continue
+            times = records['timestamp']
+            lo = 0 if start is None else bisect.bisect_left(times, start)
+            hi = len(records) if end is None else bisect.bisect_left(times, end, lo)
+            if hi > lo:
+                yield records[lo:hi]
+
+    def window(self, start=None, end=None, target=None):
+        """
+        همه نمونه‌های بازه [start, end) (در صورت نیاز فقط یک مقصد) به ترتیب زمانی.
+
+        اگر فقط یک سگمنت درگیر باشد و target داده نشده باشد، نتیجه خود view روی فایل است.
+
+        Returns:
+            np.ndarray: آرایه ساختاری با ستون‌های timestamp، target، rtt و status.
+        """
+        import numpy as np
+        parts = list(self.iter_window(start, end))
+        if target is not None:
+            tid = target_id(target)
+            parts = [p[p['target'] == tid] for p in parts]
+        if not parts:
+            return np.empty(0, dtype=sample_dtype())
+        if len(parts) == 1:
+            return parts[0]
+        merged = np.concatenate(parts)
+        # سگمنت‌های نویسنده‌های همزمان ممکن است در زمان هم‌پوشانی داشته باشند
+        return merged[np.argsort(merged['timestamp'], kind='stable')]
+
+    def prune(self, before):
+        """
+        سگمنت‌های بسته‌ای که همه نمونه‌هایشان قدیمی‌تر از before (epoch) است حذف می‌شوند.
+
+        Returns:
+            int: تعداد سگمنت‌های حذف‌شده.
+        """
+        removed = 0
+        for path in self.segments():
+            # نام سگمنت زمان اولین رکورد است نه زمان باز شدن؛ سگمنتی که segment_max_age
+            # (و کمی حاشیه) نوشته نشده، در flush بعدی نویسنده‌اش کنار گذاشته می‌شود
+            if time.time() - os.path.getmtime(path) < self.segment_max_age + 60:
+                continue  # ممکن است هنوز نویسنده‌ای آن را بنویسد
+            records = self._map(path)
+            if len(records) and records['timestamp'][-1] >= before:
+                continue
+            del records
+            os.remove(path)
+            removed += 1
+        return removed
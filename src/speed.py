@@ -0,0 +1,288 @@
+import json
+import os
+import socket
+import threading
+import time
+
+
+def local_address(probe_host='8.8.8.8'):
+    """
+    آدرس IP محلی که برای رسیدن به اینترنت استفاده می‌شود (بدون ارسال هیچ بسته‌ای).
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect((probe_host, 80))
+            return s.getsockname()[0]
+    except OSError:
+        return None
+
+
+class ServerCache:
+    """
+    کش بهترین سرور speedtest.net روی دیسک با TTL.
+
+    همراه هر سرور یک «اثر انگشت شبکه» (IP عمومی و ISP گزارش‌شده توسط speedtest.net
+    به علاوه IP محلی) ذخیره می‌شود؛ اگر اثر انگشت تغییر کند (مثلاً اتصال به شبکه دیگر)
+    کش نامعتبر است و سرور دوباره انتخاب می‌شود.
+    """
+
+    def __init__(self, path='../data/speedtest_server.json', ttl=24 * 3600):
+        """
+        Args:
+            path (str): مسیر فایل کش.
+            ttl (float): عمر کش (ثانیه).
+        """
+        self.path = path
+        self.ttl = ttl
+
+    def get(self, fingerprint):
+        """سرور کش‌شده یا None اگر وجود نداشته، منقضی شده یا شبکه عوض شده باشد."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry.get('fingerprint') != fingerprint:
+            return None
+        if time.time() - entry.get('saved_at', 0) > self.ttl:
+            return None
+        return entry.get('server')
+
+    def put(self, fingerprint, server):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'saved_at': time.time(), 'server': server},
+                      f, indent=4, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def invalidate(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SpeedtestNetTarget:
+    """
+    اندازه‌گیری سرعت با speedtest.net و کش کردن انتخاب بهترین سرور.
+
+    پیکربندی speedtest.net همیشه دریافت می‌شود (IP عمومی برای اثر انگشت شبکه از
+    آن می‌آید)، ولی دانلود لیست کامل سرورها و پینگ آن‌ها فقط وقتی کش معتبر نیست انجام می‌شود.
+    """
+
+    def __init__(self, cache=None, streams=None):
+        """
+        Args:
+            cache (ServerCache): کش سرور. None یعنی بدون کش.
+            streams (int): تعداد جریان‌های موازی دانلود/آپلود. None یعنی پیش‌فرض speedtest.net.
+        """
+        self.cache = cache
+        self.streams = streams
+
+    def measure(self):
+        """
+        Returns:
+            dict: download_bps, upload_bps, server و timings (discovery, download, upload به ثانیه).
+        """
+        import speedtest  # سنگین است؛ فقط هنگام تست سرعت بارگذاری می‌شود
+
+        t0 = time.perf_counter()
+        st = speedtest.Speedtest()
+        client = st.config.get('client', {})
+        fingerprint = f"{client.get('ip')}|{client.get('isp')}|{local_address()}"
+        server = self.cache.get(fingerprint) if self.cache is not None else None
+        if server is not None:
+            # سرور کش‌شده را مستقیم تنظیم می‌کنیم تا لیست سرورها دانلود و پینگ نشود
+            st._best = server
+            st.results.server = server
+        else:
+            server = st.get_best_server()
+            if self.cache is not None:
+                self.cache.put(fingerprint, server)
+        t1 = time.perf_counter()
+        download_bps = st.download(threads=self.streams)
+        t2 = time.perf_counter()
+        upload_bps = st.upload(threads=self.streams)
+        t3 = time.perf_counter()
+        return {
+            'download_bps': download_bps,
+            'upload_bps': upload_bps,
+            'server': server.get('host'),
+            'timings': {'discovery': t1 - t0, 'download': t2 - t1, 'upload': t3 - t2},
+        }
+
+
+class HttpSpeedTarget:
+    """
+    اندازه‌گیری سرعت با یک سرور HTTP دلخواه (مثلاً یک سرور محلی در تست‌ها یا شبکه داخلی).
+
+    دانلود: چند جریان موازی GET روی download_url و شمارش بایت‌های دریافتی.
+    آپلود: چند جریان موازی POST با بدنه upload_bytes روی upload_url.
+    """
+
+    def __init__(self, download_url, upload_url=None, streams=4, upload_bytes=8 * 1024 * 1024,
+                 timeout=30):
+        self.download_url = download_url
+        self.upload_url = upload_url
+        self.streams = streams
+        self.upload_bytes = upload_bytes
+        self.timeout = timeout
+
+    def _parallel(self, worker):
+        """
+        worker را در streams جریان موازی اجرا می‌کند.
+
+        Returns:
+            tuple: (مجموع بایت‌ها، مدت به ثانیه)
+
+        Raises:
+            RuntimeError: اگر حتی یک جریان شکست بخورد؛ نرخ بقیه جریان‌ها کمتر از واقعی است.
+        """
+        counts = [0] * self.streams
+        errors = []
+
+        def run(i):
+            try:
+                counts[i] = worker()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(self.streams)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise RuntimeError(f"{len(errors)} of {self.streams} streams failed: {errors[0]}") from errors[0]
+        return sum(counts), elapsed
+
+    def _download_one(self):
+        import urllib.request
+        buffer = bytearray(256 * 1024)  # بافر از پیش تخصیص‌یافته برای readinto
+        total = 0
+        with urllib.request.urlopen(self.download_url, timeout=self.timeout) as response:
+            while True:
+                n = response.readinto(buffer)
+                if not n:
+                    return total
+                total += n
+
+    def _upload_one(self):
+        import urllib.request
+        body = bytes(self.upload_bytes)
+        request = urllib.request.Request(self.upload_url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/octet-stream'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+        return len(body)
+
+    def measure(self):
+        downloaded, download_time = self._parallel(self._download_one)
+        uploaded, upload_time = 0, 0.0
+        if self.upload_url:
+            uploaded, upload_time = self._parallel(self._upload_one)
+        return {
+            'download_bps': downloaded * 8 / download_time if download_time else 0.0,
+            'upload_bps': uploaded * 8 / upload_time if upload_time else 0.0,
+            'server': self.download_url,
+            'timings': {'discovery': 0.0, 'download': download_time, 'upload': upload_time},
+        }
+
+
+class FakeSpeedTarget:
+    """
+    مقصد سرعت ساختگی برای تست و بنچمارک آفلاین (بدون ترافیک واقعی)، هم‌شکل FakeTransport.
+    """
+
+    def __init__(self, download_mbps=100.0, upload_mbps=20.0, jitter=0.0, seed=None, duration=0.0):
+        """
+        Args:
+            download_mbps (float), upload_mbps (float): سرعت‌های شبیه‌سازی‌شده.
+            jitter (float): انحراف معیار نسبی نویز گاوسی روی سرعت‌ها (مثلاً 0.1 یعنی ۱۰٪).
+            seed (int): seed برای تولید اعداد تصادفی تکرارپذیر.
+            duration (float): زمان واقعی صبر برای هر جهت (ثانیه)؛ 0 یعنی بدون صبر.
+        """
+        import random
+        self.download_mbps = download_mbps
+        self.upload_mbps = upload_mbps
+        self.jitter = jitter
+        self.duration = duration
+        self._random = random.Random(seed)
+        self.measured = 0
+
+    def _speed(self, mbps):
+        return max(0.0, self._random.gauss(mbps, mbps * self.jitter)) * 1_000_000
+
+    def measure(self):
+        self.measured += 1
+        if self.duration:
+            time.sleep(2 * self.duration)
+        return {
+            'download_bps': self._speed(self.download_mbps),
+            'upload_bps': self._speed(self.upload_mbps),
+            'server': 'fake',
+            'timings': {'discovery': 0.0, 'download': self.duration, 'upload': self.duration},
+        }
+
+
+def serve_stand_in(host='127.0.0.1', port=0, payload_bytes=32 * 1024 * 1024):
+    """
+    یک سرور HTTP محلی برای تست سرعت آفلاین راه‌اندازی می‌کند (در یک thread پس‌زمینه).
+
+    GET /download  -> payload_bytes بایت
+    POST /upload   -> بدنه را می‌خواند و دور می‌ریزد
+
+    Returns:
+        tuple: (server, base_url). برای توقف server.shutdown() را صدا بزنید.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    chunk = bytes(1024 * 1024)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(payload_bytes))
+            self.end_headers()
+            view = memoryview(chunk)
+            remaining = payload_bytes
+            while remaining:
+                n = min(remaining, len(chunk))
+                self.wfile.write(view[:n])
+                remaining -= n
+
+        def do_POST(self):
+            remaining = int(self.headers.get('Content-Length', 0))
+            buffer = bytearray(256 * 1024)
+            while remaining:
+                n = self.rfile.readinto(memoryview(buffer)[:min(remaining, len(buffer))])
+                if not n:
+                    break
+                remaining -= n
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# اجرای آفلاین روی loopback
+if __name__ == "__main__":
+    server, base_url = serve_stand_in()
+    for streams in (1, 4):
+        target = HttpSpeedTarget(f"{base_url}/download", f"{base_url}/upload", streams=streams)
+        result = target.measure()
+        print(f"{streams} stream(s): download {result['download_bps'] / 1e6:.0f} Mbps, "
+              f"upload {result['upload_bps'] / 1e6:.0f} Mbps, timings {result['timings']}")
+    server.shutdown()
@@ -0,0 +1,179 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+class SqliteBackend:
+    """
+    بک‌اند سری زمانی مبتنی بر SQLite برای ResultStorage.
+
+    هر رکورد کامل به صورت JSON در ستون entry نگه داشته می‌شود و فیلدهای پرکاربرد
+    در ستون‌های جداگانه با ایندکس روی (connection_name, timestamp) و timestamp
+    ذخیره می‌شوند، پس پرس‌وجوی بازه‌ای و «آخرین N» از ایندکس جواب داده می‌شود
+    نه از اسکن کل تاریخچه.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            connection_name TEXT NOT NULL,
+            avg_latency REAL,
+            packet_loss REAL,
+            download_speed REAL,
+            upload_speed REAL,
+            entry TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_connection_time
+            ON results (connection_name, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_results_time
+            ON results (timestamp);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    INSERT = ('INSERT INTO results (timestamp, connection_name, avg_latency, packet_loss,'
+              ' download_speed, upload_speed, entry) VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str): مسیر فایل پایگاه داده.
+        """
+        self.db_path = db_path
+        # یک اتصال مشترک بین threadها (مثلاً thread تست در رابط گرافیکی) با قفل محافظت می‌شود
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _row(entry):
+        ping = entry.get('ping') or {}
+        speed = entry.get('speed') or {}
+        return (
+            entry['timestamp'],
+            entry['connection_name'],
+            ping.get('avg_latency'),
+            ping.get('packet_loss'),
+            speed.get('download_speed'),
+            speed.get('upload_speed'),
+            json.dumps(entry, ensure_ascii=False),
+        )
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """چند رکورد را در یک تراکنش درج می‌کند."""
+        rows = [self._row(e) for e in entries]
+        with self._lock, self._conn:
+            self._conn.executemany(self.INSERT, rows)
+
+    def _select(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def iter(self):
+        """
+        همه رکوردها را به ترتیب زمانی، صفحه به صفحه (keyset pagination) برمی‌گرداند.
+        """
+        last = ('', 0)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT timestamp, id, entry FROM results WHERE (timestamp, id) > (?, ?)'
+                    ' ORDER BY timestamp, id LIMIT ?', (*last, self.PAGE_SIZE)).fetchall()
+            for row in rows:
+                yield json.loads(row[2])
+            if len(rows) < self.PAGE_SIZE:
+                return
+            last = rows[-1][:2]
+
+    def load(self):
+        return self._select('SELECT entry FROM results ORDER BY timestamp, id')
+
+    def query(self, connection_name=None, start=None, end=None):
+        """
+        رکوردهای یک اتصال (یا همه اتصال‌ها) در بازه [start, end) را برمی‌گرداند.
+
+        Args:
+            connection_name (str): نام اتصال یا None برای همه.
+            start (str): timestamp شروع (ISO) یا None.
+            end (str): timestamp پایان (ISO، غیرشامل) یا None.
+        """
+        clauses, params = [], []
+        if connection_name is not None:
+            clauses.append('connection_name = ?')
+            params.append(connection_name)
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('timestamp < ?')
+            params.append(end)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._select(f'SELECT entry FROM results{where} ORDER BY timestamp, id', params)
+
+    def tail(self, n=10, connection_name=None):
+        """آخرین n رکورد (به ترتیب زمانی صعودی)."""
+        if connection_name is None:
+            rows = self._select('SELECT entry FROM results ORDER BY timestamp DESC, id DESC LIMIT ?', (n,))
+        else:
+            rows = self._select(
+                'SELECT entry FROM results WHERE connection_name = ?'
+                ' ORDER BY timestamp DESC, id DESC LIMIT ?', (connection_name, n))
+        rows.reverse()
+        return rows
+
+    def prune(self, before):
+        """رکوردهای قدیمی‌تر از before را حذف می‌کند و تعداد آن‌ها را برمی‌گرداند."""
+        with self._lock, self._conn:
+            return self._conn.execute('DELETE FROM results WHERE timestamp < ?', (before,)).rowcount
+
+    def migrate_legacy(self, json_path):
+        """
+        فایل JSON قدیمی را یک بار به جدول results منتقل می‌کند.
+
+        ردیف meta در همان تراکنش درج رکوردها تصاحب می‌شود، پس اگر دو پروسس (مثلاً monitor و
+        رابط گرافیکی) همزمان شروع کنند فقط یکی رکوردها را درج می‌کند.
+
+        Returns:
+            int: تعداد رکوردهای منتقل‌شده.
+        """
+        with self._lock:
+            # بررسی سریع تا فایل قدیمی در هر اجرا خوانده نشود؛ تصمیم نهایی در تراکنش پایین است
+            done = self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone()
+        if done or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"[-] Legacy file '{json_path}' is corrupt and was not migrated: {e}")
+            return 0
+
+        rows = [self._row(e) for e in records]
+        with self._lock, self._conn:
+            # INSERT قفل نوشتن پایگاه داده را تا commit می‌گیرد؛ پروسس دیگری که بین بررسی بالا و
+            # اینجا همین کار را کرده باشد ردیف را از قبل دارد و چیزی درج نمی‌شود
+            claimed = self._conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('legacy_migrated', ?)", (json_path,)).rowcount
+            if not claimed:
+                return 0
+            self._conn.executemany(self.INSERT, rows)
+        return len(rows)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,185 @@
+import math
+
+
+class LatencyHistogram:
+    """
+    هیستوگرام لگاریتمی با حافظه ثابت برای تخمین صدک‌های تاخیر (شبیه HDR / DDSketch).
+
+    هر مقدار در سطلی با عرض نسبی ثابت قرار می‌گیرد، پس خطای نسبی هر صدک حداکثر
+    relative_accuracy است. تعداد سطل‌ها به بازه [min_value, max_value] محدود است
+    (حدود ۱۰۰۰ سطل برای دقت ۱٪) و دو هیستوگرام با دقت یکسان با جمع شمارنده‌ها
+    ادغام می‌شوند؛ بنابراین می‌توان نتایج چند اجرا یا چند مقصد را با هم ترکیب کرد.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=0.001, max_value=1e6):
+        """
+        Args:
+            relative_accuracy (float): حداکثر خطای نسبی صدک‌ها (مثلاً 0.01 یعنی ۱٪).
+            min_value (float): کوچک‌ترین مقدار قابل تفکیک (میلی‌ثانیه). مقادیر کوچک‌تر در سطل صفر می‌روند.
+            max_value (float): مقادیر بزرگ‌تر در آخرین سطل قرار می‌گیرند.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._max_index = self._index(max_value)
+        self.zero_count = 0
+        self.buckets = {}  # index -> count (حداکثر حدود _max_index کلید)
+        self.count = 0
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index):
+        # نقطه میانی سطل به گونه‌ای که خطای نسبی در دو طرف برابر باشد
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, value, count=1):
+        if value < self.min_value:
+            self.zero_count += count
+        else:
+            index = min(self._index(value), self._max_index)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other):
+        """شمارنده‌های یک هیستوگرام دیگر (با همان دقت) را به این هیستوگرام اضافه می‌کند."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge histograms with different relative accuracy")
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """
+        مقدار تقریبی صدک q (بین ۰ و ۱) را برمی‌گرداند، یا None اگر هیستوگرام خالی باشد.
+        """
+        if self.count == 0:
+            return None
+        # روش nearest-rank: کوچک‌ترین مقداری که حداقل q از نمونه‌ها از آن کوچک‌تر یا مساوی‌اند
+        rank = max(0, math.ceil(q * self.count) - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return self._value(index)
+        return self._value(max(self.buckets))
+
+    def to_dict(self):
+        """نمایش فشرده و قابل ذخیره در JSON."""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'buckets': {str(k): v for k, v in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(relative_accuracy=data['relative_accuracy'])
+        histogram.zero_count = data.get('zero_count', 0)
+        histogram.buckets = {int(k): v for k, v in data.get('buckets', {}).items()}
+        histogram.count = histogram.zero_count + sum(histogram.buckets.values())
+        return histogram
+
+
+class LatencyStats:
+    """
+    انباشتگر آماری جریانی برای تاخیرها، بدون نگه داشتن نمونه‌های خام.
+
+    - میانگین و واریانس با الگوریتم Welford
+    - jitter بین‌رسیدن طبق RFC 3550 (میانگین نمایی با ضریب 1/16 روی اختلاف تاخیرهای متوالی)
+    - صدک‌ها از LatencyHistogram
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.sent = 0
+        self.received = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.rfc3550_jitter = 0.0
+        self._last = None
+        self.histogram = LatencyHistogram(relative_accuracy)
+
+    def add(self, delay):
+        """یک پاسخ موفق با تاخیر delay (میلی‌ثانیه) ثبت می‌کند."""
+        self.sent += 1
+        self.received += 1
+        diff = delay - self.mean
+        self.mean += diff / self.received
+        self._m2 += diff * (delay - self.mean)
+        self.min = delay if self.min is None else min(self.min, delay)
+        self.max = delay if self.max is None else max(self.max, delay)
+        if self._last is not None:
+            self.rfc3550_jitter += (abs(delay - self._last) - self.rfc3550_jitter) / 16
+        self._last = delay
+        self.histogram.add(delay)
+
+    def add_loss(self):
+        """یک پروب بی‌پاسخ (timeout یا خطا) ثبت می‌کند."""
+        self.sent += 1
+
+    @property
+    def stdev(self):
+        """انحراف معیار نمونه‌ای (مثل statistics.stdev)."""
+        return math.sqrt(self._m2 / (self.received - 1)) if self.received > 1 else 0.0
+
+    @property
+    def packet_loss(self):
+        return ((self.sent - self.received) / self.sent) * 100 if self.sent else 0.0
+
+    def merge(self, other):
+        """
+        آمار یک انباشتگر دیگر را با این یکی ترکیب می‌کند (مثلاً چند اجرا یا چند مقصد).
+
+        jitter طبق RFC 3550 ذاتاً ترتیبی است؛ در ادغام میانگین وزنی آن گزارش می‌شود.
+        """
+        if other.received:
+            total = self.received + other.received
+            diff = other.mean - self.mean
+            self._m2 += other._m2 + diff * diff * self.received * other.received / total
+            self.mean += diff * other.received / total
+            self.rfc3550_jitter = (self.rfc3550_jitter * self.received
+                                   + other.rfc3550_jitter * other.received) / total
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+            self.received = total
+        self.sent += other.sent
+        self.histogram.merge(other.histogram)
+        return self
+
+    def result(self):
+        """
+        نتایج را به شکل دیکشنری run_ping_test برمی‌گرداند.
+
+        Returns:
+            dict: کلیدهای قبلی (avg_latency, min_latency, max_latency, jitter, packet_loss)
+                به علاوه p50_latency, p95_latency, p99_latency, rfc3550_jitter و histogram.
+        """
+        if not self.received:
+            # اگر هیچ پاسخی دریافت نشد
+            results = dict.fromkeys(('avg_latency', 'min_latency', 'max_latency', 'jitter',
+                                     'p50_latency', 'p95_latency', 'p99_latency',
+                                     'rfc3550_jitter'), 0.0)
+            results['packet_loss'] = 100.0
+        else:
+            results = {
+                'avg_latency': self.mean,
+                'min_latency': self.min,
+                'max_latency': self.max,
+                'jitter': self.stdev,
+                'packet_loss': self.packet_loss,
+                # صدک‌ها به بازه [min, max] واقعی محدود می‌شوند
+                'p50_latency': min(max(self.histogram.quantile(0.50), self.min), self.max),
+                'p95_latency': min(max(self.histogram.quantile(0.95), self.min), self.max),
+                'p99_latency': min(max(self.histogram.quantile(0.99), self.min), self.max),
+                'rfc3550_jitter': self.rfc3550_jitter,
+            }
+        results['histogram'] = self.histogram.to_dict()
+        return results
@@ -1,19 +1,481 @@
+import collections
+import contextlib
+import heapq
+import itertools
 import json
 import os
+import time
+import uuid
 from datetime import datetime
 
+import metrics
+from samples import SampleStore
+
+try:
+    import fcntl
+except ImportError:  # ویندوز
+    fcntl = None
+
+
+def _timestamp(entry):
+    return entry.get('timestamp', '')
+
+
+def _matches(entry, connection_name, start, end):
+    """فیلتر مشترک برای بک‌اندهایی که پرس‌وجو را با اسکن انجام می‌دهند."""
+    if connection_name is not None and entry.get('connection_name') != connection_name:
+        return False
+    timestamp = entry.get('timestamp', '')
+    if start is not None and timestamp < start:
+        return False
+    if end is not None and timestamp >= end:
+        return False
+    return True
+
+
+class ResultLog:
+    """
+    لاگ فقط-افزودنی (append-only) نتایج به صورت سگمنت‌های JSON Lines.
+
+    هر نویسنده (هر نمونه از این کلاس) سگمنت مخصوص خودش را دارد، پس چند پروسس
+    می‌توانند همزمان بنویسند بدون اینکه نیاز به قفل داشته باشند. هر رکورد با یک
+    فراخوانی write در انتهای فایل نوشته می‌شود، پس هزینه نوشتن به حجم تاریخچه
+    بستگی ندارد و یک crash حداکثر خط آخر را ناقص می‌کند که هنگام خواندن رد می‌شود.
+
+    timestampها زمان محلی بدون منطقه زمانی‌اند (مثل تاریخچه‌های موجود)، پس ساعت ممکن است
+    عقب برود (پایان ساعت تابستانی یا اصلاح NTP). رکوردهای هر سگمنت همیشه مرتب‌اند، چون
+    نویسنده با دیدن timestamp کوچک‌تر از قبلی سگمنت تازه‌ای باز می‌کند.
+    """
+
+    LEGACY_SEGMENT = '0000000000000-legacy.jsonl'
+
+    def __init__(self, log_dir, fsync_every=0, segment_max_bytes=64 * 1024 * 1024,
+                 segment_max_age=24 * 3600):
+        """
+        Args:
+            log_dir (str): پوشه‌ای که سگمنت‌ها در آن نوشته می‌شوند.
+            fsync_every (int): بعد از هر چند رکورد fsync انجام شود. 0 یعنی فقط هنگام flush/close.
+            segment_max_bytes (int): وقتی سگمنت فعلی از این اندازه بزرگ‌تر شد، سگمنت جدید باز می‌شود.
+            segment_max_age (float): سگمنت‌های قدیمی‌تر از این (ثانیه) دیگر نوشته نمی‌شوند. جایی که
+                flock نیست (ویندوز) prune فقط سگمنت‌های قدیمی‌تر از این را لمس می‌کند.
+        """
+        self.log_dir = log_dir
+        self.fsync_every = fsync_every
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self._segment_created = 0.0
+        self._fd = None
+        self._segment_path = None
+        self._segment_size = 0
+        self._segment_first = None  # timestamp اولین رکورد سگمنت فعلی
+        self._last_timestamp = ''
+        self._unsynced = 0
+        os.makedirs(log_dir, exist_ok=True)
+
+    def _open_segment(self):
+        # نام سگمنت با زمان شروع آغاز می‌شود تا مرتب‌سازی الفبایی همان ترتیب زمانی باشد
+        self._segment_created = time.time()
+        name = f"{int(self._segment_created * 1000):013d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl"
+        self._segment_path = os.path.join(self.log_dir, name)
+        self._fd = os.open(self._segment_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            # تا وقتی سگمنت باز است قفل مشترک می‌ماند؛ prune فقط سگمنت‌های بی‌نویسنده را بازنویسی می‌کند
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+        self._segment_size = 0
+        self._segment_first = None
+
+    def append(self, entry):
+        """
+        یک رکورد را به انتهای سگمنت این نویسنده اضافه می‌کند.
+
+        Args:
+            entry (dict): رکوردی که باید ذخیره شود.
+        """
+        self.append_many([entry])
+
+    def writer(self):
+        """
+        نویسنده دیگری روی همین پوشه با سگمنت‌های خودش برمی‌گرداند.
+
+        iter و tail فرض می‌کنند رکوردهای هر سگمنت به ترتیب timestamp اند؛ منبعی که
+        رکوردهایش با ترتیب زمانی مستقل می‌رسند (مثل هر worker حالت fleet) نویسنده جدا می‌گیرد.
+        """
+        return ResultLog(self.log_dir, self.fsync_every, self.segment_max_bytes, self.segment_max_age)
+
+    def append_many(self, entries):
+        """چند رکورد را با یک فراخوانی write اضافه می‌کند (و اگر ساعت عقب رفته باشد در سگمنت تازه)."""
+        lines = []
+        first = None
+        for entry in entries:
+            timestamp = _timestamp(entry)
+            if timestamp < self._last_timestamp:
+                if lines:
+                    self._write(''.join(lines).encode('utf-8'), len(lines), first)
+                    lines = []
+                self.close()  # _write بعدی سگمنت تازه باز می‌کند
+            if not lines:
+                first = timestamp
+            self._last_timestamp = timestamp
+            lines.append(json.dumps(entry, ensure_ascii=False) + '\n')
+        if lines:
+            self._write(''.join(lines).encode('utf-8'), len(lines), first)
+
+    def _write(self, data, records, first):
+        if (self._fd is None or self._segment_size >= self.segment_max_bytes
+                or time.time() - self._segment_created >= self.segment_max_age):
+            self.close()
+            self._open_segment()
+        if self._segment_first is None:
+            self._segment_first = first
+
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        self._segment_size += len(data)
+
+        self._unsynced += records
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.flush()
+
+    def flush(self):
+        """رکوردهای نوشته‌شده را با fsync روی دیسک قطعی می‌کند."""
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+            self._unsynced = 0
+
+    def close(self):
+        if self._fd is not None:
+            self.flush()
+            os.close(self._fd)
+            self._fd = None
+
+    def segments(self):
+        """مسیر همه سگمنت‌ها به ترتیب زمان ایجاد."""
+        names = sorted(n for n in os.listdir(self.log_dir) if n.endswith('.jsonl'))
+        return [os.path.join(self.log_dir, n) for n in names]
+
+    @staticmethod
+    def _read_segment(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # خط ناقص در انتهای فایل (نوشتن نیمه‌کاره هنگام crash)
+                    break
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    @staticmethod
+    def _read_segment_reversed(path, block_size=64 * 1024):
+        """
+        رکوردهای یک سگمنت را از انتها به ابتدا، بلوک به بلوک و با حافظه ثابت می‌خواند.
+        """
+        try:
+            pos = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        remainder = b''
+        skip_torn_tail = True
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            # فایل برای هر بلوک دوباره باز می‌شود تا با تعداد زیاد سگمنت، fd باز نماند
+            with open(path, 'rb') as f:
+                f.seek(pos)
+                chunk = f.read(size)
+            lines = (chunk + remainder).split(b'\n')
+            remainder = lines.pop(0)
+            if skip_torn_tail:
+                if not lines:
+                    # هنوز به هیچ newline نرسیده‌ایم: همه این بخش جزو خط ناقص انتهایی است
+                    remainder = b''
+                    continue
+                # بخش بعد از آخرین newline یا خالی است یا یک نوشتن نیمه‌کاره
+                lines.pop()
+                skip_torn_tail = False
+            for line in reversed(lines):
+                record = ResultLog._parse_line(line)
+                if record is not None:
+                    yield record
+        if remainder and not skip_torn_tail:
+            record = ResultLog._parse_line(remainder)
+            if record is not None:
+                yield record
+
+    @staticmethod
+    def _parse_line(line):
+        if not line.strip():
+            return None
+        try:
+            return json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+
+    def iter(self):
+        """
+        همه رکوردها را مرتب بر اساس timestamp به صورت generator برمی‌گرداند.
+
+        سگمنت‌ها خط به خط ادغام می‌شوند، پس حافظه مصرفی به حجم تاریخچه بستگی ندارد.
+        """
+        readers = [self._read_segment(p) for p in self.segments()]
+        return heapq.merge(*readers, key=_timestamp)
+
+    def load(self):
+        """
+        همه رکوردها را از همه سگمنت‌ها، مرتب بر اساس timestamp، برمی‌گرداند.
+        """
+        return list(self.iter())
+
+    def query(self, connection_name=None, start=None, end=None):
+        return [r for r in self.iter() if _matches(r, connection_name, start, end)]
+
+    def tail(self, n=10, connection_name=None):
+        """
+        آخرین n رکورد را با خواندن سگمنت‌ها از انتها برمی‌گرداند (به ترتیب زمانی صعودی).
+        """
+        if n <= 0:
+            return []
+        readers = [self._read_segment_reversed(p) for p in self.segments()]
+        newest_first = heapq.merge(*readers, key=_timestamp, reverse=True)
+        if connection_name is not None:
+            newest_first = (r for r in newest_first if r.get('connection_name') == connection_name)
+        records = list(itertools.islice(newest_first, n))
+        records.reverse()
+        return records
+
+    @contextlib.contextmanager
+    def _claim(self, path):
+        """
+        سگمنتی که هیچ نویسنده‌ای (در هیچ پروسسی) باز نگه نداشته را برای بازنویسی قفل می‌کند.
+
+        نویسنده‌ها سگمنت موجود را هرگز دوباره باز نمی‌کنند، پس سگمنت بی‌قفل تا پایان بازنویسی
+        دست‌نخورده می‌ماند. Yields: bool، آیا سگمنت در اختیار prune است.
+        """
+        if fcntl is None:
+            # بدون flock فقط عمر سگمنت معلوم است؛ کمی حاشیه برای ساعت‌های ناهمگام بین پروسس‌ها
+            closed_before = (time.time() - self.segment_max_age - 60) * 1000
+            yield int(os.path.basename(path).split('-', 1)[0]) < closed_before
+            return
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            yield False  # prune دیگری همین حالا حذفش کرد
+            return
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+            else:
+                yield True
+        finally:
+            os.close(fd)
+
+    def prune(self, before):
+        """
+        رکوردهای قدیمی‌تر از before را حذف می‌کند.
+
+        فقط سگمنت‌هایی که هیچ نویسنده‌ای باز نگه نداشته لمس می‌شوند؛ سگمنت کاملاً قدیمی حذف
+        و سگمنت مخلوط با یک فایل موقت و os.replace به صورت اتمیک بازنویسی می‌شود. سگمنت فعلی
+        همین نویسنده اگر رکورد قدیمی‌تر از before داشته باشد بسته می‌شود تا آن هم prune شود.
+
+        Args:
+            before (str): timestamp (ISO)؛ رکوردهای با timestamp کوچک‌تر حذف می‌شوند.
+
+        Returns:
+            int: تعداد رکوردهای حذف‌شده.
+        """
+        if self._fd is not None and self._segment_first is not None and self._segment_first < before:
+            self.close()
+        removed = 0
+        for path in self.segments():
+            with self._claim(path) as claimed:
+                if not claimed:
+                    continue
+                keep, dropped = [], 0
+                for record in self._read_segment(path):
+                    if _timestamp(record) < before:
+                        dropped += 1
+                    else:
+                        keep.append(record)
+                if not dropped:
+                    continue
+                # سگمنت legacy حتی خالی هم نگه داشته می‌شود تا مهاجرت دوباره اجرا نشود
+                if keep or os.path.basename(path) == self.LEGACY_SEGMENT:
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp, 'w', encoding='utf-8') as f:
+                        for record in keep:
+                            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp, path)
+                else:
+                    os.remove(path)
+                removed += dropped
+        return removed
+
+    def migrate_legacy(self, json_path):
+        """
+        فایل JSON قدیمی (یک آرایه) را یک بار به یک سگمنت تبدیل می‌کند.
+
+        فایل قدیمی دست نخورده باقی می‌ماند. وجود سگمنت legacy یعنی مهاجرت قبلاً انجام شده است.
+
+        Returns:
+            int: تعداد رکوردهای منتقل‌شده (0 اگر چیزی منتقل نشد).
+        """
+        target = os.path.join(self.log_dir, self.LEGACY_SEGMENT)
+        if os.path.exists(target) or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except json.JSONDecodeError as e:
+            # print(f"[-] فایل '{json_path}' خراب است و منتقل نشد: {e}")
+            print(f"[-] Legacy file '{json_path}' is corrupt and was not migrated: {e}")
+            return 0
+
+        # ابتدا در یک فایل موقت می‌نویسیم و بعد به صورت اتمیک جایگزین می‌کنیم
+        tmp = f"{target}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        return len(records)
+
+
+class JsonFileBackend:
+    """
+    بک‌اند قدیمی: همه نتایج در یک آرایه JSON که در هر ذخیره کامل بازنویسی می‌شود.
+
+    برای سازگاری با فایل‌های موجود نگه داشته شده است؛ هزینه هر ذخیره O(n) است.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+    def append(self, entry):
+        # خواندن داده‌های موجود از فایل (اگر وجود دارد)
+        existing_data = self.load()
+
+        # اضافه کردن رکورد جدید به لیست موجود
+        existing_data.append(entry)
+
+        # نوشتن کل لیست به فایل
+        with open(self.filepath, 'w', encoding='utf-8') as f:
+            json.dump(existing_data, f, indent=4, ensure_ascii=False)
+
+    def append_many(self, entries):
+        """چند رکورد را با یک بار بازنویسی فایل اضافه می‌کند."""
+        existing_data = self.load()
+        existing_data.extend(entries)
+        with open(self.filepath, 'w', encoding='utf-8') as f:
+            json.dump(existing_data, f, indent=4, ensure_ascii=False)
+
+    def iter(self):
+        """
+        عناصر آرایه JSON را بدون بارگذاری کل فایل، یکی یکی parse می‌کند.
+        """
+        decoder = json.JSONDecoder()
+        try:
+            f = open(self.filepath, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            buf = ''
+            started = False
+            while True:
+                chunk = f.read(64 * 1024)
+                buf += chunk
+                pos = 0
+                if not started:
+                    stripped = buf.lstrip()
+                    if not stripped:
+                        if not chunk:
+                            return
+                        continue
+                    if stripped[0] != '[':
+                        return  # فایل خراب؛ مثل load رفتار می‌کنیم
+                    buf = stripped[1:]
+                    started = True
+                while True:
+                    while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                        pos += 1
+                    if pos < len(buf) and buf[pos] == ']':
+                        return
+                    try:
+                        record, pos = decoder.raw_decode(buf, pos)
+                    except json.JSONDecodeError:
+                        break  # رکورد ناقص است؛ بلوک بعدی را بخوان
+                    yield record
+                buf = buf[pos:]
+                if not chunk:
+                    return
+
+    def load(self):
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # اگر فایل وجود نداشت یا خالی/خراب بود، یک لیست خالی برگردان
+            return []
+
+    def query(self, connection_name=None, start=None, end=None):
+        return [r for r in self.iter() if _matches(r, connection_name, start, end)]
+
+    def tail(self, n=10, connection_name=None):
+        if n <= 0:
+            return []
+        records = (r for r in self.iter() if _matches(r, connection_name, None, None))
+        return list(collections.deque(records, maxlen=n))
+
+    def prune(self, before):
+        records = self.load()
+        keep = [r for r in records if _timestamp(r) >= before]
+        if len(keep) != len(records):
+            with open(self.filepath, 'w', encoding='utf-8') as f:
+                json.dump(keep, f, indent=4, ensure_ascii=False)
+        return len(records) - len(keep)
+
+    def migrate_legacy(self, json_path):
+        # این بک‌اند خودش همان فایل قدیمی است
+        return 0
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
 class ResultStorage:
     """
-    یک کلاس برای ذخیره و بازیابی نتایج تست‌های شبکه در یک فایل JSON.
+    یک کلاس برای ذخیره و بازیابی نتایج تست‌های شبکه.
+
+    ذخیره‌سازی واقعی به یک بک‌اند سپرده می‌شود:
+        - 'log': لاگ فقط-افزودنی JSON Lines (پیش‌فرض)
+        - 'sqlite': پایگاه داده SQLite با ایندکس زمانی
+        - 'json': فایل JSON قدیمی (یک آرایه)
+    فایل JSON قدیمی در اولین اجرای بک‌اندهای 'log' و 'sqlite' یک بار منتقل می‌شود.
     """
 
-    def __init__(self, data_dir='../data', filename='network_results.json'):
+    def __init__(self, data_dir='../data', filename='network_results.json',
+                 backend='log', log_dirname='results_log', db_filename='network_results.db',
+                 fsync_every=0, record_samples=True, samples_dirname='samples'):
         """
         مقداردهی اولیه ذخیره‌سازی.
 
         Args:
             data_dir (str): مسیر نسبی پوشه‌ای که فایل نتایج در آن ذخیره می‌شود.
-            filename (str): نام فایل JSON.
+            filename (str): نام فایل JSON (بک‌اند 'json' یا منبع مهاجرت).
+            backend (str): یکی از 'log'، 'sqlite' یا 'json'، یا یک شیء بک‌اند آماده.
+            log_dirname (str): نام پوشه سگمنت‌های لاگ داخل data_dir.
+            db_filename (str): نام فایل پایگاه داده SQLite داخل data_dir.
+            fsync_every (int): بعد از هر چند رکورد fsync انجام شود (فقط بک‌اند 'log').
+            record_samples (bool): نمونه‌های خام هر پروب در SampleStore (پوشه samples_dirname) ثبت شوند.
         """
         self.data_dir = data_dir
         self.filename = filename
@@ -22,53 +484,181 @@ class ResultStorage:
         # مطمئن شویم پوشه data وجود دارد
         os.makedirs(data_dir, exist_ok=True)
 
-    def save_result(self, connection_name, ping_results, speed_results):
+        if backend == 'log':
+            self.backend = ResultLog(os.path.join(data_dir, log_dirname), fsync_every=fsync_every)
+        elif backend == 'sqlite':
+            from sqlite_store import SqliteBackend
+            self.backend = SqliteBackend(os.path.join(data_dir, db_filename))
+        elif backend == 'json':
+            self.backend = JsonFileBackend(self.filepath)
+        elif isinstance(backend, str):
+            raise ValueError(f"Unknown storage backend: {backend!r}")
+        else:
+            self.backend = backend
+        # برچسب backend در شاخص‌های زمان نوشتن
+        self.backend_name = backend if isinstance(backend, str) else type(backend).__name__
+
+        migrated = self.backend.migrate_legacy(self.filepath)
+        if migrated:
+            print(f"[+] Migrated {migrated} results from '{self.filepath}'.")
+
+        self.samples = SampleStore(os.path.join(data_dir, samples_dirname)) if record_samples else None
+        self._streams = {}  # stream -> بک‌اند نویسنده (save_batch)
+
+    def save_result(self, connection_name, ping_results, speed_results, probe_type='icmp'):
         """
-        نتیجه یک تست را به انتهای فایل JSON اضافه می‌کند.
+        نتیجه یک تست را در بک‌اند ذخیره‌سازی اضافه می‌کند.
 
         Args:
             connection_name (str): نام توصیفی برای اتصال (مثلاً 'Irancell-Hotspot').
             ping_results (dict): نتایج بازگشتی از متد run_ping_test.
             speed_results (dict): نتایج بازگشتی از متد run_speed_test.
+            probe_type (str): نوع پروبی که ping_results را تولید کرده (icmp، tcp، udp، dns، http).
+                نتایج قدیمی این فیلد را ندارند و icmp فرض می‌شوند.
         """
         # ساخت یک رکورد جدید از داده‌ها
         new_entry = {
             'timestamp': datetime.now().isoformat(), # زمان دقیق تست
             'connection_name': connection_name,
+            'probe_type': probe_type,
             'ping': ping_results,
             'speed': speed_results
         }
 
-        # خواندن داده‌های موجود از فایل (اگر وجود دارد)
-        try:
-            with open(self.filepath, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            # اگر فایل وجود نداشت یا خالی/خراب بود، یک لیست جدید شروع کن
-            existing_data = []
+        with metrics.timer('storage_write', backend=self.backend_name):
+            self.backend.append(new_entry)
+        metrics.record_result(connection_name, ping_results, speed_results, probe_type)
 
-        # اضافه کردن رکورد جدید به لیست موجود
-        existing_data.append(new_entry)
+    def save_batch(self, results, stream=None):
+        """
+        چند نتیجه را یکجا ذخیره می‌کند (مثلاً دسته‌ای که از workerهای حالت fleet رسیده).
 
-        # نوشتن کل لیست به فایل
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, indent=4, ensure_ascii=False)
+        Args:
+            results (iterable): تاپل‌های (connection_name, ping_results, speed_results, probe_type, timestamp)
+                که timestamp یک datetime است.
+            stream: شناسه منبعی که نتایجش به ترتیب زمانی می‌رسند ولی نسبت به منابع دیگر نه
+                (مثلاً شماره worker). در بک‌اند log هر stream سگمنت‌های خودش را دارد.
+
+        Returns:
+            int: تعداد رکوردهای ذخیره‌شده.
+        """
+        entries = [{
+            'timestamp': timestamp.isoformat(),
+            'connection_name': connection_name,
+            'probe_type': probe_type,
+            'ping': ping_results,
+            'speed': speed_results,
+        } for connection_name, ping_results, speed_results, probe_type, timestamp in results]
+        backend = self.backend if stream is None else self._stream_backend(stream)
+        append_many = getattr(backend, 'append_many', None)
+        with metrics.timer('storage_write', backend=self.backend_name):
+            if append_many is not None:
+                append_many(entries)
+            else:
+                for entry in entries:
+                    backend.append(entry)
+        if metrics.enabled:
+            for entry in entries:
+                metrics.record_result(entry['connection_name'], entry['ping'], entry['speed'], entry['probe_type'],
+                                      datetime.fromisoformat(entry['timestamp']).timestamp())
+        return len(entries)
+
+    def _stream_backend(self, stream):
+        backend = self._streams.get(stream)
+        if backend is None:
+            # بک‌اندهای بدون writer (مثل sqlite) ترتیب را خودشان با ایندکس زمانی نگه می‌دارند
+            writer = getattr(self.backend, 'writer', None)
+            backend = self._streams[stream] = writer() if writer is not None else self.backend
+        return backend
 
-        # print(f"[+] نتایج با موفقیت در '{self.filepath}' ذخیره شد.")
-        print(f"[+] Results successfully saved to '{self.filepath}'.")
+    def _writers(self):
+        return [backend for backend in self._streams.values() if backend is not self.backend]
 
     def load_results(self):
         """
-        تمام نتایج تاریخی را از فایل JSON بارگذاری می‌کند.
+        تمام نتایج تاریخی را بارگذاری می‌کند.
 
         Returns:
             list: لیستی از دیکشنری‌های حاوی تمام نتایج.
         """
-        try:
-            with open(self.filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []  # اگر فایل وجود نداشت، یک لیست خالی برگردان
+        return self.backend.load()
+
+    @staticmethod
+    def _iso(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    def query(self, connection_name=None, start=None, end=None):
+        """
+        نتایج یک اتصال در یک بازه زمانی را برمی‌گرداند.
+
+        Args:
+            connection_name (str): نام اتصال یا None برای همه اتصال‌ها.
+            start (datetime | str): ابتدای بازه (شامل) یا None.
+            end (datetime | str): انتهای بازه (غیرشامل) یا None.
+
+        Returns:
+            list: نتایج به ترتیب زمانی.
+        """
+        return self.backend.query(connection_name, self._iso(start), self._iso(end))
+
+    def iter_results(self, connection_name=None, start=None, end=None):
+        """
+        نتایج را به ترتیب زمانی و یکی یکی (generator) برمی‌گرداند، بدون ساختن لیست کامل.
+
+        Args:
+            connection_name (str): نام اتصال یا None برای همه اتصال‌ها.
+            start (datetime | str): ابتدای بازه (شامل) یا None.
+            end (datetime | str): انتهای بازه (غیرشامل) یا None.
+        """
+        start, end = self._iso(start), self._iso(end)
+        for entry in self.backend.iter():
+            if _matches(entry, connection_name, start, end):
+                yield entry
+
+    def tail(self, n=10, connection_name=None):
+        """
+        آخرین n نتیجه (در صورت نیاز فقط برای یک اتصال) را به ترتیب زمانی برمی‌گرداند.
+
+        بک‌اند لاگ فایل‌ها را از انتها می‌خواند، پس هزینه به n بستگی دارد نه به حجم تاریخچه.
+        """
+        return self.backend.tail(n, connection_name)
+
+    def prune(self, before):
+        """
+        نتایج قدیمی‌تر از before را از ذخیره‌سازی خام حذف می‌کند.
+
+        Args:
+            before (datetime | str): مرز زمانی (غیرشامل).
+
+        Returns:
+            int: تعداد رکوردهای حذف‌شده.
+        """
+        if self.samples is not None:
+            cutoff = datetime.fromisoformat(before) if isinstance(before, str) else before
+            self.samples.prune(cutoff.timestamp())
+        return self.backend.prune(self._iso(before))
+
+    def record_sample(self, target, seq, delay, error):
+        """
+        نمونه خام یک پروب را ثبت می‌کند (امضای on_sample موتور پروب). بدون SampleStore کاری نمی‌کند.
+        """
+        if self.samples is not None:
+            self.samples.record(target, seq, delay, error)
+
+    def flush(self):
+        self.backend.flush()
+        for backend in self._writers():
+            backend.flush()
+        if self.samples is not None:
+            self.samples.flush()
+
+    def close(self):
+        """رکوردهای معلق را روی دیسک قطعی کرده و بک‌اند را می‌بندد."""
+        self.backend.close()
+        for backend in self._writers():
+            backend.close()
+        if self.samples is not None:
+            self.samples.close()
 
 # بخشی برای تست مستقل ماژول
 if __name__ == "__main__":
@@ -77,6 +667,7 @@ if __name__ == "__main__":
     test_ping = {'avg_latency': 45.6, 'jitter': 12.3, 'packet_loss': 0.0}
     test_speed = {'download_speed': 32.1, 'upload_speed': 5.7}
     storage.save_result("Test-Connection", test_ping, test_speed)
+    storage.close()
     all_data = storage.load_results()
     # print("همه داده‌های ذخیره شده:", all_data)
     print("All stored data:", all_data)
\ No newline at end of file
@@ -1,28 +1,60 @@
-import speedtest
-from ping3 import ping
-import time
-import statistics
+import metrics
+from engine import ProbeEngine
+from probes import probe_type
+from speed import ServerCache, SpeedtestNetTarget
 
 class NetworkTester:
     """
     یک کلاس برای انجام تست‌های مختلف شبکه شامل پینگ و سرعت.
     """
 
-    def __init__(self, test_server='8.8.8.8'):
+    def __init__(self, test_server='8.8.8.8', transport=None, max_in_flight=64,
+                 speed_target=None, speed_streams=None):
         """
         مقداردهی اولیه تستر.
 
         Args:
             test_server (str): آدرس IP یا hostname سروری که برای تست پینگ استفاده می‌شود. پیش‌فرض '8.8.8.8' (DNS گوگل) است.
+            transport: ترنسپورت پروب (مثلاً FakeTransport برای تست آفلاین). پیش‌فرض موتور ICMP (یا ping3 بدون دسترسی).
+            max_in_flight (int): حداکثر تعداد پینگ‌های همزمان در تست چند مقصدی.
+            speed_target: مقصد تست سرعت (شیئی با متد measure()، مثلاً HttpSpeedTarget).
+                پیش‌فرض speedtest.net با کش بهترین سرور.
+            speed_streams (int): تعداد جریان‌های موازی برای مقصد پیش‌فرض. None یعنی پیش‌فرض speedtest.net.
         """
         self.test_server = test_server
+        if speed_target is None:
+            speed_target = SpeedtestNetTarget(cache=ServerCache(), streams=speed_streams)
+        self.speed_target = speed_target
+        self.engine = ProbeEngine(transport=transport, max_in_flight=max_in_flight, timeout=1)
+
+    @property
+    def probe_type(self):
+        """نوع پروب تست پینگ (icmp، tcp، udp، dns یا http) برای ذخیره همراه نتایج."""
+        return probe_type(self.engine.transport)
+
+    @staticmethod
+    def _print_sample(target, seq, delay, error):
+        if error is not None:
+            # print(f"  پینگ {seq+1}: خطا - {error}")
+            print(f"  Ping {seq+1}: error - {error}")
+        elif delay is None:
+            # print(f"  پینگ {seq+1}: timeout")
+            print(f"  Ping {seq+1}: timeout")
+        else:
+            # print(f"  پینگ {seq+1}: {delay:.2f} ms")
+            print(f"  Ping {seq+1}: {delay:.2f} ms")
 
-    def run_ping_test(self, count=10):
+    def run_ping_test(self, count=10, interval=0.5, on_sample=None, sampler=None, budget=None):
         """
         یک تست پینگ انجام می‌دهد و آمار آن را محاسبه می‌کند.
 
         Args:
             count (int): تعداد پینگ‌های ارسالی. پیش‌فرض 10.
+            interval (float): فاصله بین ارسال پینگ‌ها (ثانیه). پیش‌فرض 0.5.
+            on_sample (callable): در صورت نیاز، بعد از هر پینگ با (target, seq, delay, error) صدا زده می‌شود.
+            sampler (AdaptiveSampler): نمونه‌برداری تطبیقی؛ count فقط طول پنجره (count * interval)
+                را تعیین می‌کند و تعداد پینگ‌ها با پایداری لینک کم و زیاد می‌شود.
+            budget (ProbeBudget): سقف سراسری پینگ در ثانیه در حالت تطبیقی.
 
         Returns:
             dict: یک دیکشنری حاوی نتایج تست پینگ شامل:
@@ -31,58 +63,51 @@ class NetworkTester:
                 - max_latency (float): بیشترین تاخیر
                 - jitter (float): انحراف معیار تاخیرها (میلی‌ثانیه)
                 - packet_loss (float): درصد بسته‌های از دست رفته
+                - p50_latency, p95_latency, p99_latency (float): صدک‌های تاخیر
+                - rfc3550_jitter (float): jitter بین‌رسیدن طبق RFC 3550
+                - histogram (dict): هیستوگرام فشرده تاخیرها (قابل ادغام با LatencyHistogram.from_dict)
+                - sampling (dict): فقط در حالت تطبیقی، تصمیم‌های نمونه‌برداری (ProbeEngine.probe_adaptive)
         """
-        delays = []  # لیست برای ذخیره زمان‌های پاسخ موفق
-        lost = 0     # شمارنده پینگ‌های از دست رفته
-
         # print(f"[+] در حال ارسال {count} پینگ به {self.test_server}...")
         print(f" Sending {count} pings to {self.test_server}...")
 
-        for i in range(count):
-            try:
-                # ارسال پینگ و دریافت پاسخ بر حسب میلی‌ثانیه
-                delay = ping(self.test_server, unit='ms', timeout=1)
-                if delay is None or delay is False:
-                    # اگر پاسخی دریافت نشد (Timeout یا خطای دیگر)
-                    # print(f"  پینگ {i+1}: timeout")
-                    print(f"  Ping {i+1}: timeout")
-                    lost += 1
-                else:
-                    # اگر پاسخ موفقیت‌آمیز بود
-                    # print(f"  پینگ {i+1}: {delay:.2f} ms")
-                    print(f"  Ping {i+1}: {delay:.2f} ms")
-                    delays.append(delay)
-            except Exception as e:
-                # گرفتن هرگونه استثنای دیگر
-                # print(f"  پینگ {i+1}: خطا - {e}")
-                print(f"  Ping {i+1}: error - {e}")
-                lost += 1
-            time.sleep(0.5)  # مکث نیم ثانیه بین هر پینگ
-
-        # محاسبه آمار
-        if delays:  # اگر حداقل یک پاسخ موفق داشتیم
-            avg_delay = statistics.mean(delays)
-            min_delay = min(delays)
-            max_delay = max(delays)
-            jitter = statistics.stdev(delays) if len(delays) > 1 else 0.0
-            loss_percent = (lost / count) * 100
-        else:
-            # اگر هیچ پاسخی دریافت نشد
-            avg_delay = min_delay = max_delay = jitter = 0.0
-            loss_percent = 100.0
-
-        results = {
-            'avg_latency': avg_delay,
-            'min_latency': min_delay,
-            'max_latency': max_delay,
-            'jitter': jitter,
-            'packet_loss': loss_percent
-        }
+        def report(target, seq, delay, error):
+            self._print_sample(target, seq, delay, error)
+            if on_sample is not None:
+                on_sample(target, seq, delay, error)
+
+        samplers = {self.test_server: sampler} if sampler is not None else None
+        sweep = self.engine.run_sync([self.test_server], count=count, interval=interval,
+                                     on_sample=report, samplers=samplers, budget=budget)
+        results = sweep[self.test_server]
 
         # print("[+] تست پینگ تکمیل شد.")
         print("[+] Ping test completed.")
         return results
 
+    def run_multi_ping_test(self, targets, count=10, interval=0.5, intervals=None, on_sample=None,
+                            samplers=None, budget=None):
+        """
+        چند مقصد را به صورت همزمان پینگ می‌کند.
+
+        Args:
+            targets (list): لیست آدرس‌های IP یا hostnameها.
+            count (int): تعداد پینگ برای هر مقصد.
+            interval (float): فاصله پیش‌فرض بین پینگ‌های هر مقصد (ثانیه).
+            intervals (dict): فاصله اختصاصی برای بعضی مقصدها {target: seconds}.
+            on_sample (callable): در صورت نیاز، بعد از هر پینگ با (target, seq, delay, error) صدا زده می‌شود.
+            samplers (dict): {target: AdaptiveSampler} برای مقصدهایی که تطبیقی پینگ می‌شوند.
+            budget (ProbeBudget): سقف سراسری پینگ در ثانیه، مشترک بین همه مقصدهای تطبیقی.
+
+        Returns:
+            dict: {target: نتایج به همان شکل run_ping_test}
+        """
+        print(f" Sending {count} pings to {len(targets)} targets...")
+        results = self.engine.run_sync(targets, count=count, interval=interval, intervals=intervals,
+                                       on_sample=on_sample, samplers=samplers, budget=budget)
+        print("[+] Multi-target ping test completed.")
+        return results
+
     def run_speed_test(self):
         """
         تست سرعت اینترنت (دانلود و آپلود) را اجرا می‌کند.
@@ -91,28 +116,35 @@ class NetworkTester:
             dict: یک دیکشنری حاوی نتایج تست سرعت شامل:
                 - download_speed (float): سرعت دانلود (Mbps)
                 - upload_speed (float): سرعت آپلود (Mbps)
+                - server (str): سروری که اندازه‌گیری با آن انجام شد
+                - timings (dict): زمان هر مرحله به ثانیه (discovery, download, upload)
+                - intervals (dict): پهنای باند هر بازه گزارش (Mbps) در download_mbps و upload_mbps،
+                  فقط اگر مقصد آن را گزارش کند (مثلاً سرور throughput داخلی)
         """
         # print("[+] در حال اجرای تست سرعت (این ممکن است چند لحظه طول بکشد)...")
         print("[+] Running speed test (this may take a while)...")  
         try:
-            st = speedtest.Speedtest()
-            # پیدا کردن بهترین سرور
-            st.get_best_server()
-            # اجرای تست دانلود
-            st.download()
-            # اجرای تست آپلود
-            st.upload()
-            # گرفتن نتایج
-            results = st.results.dict()
+            measured = self.speed_target.measure()
+            for phase, seconds in measured['timings'].items():
+                metrics.observe(f'speed_{phase}', seconds)
+            metrics.count('speed_tests')
 
             # تبدیل بیت بر ثانیه به مگابیت بر ثانیه و گرد کردن
-            download_mbps = results['download'] / 1_000_000
-            upload_mbps = results['upload'] / 1_000_000
+            download_mbps = measured['download_bps'] / 1_000_000
+            upload_mbps = measured['upload_bps'] / 1_000_000
 
             speed_results = {
                 'download_speed': round(download_mbps, 2),
-                'upload_speed': round(upload_mbps, 2)
+                'upload_speed': round(upload_mbps, 2),
+                'server': measured['server'],
+                'timings': {k: round(v, 3) for k, v in measured['timings'].items()},
             }
+            if measured.get('intervals'):
+                # پهنای باند هر بازه گزارش، مثل کل نتیجه بر حسب Mbps
+                speed_results['intervals'] = {
+                    f"{direction}_mbps": [round(bps / 1_000_000, 2)
+                                          for bps in measured['intervals'][f"{direction}_bps"]]
+                    for direction in ('download', 'upload')}
 
             # print(f"[+] تست سرعت تکمیل شد: دانلود: {download_mbps:.2f} Mbps, آپلود: {upload_mbps:.2f} Mbps")
             print(f"[+] Speed test completed: Download: {download_mbps:.2f} Mbps, Upload: {upload_mbps:.2f} Mbps")
@@ -121,6 +153,7 @@ class NetworkTester:
         except Exception as e:
             # print(f"[-] خطا در اجرای تست سرعت: {e}")
             print(f"[-] Error running speed test: {e}")
+            metrics.count('speed_test_errors')
             # بازگرداندن مقادیر صفر در صورت خطا
             return {'download_speed': 0.0, 'upload_speed': 0.0}
 
@@ -0,0 +1,382 @@
+import json
+import math
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+
+DEFAULT_PORT = 5201
+MAGIC = b'NSPT'
+# هدر هر جریان: magic، حالت (D: سرور می‌فرستد، U: کلاینت می‌فرستد)، مدت (ثانیه)، طول بازه گزارش
+HEADER = struct.Struct('!4sc2d')
+# پاسخ سرور به هدر: مدت و طول بازه‌ای که بعد از اعمال سقف‌ها واقعاً پذیرفته شده
+ACCEPT = struct.Struct('!2d')
+UDP_HEADER = struct.Struct('!4sIQ')  # magic، شناسه جلسه، شماره ترتیب
+UDP_FIN = 0xFFFFFFFFFFFFFFFF
+RECV_BUFFER = 1024 * 1024
+SEND_CHUNK = 16 * 1024 * 1024
+MAX_DURATION = 60.0      # بیشترین مدتی که سرور برای یک جریان می‌پذیرد (ثانیه)
+MIN_INTERVAL = 0.1       # کوتاه‌ترین بازه گزارش؛ بازه خیلی کوچک لیست intervals را بی‌اندازه بزرگ می‌کند
+UDP_REPORT_TTL = 30.0    # مدت نگهداری گزارش جلسه‌های UDP تمام‌شده برای پاسخ به FIN تکراری
+
+
+def _payload_file():
+    """یک فایل موقت صفر برای ارسال zero-copy با socket.sendfile."""
+    f = tempfile.TemporaryFile()
+    f.truncate(SEND_CHUNK)
+    return f
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed during handshake")
+        data += chunk
+    return bytes(data)
+
+
+def _send_for(sock, duration):
+    """
+    به مدت duration ثانیه داده می‌فرستد.
+
+    روی لینوکس socket.sendfile از os.sendfile استفاده می‌کند، پس داده بدون کپی به
+    فضای کاربر از page cache مستقیم به سوکت می‌رود. در غیر این صورت از یک بافر
+    ثابت با memoryview استفاده می‌شود.
+    """
+    sent = 0
+    deadline = time.perf_counter() + duration
+    if hasattr(os, 'sendfile'):
+        with _payload_file() as f:
+            while time.perf_counter() < deadline:
+                sent += sock.sendfile(f, offset=0, count=SEND_CHUNK)
+    else:
+        view = memoryview(bytearray(RECV_BUFFER))
+        while time.perf_counter() < deadline:
+            sent += sock.send(view)
+    return sent
+
+
+def _receive_all(sock, interval, max_seconds=None):
+    """
+    تا بسته شدن اتصال داده دریافت می‌کند و بایت‌ها را به تفکیک بازه‌های زمانی می‌شمارد.
+
+    Args:
+        max_seconds (float): بعد از این مدت دریافت متوقف می‌شود، حتی اگر طرف مقابل هنوز بفرستد.
+
+    Returns:
+        dict: bytes، seconds و intervals (بایت در هر بازه)
+    """
+    buffer = bytearray(RECV_BUFFER)  # بافر از پیش تخصیص‌یافته؛ هیچ شیء جدیدی در حلقه ساخته نمی‌شود
+    view = memoryview(buffer)
+    intervals = [0]
+    total = 0
+    start = time.perf_counter()
+    boundary = start + interval
+    while True:
+        n = sock.recv_into(view)
+        now = time.perf_counter()
+        if not n or (max_seconds is not None and now - start >= max_seconds):
+            break
+        while now >= boundary:
+            intervals.append(0)
+            boundary += interval
+        intervals[-1] += n
+        total += n
+    return {'bytes': total, 'seconds': now - start, 'intervals': intervals}
+
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        magic, mode, duration, interval = HEADER.unpack(_recv_exact(sock, HEADER.size))
+        if magic != MAGIC or not (math.isfinite(duration) and duration > 0):
+            return
+        # مدت درخواستی کلاینت به سقف سرور محدود می‌شود
+        duration = min(duration, self.server.max_duration)
+        interval = min(max(interval, MIN_INTERVAL), duration) if math.isfinite(interval) else duration
+        sock.sendall(ACCEPT.pack(duration, interval))
+        if mode == b'D':
+            _send_for(sock, duration)
+            sock.shutdown(socket.SHUT_WR)
+            sock.recv(1)  # منتظر بستن توسط کلاینت
+        elif mode == b'U':
+            # کلاینت به اندازه مدت پذیرفته‌شده می‌فرستد؛ حاشیه برای تاخیر شروع است و
+            # کلاینتی که بیشتر بفرستد قطع می‌شود
+            stats = _receive_all(sock, interval, max_seconds=duration + 2.0)
+            sock.sendall(json.dumps(stats).encode() + b'\n')
+
+
+class _UdpHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        if len(data) < UDP_HEADER.size:
+            return
+        magic, session, seq = UDP_HEADER.unpack_from(data)
+        if magic != MAGIC:
+            return
+        key = (self.client_address, session)
+        server = self.server
+        now = time.perf_counter()
+        with server.lock:
+            finished = server.finished.get(key)
+            if finished is not None:
+                # پاسخ FIN قبلی گم شده و کلاینت دوباره FIN فرستاده، یا بسته دیررسی است
+                if seq == UDP_FIN:
+                    sock.sendto(finished[0], self.client_address)
+                return
+            if seq == UDP_FIN:
+                state = server.sessions.pop(key, None) or {'packets': 0, 'bytes': 0, 'max_seq': -1,
+                                                           'start': now}
+                reply = json.dumps({'packets': state['packets'], 'bytes': state['bytes'],
+                                    'expected': state['max_seq'] + 1,
+                                    'seconds': now - state['start']}).encode()
+                server.finished[key] = (reply, now)
+                self._expire(now)
+                sock.sendto(reply, self.client_address)
+                return
+            state = server.sessions.get(key)
+            if state is None:
+                state = server.sessions[key] = {'packets': 0, 'bytes': 0, 'max_seq': -1, 'start': now}
+                self._expire(now)
+            state['packets'] += 1
+            state['bytes'] += len(data)
+            state['max_seq'] = max(state['max_seq'], seq)
+
+    def _expire(self, now):
+        """گزارش‌های قدیمی و جلسه‌هایی که هرگز FIN نفرستادند را حذف می‌کند (زیر lock)."""
+        server = self.server
+        for key in [k for k, (_, at) in server.finished.items() if now - at > UDP_REPORT_TTL]:
+            del server.finished[key]
+        limit = server.max_duration + UDP_REPORT_TTL
+        for key in [k for k, state in server.sessions.items() if now - state['start'] > limit]:
+            del server.sessions[key]
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    # فقط برای این سرور؛ تغییر کلاس stdlib روی همه سرورهای پروسس اثر می‌گذارد
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class ThroughputServer:
+    """
+    سرور تست توان عملیاتی (شبیه iperf) روی TCP و در صورت نیاز UDP.
+
+    هر اتصال TCP یک جریان است و در thread خودش سرویس می‌گیرد. مدت درخواستی هر جریان
+    به max_duration محدود می‌شود.
+    """
+
+    def __init__(self, host='0.0.0.0', port=DEFAULT_PORT, udp=True, max_duration=MAX_DURATION):
+        """
+        Args:
+            host (str): آدرس گوش دادن.
+            port (int): پورت TCP و UDP.
+            udp (bool): سرویس جلسه‌های UDP هم فعال باشد.
+            max_duration (float): بیشترین مدت یک جریان (ثانیه)، هر چه کلاینت درخواست کند.
+        """
+        self.tcp = _TCPServer((host, port), _StreamHandler)
+        self.tcp.max_duration = max_duration
+        self.port = self.tcp.server_address[1]
+        self.udp = None
+        if udp:
+            self.udp = socketserver.UDPServer((host, self.port), _UdpHandler)
+            self.udp.sessions = {}
+            self.udp.finished = {}  # (آدرس، جلسه) -> (گزارش، زمان)
+            self.udp.max_duration = max_duration
+            self.udp.lock = threading.Lock()
+
+    def start(self):
+        """سرور را در threadهای پس‌زمینه اجرا می‌کند."""
+        for server in (self.tcp, self.udp):
+            if server is not None:
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        print(f"[+] Throughput server listening on port {self.port} (Ctrl+C to stop)")
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for server in (self.tcp, self.udp):
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+
+class ThroughputClient:
+    """
+    کلاینت تست توان عملیاتی با چند جریان موازی.
+
+    متد measure() همان شکل خروجی مقصدهای تست سرعت (speed.py) را دارد، پس می‌توان
+    آن را به عنوان speed_target به NetworkTester داد.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, streams=4, duration=5.0, interval=1.0):
+        """
+        Args:
+            host (str): آدرس سرور.
+            port (int): پورت سرور.
+            streams (int): تعداد جریان‌های موازی TCP.
+            duration (float): مدت هر جهت (ثانیه).
+            interval (float): طول بازه گزارش پهنای باند (ثانیه).
+        """
+        self.host = host
+        self.port = port
+        self.streams = streams
+        self.duration = duration
+        self.interval = interval
+
+    def _connect(self, mode):
+        """
+        Returns:
+            tuple: (سوکت، مدت، طول بازه) با مقادیری که سرور پس از اعمال سقف‌هایش پذیرفته است.
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=self.duration + 10)
+        try:
+            sock.sendall(HEADER.pack(MAGIC, mode, self.duration, self.interval))
+            duration, interval = ACCEPT.unpack(_recv_exact(sock, ACCEPT.size))
+        except BaseException:
+            sock.close()
+            raise
+        sock.settimeout(None)  # socket.sendfile روی سوکت blocking از os.sendfile استفاده می‌کند
+        return sock, duration, interval
+
+    def _download_stream(self):
+        sock, _, interval = self._connect(b'D')
+        with sock:
+            stats = _receive_all(sock, interval)
+        stats['interval'] = interval
+        return stats
+
+    def _upload_stream(self):
+        sock, duration, interval = self._connect(b'U')
+        with sock:
+            # سرور بعد از مدت پذیرفته‌شده دیگر نمی‌خواند؛ ارسال بیشتر به reset اتصال می‌رسد
+            _send_for(sock, duration)
+            sock.shutdown(socket.SHUT_WR)
+            reply = bytearray()
+            while not reply.endswith(b'\n'):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                reply += chunk
+        stats = json.loads(reply)
+        stats['interval'] = interval
+        return stats
+
+    def _run_streams(self, worker):
+        results = [None] * self.streams
+        errors = []
+
+        def run(i):
+            try:
+                results[i] = worker()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(self.streams)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+
+        total = sum(r['bytes'] for r in results)
+        seconds = max(r['seconds'] for r in results)
+        intervals = [0] * max(len(r['intervals']) for r in results)
+        for r in results:
+            for i, n in enumerate(r['intervals']):
+                intervals[i] += n
+        # طول بازه همانی است که سرور پذیرفته؛ بازه آخر معمولاً ناقص است و با طول واقعی خودش تقسیم می‌شود
+        interval = results[0]['interval']
+        lengths = [interval] * len(intervals)
+        lengths[-1] = max(seconds - interval * (len(intervals) - 1), 1e-9)
+        return {
+            'bytes': total,
+            'seconds': seconds,
+            'bps': total * 8 / seconds if seconds else 0.0,
+            'interval_bps': [n * 8 / length for n, length in zip(intervals, lengths)],
+        }
+
+    def download(self):
+        """سرور به کلاینت می‌فرستد."""
+        return self._run_streams(self._download_stream)
+
+    def upload(self):
+        """کلاینت به سرور می‌فرستد؛ شمارش در سمت سرور انجام می‌شود."""
+        return self._run_streams(self._upload_stream)
+
+    def udp_upload(self, bitrate=100e6, payload=1400):
+        """
+        ارسال UDP با نرخ ثابت bitrate و گزارش loss از دید سرور.
+
+        Returns:
+            dict: bps، packet_loss (درصد) و شمارنده‌های سرور.
+        """
+        session = int.from_bytes(os.urandom(4), 'big')
+        packet = bytearray(payload)
+        packet_interval = payload * 8 / bitrate
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect((self.host, self.port))
+            start = time.perf_counter()
+            seq = 0
+            while True:
+                now = time.perf_counter()
+                if now - start >= self.duration:
+                    break
+                target = start + seq * packet_interval
+                if now < target:
+                    time.sleep(min(target - now, 0.001))
+                    continue
+                UDP_HEADER.pack_into(packet, 0, MAGIC, session, seq)
+                try:
+                    sock.send(packet)
+                except OSError:
+                    pass  # بافر پر است؛ مثل یک بسته گم‌شده حساب می‌شود
+                seq += 1
+            sock.settimeout(2.0)
+            reply = None
+            for _ in range(5):
+                sock.send(UDP_HEADER.pack(MAGIC, session, UDP_FIN))
+                try:
+                    reply = json.loads(sock.recv(65536))
+                    break
+                except socket.timeout:
+                    continue
+        if reply is None:
+            raise ConnectionError("No UDP report from throughput server")
+        lost = max(0, seq - reply['packets'])
+        reply.update({
+            'sent': seq,
+            'bps': reply['bytes'] * 8 / self.duration,
+            'packet_loss': lost / seq * 100 if seq else 0.0,
+        })
+        return reply
+
+    def measure(self):
+        """
+        Returns:
+            dict: download_bps، upload_bps، server، timings و intervals.
+        """
+        download = self.download()
+        upload = self.upload()
+        return {
+            'download_bps': download['bps'],
+            'upload_bps': upload['bps'],
+            'server': f"{self.host}:{self.port}",
+            'timings': {'discovery': 0.0, 'download': download['seconds'], 'upload': upload['seconds']},
+            'intervals': {'download_bps': download['interval_bps'], 'upload_bps': upload['interval_bps']},
+        }
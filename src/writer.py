@@ -0,0 +1,230 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+_STOP = object()
+
+
+class BufferedResultWriter:
+    """
+    نویسنده write-behind جلوی ResultStorage.
+
+    save_result فقط نتیجه را در یک صف محدود می‌گذارد و بلافاصله برمی‌گردد؛ یک thread
+    پس‌زمینه نتایج را دسته‌ای (با رسیدن به batch_size یا گذشتن flush_interval ثانیه از
+    اولین نتیجه دسته) با ResultStorage.save_batch می‌نویسد. پس کندی دیسک زمان‌بندی
+    پروب‌ها را به هم نمی‌زند.
+
+    - اگر صف پر باشد save_result منتظر می‌ماند (backpressure) تا حافظه بی‌حد رشد نکند.
+    - دسته‌ای که نوشتنش شکست بخورد دور ریخته نمی‌شود: نگه داشته شده و همراه نوشتن بعدی
+      (یا هر flush_interval ثانیه) دوباره امتحان می‌شود؛ حداکثر max_pending نتیجه نگه
+      داشته می‌شود و قدیمی‌ترها بعد از آن کنار گذاشته و در dropped شمرده می‌شوند.
+    - close() (و در صورت فراموشی، atexit) همه نتایج صف را قبل از خروج می‌نویسد. اگر
+      flush() یا close() نتوانند نتایج نگه‌داشته را بنویسند RuntimeError می‌دهند.
+    - stats() عمق صف و زمان flushها را گزارش می‌کند تا عقب افتادن I/O دیده شود.
+    """
+
+    def __init__(self, storage, max_queue=1024, batch_size=256, flush_interval=1.0, max_pending=None):
+        """
+        Args:
+            storage (ResultStorage): ذخیره‌سازی مقصد.
+            max_queue (int): حداکثر تعداد نتیجه منتظر در صف.
+            batch_size (int): حداکثر تعداد نتیجه در هر نوشتن.
+            flush_interval (float): حداکثر زمان ماندن یک نتیجه در صف (ثانیه).
+            max_pending (int): حداکثر تعداد نتیجه‌ای که بعد از نوشتن ناموفق برای تلاش دوباره
+                نگه داشته می‌شود. پیش‌فرض max_queue.
+        """
+        self.storage = storage
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending or max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # thread پس‌زمینه و flush() هر دو دسته نگه‌داشته را می‌نویسند
+        # بررسی _closed و put را با close() اتمی می‌کند تا چیزی بعد از _STOP در صف نرود؛ جدا از _lock
+        # است چون put در backpressure منتظر thread پس‌زمینه می‌ماند که خودش _lock را می‌گیرد
+        self._put_lock = threading.Lock()
+        self._pending = []  # نتایجی که نوشتنشان شکست خورده، به ترتیب زمانی
+        self._error = None
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.blocked = 0
+        self.errors = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name='netspector-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        metrics.add_collector(self._collect)
+
+    def save_result(self, connection_name, ping_results, speed_results, probe_type='icmp'):
+        """
+        نتیجه را برای نوشتن در پس‌زمینه در صف می‌گذارد (همان امضای ResultStorage.save_result).
+
+        Raises:
+            RuntimeError: اگر نویسنده بسته شده باشد.
+        """
+        item = (connection_name, ping_results, speed_results, probe_type, datetime.now())
+        with self._put_lock:
+            if self._closed:
+                raise RuntimeError("BufferedResultWriter is closed")
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                # backpressure: تولیدکننده تا خالی شدن جا در صف صبر می‌کند
+                with self._lock:
+                    self.blocked += 1
+                self._queue.put(item)
+        with self._lock:
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _next_batch(self):
+        """
+        اولین نتیجه را منتظر می‌ماند، سپس تا batch_size یا پایان flush_interval جمع می‌کند.
+
+        وقتی نتایج ناموفق نگه داشته شده‌اند حداکثر flush_interval صبر می‌کند تا تلاش
+        دوباره منتظر نتیجه جدید نماند.
+        """
+        try:
+            item = self._queue.get(timeout=self.flush_interval) if self._pending else self._queue.get()
+        except queue.Empty:
+            return [], False
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch or self._pending:
+                self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+
+    def _write(self, batch):
+        """
+        نتایج نگه‌داشته و سپس batch را می‌نویسد.
+
+        Returns:
+            bool: False اگر نوشتن شکست خورد؛ نتایج برای تلاش بعدی نگه داشته می‌شوند.
+        """
+        with self._write_lock:
+            batch = self._pending + batch
+            start = time.perf_counter()
+            try:
+                self.storage.save_batch(batch)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                    overflow = len(batch) - self.max_pending
+                    if overflow > 0:
+                        self.dropped += overflow
+                        batch = batch[overflow:]
+                    self._pending = batch
+                    self._error = e
+                return False
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._pending = []
+                self._error = None
+                self.written += len(batch)
+                self.batches += 1
+                self.last_flush_ms = elapsed
+                self.max_flush_ms = max(self.max_flush_ms, elapsed)
+                self._total_flush_ms += elapsed
+            return True
+
+    def _write_pending(self):
+        if self._pending and not self._write([]):
+            raise RuntimeError(f"Failed to write {len(self._pending)} results "
+                               f"({self.dropped} dropped): {self._error}") from self._error
+
+    def flush(self):
+        """
+        تا نوشته شدن همه نتایجی که تا الان در صف گذاشته شده‌اند صبر می‌کند.
+
+        Raises:
+            RuntimeError: اگر نتایج نگه‌داشته بعد از یک تلاش دوباره هم نوشته نشوند.
+        """
+        if self._thread.is_alive():
+            self._queue.join()
+        self._write_pending()
+
+    def stats(self):
+        """
+        Returns:
+            dict: queue_depth، max_depth، written، batches، blocked (دفعات backpressure)، errors،
+                pending (نتایج منتظر تلاش دوباره)، dropped (نتایج کنار گذاشته‌شده بعد از max_pending)
+                و last/avg/max_flush_ms (زمان هر نوشتن دسته‌ای به میلی‌ثانیه).
+        """
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_depth': self.max_depth,
+                'written': self.written,
+                'batches': self.batches,
+                'blocked': self.blocked,
+                'errors': self.errors,
+                'pending': len(self._pending),
+                'dropped': self.dropped,
+                'last_flush_ms': self.last_flush_ms,
+                'avg_flush_ms': self._total_flush_ms / self.batches if self.batches else 0.0,
+                'max_flush_ms': self.max_flush_ms,
+            }
+
+    def _collect(self):
+        s = self.stats()
+        return [
+            ('netspector_writer_queue_depth', 'Results waiting in the write-behind queue.', {}, s['queue_depth']),
+            ('netspector_writer_blocked_total', 'Times a producer waited for queue space.', {}, s['blocked']),
+            ('netspector_writer_errors_total', 'Failed batch writes.', {}, s['errors']),
+            ('netspector_writer_pending', 'Results held for another write attempt.', {}, s['pending']),
+            ('netspector_writer_dropped_total', 'Results dropped after max_pending failed writes piled up.', {},
+             s['dropped']),
+        ]
+
+    def report(self):
+        """خلاصه یک‌خطی stats() برای چاپ."""
+        s = self.stats()
+        return (f"write queue {s['queue_depth']} (max {s['max_depth']}), {s['written']} results in "
+                f"{s['batches']} batches, flush avg {s['avg_flush_ms']:.1f} ms / max {s['max_flush_ms']:.1f} ms, "
+                f"blocked {s['blocked']}, errors {s['errors']}, pending {s['pending']}, dropped {s['dropped']}")
+
+    def close(self):
+        """
+        نتایج باقی‌مانده را می‌نویسد و thread را متوقف می‌کند (ذخیره‌سازی را نمی‌بندد).
+
+        Raises:
+            RuntimeError: اگر نتایج نگه‌داشته در آخرین تلاش هم نوشته نشوند.
+        """
+        with self._put_lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        metrics.remove_collector(self._collect)
+        self._queue.put(_STOP)
+        self._thread.join()
+        try:
+            self._write_pending()
+        finally:
+            self.storage.flush()
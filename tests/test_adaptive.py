@@ -0,0 +1,97 @@
+import pytest
+
+from adaptive import AdaptiveSampler, ProbeBudget
+
+
+def test_budget_allows_a_burst_then_refills_at_rate():
+    budget = ProbeBudget(rate=10, burst=3)
+    assert [budget.try_take(0.0) for _ in range(4)] == [True, True, True, False]
+    assert not budget.try_take(0.05)
+    assert budget.try_take(0.1)
+    # بعد از مدت طولانی فقط تا burst پر می‌شود
+    assert sum(budget.try_take(100.0) for _ in range(10)) == 3
+
+
+def test_reserve_returns_the_wait_that_keeps_the_rate():
+    budget = ProbeBudget(rate=4, burst=1)
+    waits = [budget.reserve(0.0) for _ in range(4)]
+    assert waits == pytest.approx([0.0, 0.25, 0.5, 0.75])
+    # رزروهای پیشین تا پر شدن سهمیه جلوی try_take را می‌گیرند
+    assert not budget.try_take(0.5)
+    assert budget.try_take(1.0)
+
+
+def test_budget_ignores_a_clock_going_backwards():
+    budget = ProbeBudget(rate=1, burst=1)
+    assert budget.try_take(10.0)
+    assert not budget.try_take(5.0)
+    assert not budget.try_take(10.5)
+    assert budget.try_take(11.0)
+
+
+def test_invalid_parameters_are_rejected():
+    with pytest.raises(ValueError):
+        ProbeBudget(0)
+    with pytest.raises(ValueError):
+        AdaptiveSampler(min_interval=2, max_interval=1)
+
+
+def warmed_up(**options):
+    sampler = AdaptiveSampler(min_interval=0.5, max_interval=5.0, **options)
+    for i in range(sampler.warmup):
+        assert sampler.observe(20.0 + (i % 2) * 0.2) is None
+    return sampler
+
+
+def test_steady_target_backs_off_to_max_interval():
+    sampler = warmed_up()
+    for i in range(30):
+        previous = sampler.interval
+        assert sampler.observe(20.0 + (i % 2) * 0.2) is None
+        assert sampler.interval == pytest.approx(min(5.0, previous * 1.5))
+    assert sampler.interval == 5.0
+    assert not sampler.dense
+
+
+def test_loss_returns_to_dense_sampling_for_hold_probes():
+    sampler = warmed_up(hold=3)
+    for _ in range(10):
+        sampler.observe(20.0)
+    assert sampler.interval > sampler.min_interval
+    assert sampler.observe(None) == 'loss'
+    assert sampler.interval == sampler.min_interval
+    for _ in range(3):
+        assert sampler.dense
+        assert sampler.observe(20.0) is None
+        assert sampler.interval == sampler.min_interval
+    sampler.observe(20.0)
+    assert sampler.interval > sampler.min_interval
+
+
+def test_outlier_triggers_variance_without_moving_the_baseline():
+    sampler = warmed_up()
+    mean = sampler._mean
+    assert sampler.observe(200.0) == 'variance'
+    assert sampler._mean == mean
+    assert sampler.interval == sampler.min_interval
+
+
+def test_cusum_detects_a_sustained_level_shift():
+    sampler = warmed_up()
+    for _ in range(10):
+        sampler.observe(20.0)
+    # هر نمونه به تنهایی زیر آستانه variance است، ولی انباشت CUSUM تغییر را می‌بیند
+    reasons = [sampler.observe(23.0) for _ in range(10)]
+    assert 'variance' not in reasons
+    assert 'change' in reasons
+    change = reasons.index('change')
+    assert reasons[:change] == [None] * change
+    # مبنا به سطح جدید رفته و نمونه‌های بعدی رخداد تازه نیستند
+    assert sampler._mean == pytest.approx(23.0, abs=0.5)
+    assert all(sampler.observe(23.0) is None for _ in range(20))
+
+
+def test_small_drift_is_not_a_change():
+    sampler = warmed_up()
+    reasons = [sampler.observe(20.0 + 0.01 * i) for i in range(200)]
+    assert reasons == [None] * 200
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from engine import FakeTransport, ProbeEngine
+
+
+class RecordingTransport:
+    """ترنسپورتی که زمان ارسال‌ها و بیشترین تعداد پروب همزمان را ثبت می‌کند."""
+
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.sends = []
+        self.in_flight = 0
+        self.peak = 0
+        self.released = 0
+
+    async def probe(self, target, timeout):
+        self.sends.append((target, asyncio.get_running_loop().time()))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if len(self.sends) in self.fail:
+                raise OSError('network unreachable')
+            return self.delay * 1000
+        finally:
+            self.in_flight -= 1
+
+    def release(self):
+        self.released += 1
+
+    def close(self):
+        pass
+
+
+def test_in_flight_probes_are_capped():
+    transport = RecordingTransport(delay=0.02)
+    engine = ProbeEngine(transport, max_in_flight=3)
+    results = engine.run_sync([f'10.0.0.{i}' for i in range(10)], count=4, interval=0.001)
+    assert transport.peak == 3
+    assert len(transport.sends) == 40
+    assert all(r['packet_loss'] == 0 for r in results.values())
+
+
+def test_slow_replies_do_not_delay_the_schedule():
+    transport = RecordingTransport(delay=0.3)
+    engine = ProbeEngine(transport, max_in_flight=64)
+    engine.run_sync(['10.0.0.1'], count=5, interval=0.05)
+    times = [at for _, at in transport.sends]
+    # ارسال‌ها روی start + seq * interval هستند، نه بعد از رسیدن پاسخ قبلی
+    for seq, at in enumerate(times):
+        assert at - times[0] == pytest.approx(seq * 0.05, abs=0.03)
+
+
+def test_targets_run_concurrently_and_are_deduplicated():
+    transport = RecordingTransport(delay=0.1)
+    engine = ProbeEngine(transport, max_in_flight=64)
+    loop = asyncio.new_event_loop()
+    try:
+        start = loop.time()
+        results = loop.run_until_complete(engine.run(['a', 'b', 'a', 'c'], count=2, interval=0.1))
+        elapsed = loop.time() - start
+    finally:
+        loop.close()
+    assert list(results) == ['a', 'b', 'c']
+    assert len(transport.sends) == 6
+    assert elapsed < 0.5  # ترتیبی حدود ۰٫۶ ثانیه
+
+
+def test_errors_are_counted_as_loss_and_reported():
+    transport = RecordingTransport(delay=0.001, fail={2})
+    engine = ProbeEngine(transport)
+    samples = []
+    results = engine.run_sync(['10.0.0.1'], count=4, interval=0.05,
+                              on_sample=lambda *sample: samples.append(sample))
+    assert results['10.0.0.1']['packet_loss'] == 25.0
+    errors = [(seq, type(error)) for _, seq, delay, error in samples if error is not None]
+    assert errors == [(1, OSError)]
+    assert sorted(seq for _, seq, _, _ in samples) == [0, 1, 2, 3]
+
+
+def test_run_sync_releases_the_transport_each_run():
+    transport = RecordingTransport(delay=0.001)
+    engine = ProbeEngine(transport)
+    engine.run_sync(['10.0.0.1'], count=1)
+    engine.run_sync(['10.0.0.1'], count=1)
+    assert transport.released == 2
+
+
+def test_timeouts_from_fake_transport_are_loss():
+    engine = ProbeEngine(FakeTransport(latency_ms=5, loss=1.0, sleep=False))
+    result = engine.run_sync(['10.0.0.1'], count=5, interval=0)['10.0.0.1']
+    assert result['packet_loss'] == 100.0
+    assert result['avg_latency'] == 0.0
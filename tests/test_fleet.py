@@ -0,0 +1,122 @@
+import functools
+import multiprocessing
+import time
+
+import pytest
+
+from engine import FakeTransport
+from fleet import BUCKET, FIELDS, HISTOGRAM, RESULT, BatchWriter, Fleet, decode_batch, shard_of, shard_targets
+from monitor import DEFAULTS, TARGET_DEFAULTS
+from stats import LatencyHistogram
+from storage import ResultStorage
+
+TARGETS = [{'host': f'10.0.0.{i}', 'name': f'host-{i}', 'probe': 'icmp'} for i in range(4)]
+
+
+def ping(base):
+    return {field: base + i for i, field in enumerate(FIELDS)}
+
+
+@pytest.fixture
+def pipe():
+    reader, writer = multiprocessing.Pipe(duplex=False)
+    yield reader, writer
+    reader.close()
+
+
+def test_batch_round_trip(pipe):
+    reader, writer = pipe
+    sink = BatchWriter(writer, TARGETS, batch_size=8, flush_interval=60)
+    histogram = LatencyHistogram()
+    for delay in (0.0, 12.5, 13.0, 480.0):
+        histogram.add(delay)
+    adaptive = {**ping(30.0), 'histogram': histogram.to_dict(), 'sampling': {'mode': 'adaptive', 'sent': 12, 'dense': 5, 'deferred': 2,
+                                            'triggers': {'variance': 1, 'loss': 3, 'change': 0}}}
+    sink.save_result('host-2', ping(10.0), {})
+    sink.save_result('host-0', adaptive, {})
+    sink.close()
+
+    data = reader.recv_bytes()
+    assert len(data) == 2 * (RESULT.size + HISTOGRAM.size) + 3 * BUCKET.size
+    decoded = list(decode_batch(data))
+    assert [index for index, _, _ in decoded] == [2, 0]
+    assert decoded[0][2] == ping(10.0)
+    assert decoded[1][2]['histogram'] == histogram.to_dict()
+    assert decoded[1][2]['sampling'] == {'mode': 'adaptive', 'sent': 12, 'dense': 5, 'deferred': 2,
+                                         'triggers': {'variance': 1, 'loss': 3, 'change': 0}}
+    assert all(timestamp > 0 for _, timestamp, _ in decoded)
+    with pytest.raises(EOFError):
+        reader.recv_bytes()
+
+
+def test_batch_is_sent_when_full(pipe):
+    reader, writer = pipe
+    sink = BatchWriter(writer, TARGETS, batch_size=3, flush_interval=60)
+    for i in range(7):
+        sink.save_result(TARGETS[i % 4]['name'], ping(float(i)), {})
+    assert sink.batches == 2
+    sink.close()
+    sizes = [len(reader.recv_bytes()) // (RESULT.size + HISTOGRAM.size) for _ in range(3)]
+    assert sizes == [3, 3, 1]
+
+
+def test_partial_batch_is_sent_on_the_timer(pipe):
+    reader, writer = pipe
+    sink = BatchWriter(writer, TARGETS, batch_size=8, flush_interval=0.05)
+    sink.save_result('host-1', ping(1.0), {})
+    # نتیجه دیگری نمی‌رسد؛ دسته باید بدون آن هم فرستاده شود
+    assert reader.poll(2.0)
+    assert [index for index, _, _ in decode_batch(reader.recv_bytes())] == [1]
+    sink.close()
+
+
+def test_sharding_is_stable_and_complete():
+    targets = [{'host': f'10.0.{i // 256}.{i % 256}', 'name': f't{i}'} for i in range(1000)]
+    shards = shard_targets(targets, 4)
+    assert sorted(t['name'] for shard in shards for t in shard) == sorted(t['name'] for t in targets)
+    assert all(shard_of(t, 4) == i for i, shard in enumerate(shards) for t in shard)
+    assert min(map(len, shards)) > 150
+
+
+def test_fleet_log_stays_in_timestamp_order(tmp_path):
+    """دسته‌های workerهای مختلف درهم می‌رسند ولی iter و tail باید همان ترتیب زمانی را ببینند."""
+    targets = [{**TARGET_DEFAULTS, 'host': f'10.0.0.{i}', 'name': f'host-{i}', 'count': 5, 'probe_interval': 0.0}
+               for i in range(16)]
+    storage_config = {'data_dir': str(tmp_path), 'record_samples': False}
+    config = {**DEFAULTS, 'start_jitter': 0.0, 'storage': storage_config, 'targets': targets}
+    fleet = Fleet(config, workers=3, storage=ResultStorage(**storage_config),
+                  transport_factory=functools.partial(FakeTransport, latency_ms=5, sleep=False),
+                  batch_size=2, flush_interval=0.0)
+    fleet.run(rounds=4)
+    fleet.close()
+    assert fleet.results == 16 * 4
+
+    storage = ResultStorage(**storage_config)
+    records = list(storage.iter_results())
+    timestamps = [r['timestamp'] for r in records]
+    assert len(records) == fleet.results
+    assert timestamps == sorted(timestamps)
+    assert storage.tail(1)[0]['timestamp'] == timestamps[-1]
+    assert all(r['ping']['histogram']['buckets'] for r in records)
+    storage.close()
+
+
+class BrokenStorage:
+    def save_batch(self, results, stream=None):
+        raise OSError('disk full')
+
+    def close(self):
+        pass
+
+
+def test_storage_error_stops_the_workers(tmp_path):
+    targets = [{**TARGET_DEFAULTS, 'host': f'10.0.1.{i}', 'name': f'host-{i}', 'count': 2, 'probe_interval': 0.0}
+               for i in range(8)]
+    config = {**DEFAULTS, 'start_jitter': 0.0, 'targets': targets,
+              'storage': {'data_dir': str(tmp_path), 'record_samples': False}}
+    fleet = Fleet(config, workers=2, storage=BrokenStorage(),
+                  transport_factory=functools.partial(FakeTransport, sleep=False), flush_interval=0.05)
+    start = time.monotonic()
+    with pytest.raises(OSError, match='disk full'):
+        fleet.run()  # مانیتورینگ پیوسته؛ بدون توقف workerها join هرگز برنمی‌گشت
+    assert time.monotonic() - start < 30
@@ -0,0 +1,95 @@
+import asyncio
+import struct
+import time
+
+import pytest
+
+from icmp import ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST, ICMP_HEADER, PAYLOAD, IcmpTransport, _checksum, parse_echo_reply
+
+
+def icmp_packet(kind, identifier, seq, payload=PAYLOAD):
+    header = ICMP_HEADER.pack(kind, 0, 0, identifier, seq)
+    return ICMP_HEADER.pack(kind, 0, _checksum(header + payload), identifier, seq) + payload
+
+
+def ip_header(words=5):
+    # version 4 و طول هدر words کلمه ۳۲ بیتی؛ بقیه فیلدها برای تجزیه مهم نیستند
+    return bytes([0x40 | words]) + bytes(words * 4 - 1)
+
+
+def test_checksum_of_packet_with_checksum_is_zero():
+    assert _checksum(icmp_packet(ICMP_ECHO_REQUEST, 0x1234, 7)) == 0
+    assert _checksum(icmp_packet(ICMP_ECHO_REQUEST, 0x1234, 7, payload=b'odd')) == 0
+
+
+def test_dgram_reply_has_no_ip_header():
+    assert parse_echo_reply(icmp_packet(ICMP_ECHO_REPLY, 0xBEEF, 42), raw=False) == (0xBEEF, 42)
+
+
+@pytest.mark.parametrize('words', [5, 6, 15])
+def test_raw_reply_skips_variable_length_ip_header(words):
+    data = ip_header(words) + icmp_packet(ICMP_ECHO_REPLY, 0x0102, 0xFFFF)
+    assert parse_echo_reply(data, raw=True) == (0x0102, 0xFFFF)
+
+
+def test_non_reply_types_are_ignored():
+    # روی loopback سوکت raw درخواست‌های خودمان را هم می‌بیند
+    assert parse_echo_reply(ip_header() + icmp_packet(ICMP_ECHO_REQUEST, 1, 1), raw=True) is None
+    unreachable = struct.pack('!BBHHH', 3, 1, 0, 0, 0)
+    assert parse_echo_reply(unreachable, raw=False) is None
+
+
+@pytest.mark.parametrize('data, raw', [(b'', True), (b'', False), (ip_header(), True), (b'\x00\x00\x00', False)])
+def test_short_packets_are_ignored(data, raw):
+    assert parse_echo_reply(data, raw) is None
+
+
+@pytest.fixture
+def transports():
+    try:
+        opened = [IcmpTransport(resolve_ttl=60), IcmpTransport(resolve_ttl=60)]
+    except OSError:
+        pytest.skip('ICMP sockets are not permitted here')
+    yield opened
+    for transport in opened:
+        transport.close()
+
+
+def test_transports_have_distinct_identifiers(transports):
+    first, second = transports
+    assert first._identifier != second._identifier
+
+
+def test_raw_reply_for_another_identifier_is_ignored(transports):
+    first, second = transports
+    if not first._raw:
+        pytest.skip('datagram ICMP sockets only see their own replies')
+    loop = asyncio.new_event_loop()
+    try:
+        future = loop.create_future()
+        second._pending[5] = (future, '127.0.0.1', 0)
+        reply = ip_header() + icmp_packet(ICMP_ECHO_REPLY, first._identifier, 5)
+        second._dispatch(reply, '127.0.0.1', 1_000_000)
+        assert not future.done()
+        reply = ip_header() + icmp_packet(ICMP_ECHO_REPLY, second._identifier, 5)
+        second._dispatch(reply, '127.0.0.1', 1_000_000)
+        assert future.result() == 1.0
+    finally:
+        loop.close()
+
+
+def test_resolved_addresses_expire(transports):
+    transport = transports[0]
+    answers = iter(['192.0.2.1', '192.0.2.2'])
+
+    class Loop:
+        async def getaddrinfo(self, host, port, family):
+            return [(family, 0, 0, '', (next(answers), 0))]
+
+    transport._loop = Loop()
+    assert asyncio.run(transport._resolve('example.test')) == '192.0.2.1'
+    assert asyncio.run(transport._resolve('example.test')) == '192.0.2.1'  # از کش
+    address, _ = transport._addresses['example.test']
+    transport._addresses['example.test'] = (address, time.monotonic() - 1)  # TTL گذشته
+    assert asyncio.run(transport._resolve('example.test')) == '192.0.2.2'
+    transport._loop = None
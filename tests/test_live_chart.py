@@ -0,0 +1,57 @@
+import collections
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from live_chart import RingBuffer
+
+
+def test_partial_buffer_view_is_in_insertion_order():
+    buffer = RingBuffer(5)
+    buffer.extend([1, 2, 3], [10, 20, 30])
+    times, values = buffer.view()
+    assert times.tolist() == [1, 2, 3]
+    assert values.tolist() == [10, 20, 30]
+
+
+def test_wrap_around_keeps_the_newest_samples_in_order():
+    buffer = RingBuffer(5)
+    buffer.extend(range(4), range(4))
+    buffer.extend([4, 5, 6], [4, 5, 6])  # wraps past the end of the array
+    times, values = buffer.view()
+    assert times.tolist() == [2, 3, 4, 5, 6]
+    assert values.tolist() == [2, 3, 4, 5, 6]
+    assert buffer.size == 5
+
+
+def test_chunk_larger_than_capacity_keeps_its_tail():
+    buffer = RingBuffer(4)
+    buffer.append(0, 0)
+    buffer.extend(range(1, 11), range(1, 11))
+    assert buffer.view()[0].tolist() == [7, 8, 9, 10]
+
+
+def test_matches_a_bounded_deque():
+    rng = random.Random(2)
+    buffer = RingBuffer(37)
+    reference = collections.deque(maxlen=37)
+    t = 0
+    for _ in range(500):
+        n = rng.choice([0, 1, 1, 2, 5, 36, 37, 38, 80])
+        chunk = list(range(t, t + n))
+        t += n
+        buffer.extend(chunk, [v * 2 for v in chunk])
+        reference.extend(chunk)
+        times, values = buffer.view()
+        assert times.tolist() == list(reference)
+        assert values.tolist() == [v * 2 for v in reference]
+
+
+def test_lost_samples_are_kept_as_nan():
+    buffer = RingBuffer(3)
+    for t, value in enumerate([1.0, np.nan, 3.0, np.nan]):
+        buffer.append(t, value)
+    _, values = buffer.view()
+    assert np.isnan(values).tolist() == [True, False, True]
@@ -0,0 +1,54 @@
+import socket
+import urllib.request
+
+import pytest
+
+import metrics
+from metrics import MetricsServer
+
+
+@pytest.fixture
+def collector():
+    def collect():
+        return [('netspector_test_depth', 'Items waiting.', {}, 3),
+                ('netspector_test_waits_total', 'Times a producer waited.', {'queue': 'a'}, 7)]
+    metrics.add_collector(collect)
+    yield
+    metrics.remove_collector(collect)
+
+
+@pytest.fixture
+def restore_enabled():
+    enabled = metrics.enabled
+    metrics.disable()
+    yield
+    metrics.enabled = enabled
+
+
+def test_cumulative_collector_values_are_counters(collector):
+    text = metrics.render()
+    assert '# TYPE netspector_test_depth gauge\n' in text
+    assert 'netspector_test_depth 3\n' in text
+    assert '# TYPE netspector_test_waits counter\n' in text
+    assert 'netspector_test_waits_total{queue="a"} 7\n' in text
+
+
+def test_server_listens_on_loopback_by_default(restore_enabled):
+    server = MetricsServer(port=0).start()
+    try:
+        assert metrics.enabled
+        assert server.host == '127.0.0.1'
+        assert server._server.server_address[0] == '127.0.0.1'
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics', timeout=5) as response:
+            assert response.read().endswith(b'# EOF\n')
+    finally:
+        server.close()
+
+
+def test_failed_bind_leaves_recording_off(restore_enabled):
+    with socket.socket() as taken:
+        taken.bind(('127.0.0.1', 0))
+        taken.listen()
+        with pytest.raises(OSError):
+            MetricsServer(port=taken.getsockname()[1])
+    assert not metrics.enabled
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+from engine import FakeTransport
+from monitor import DEFAULTS, TARGET_DEFAULTS, Monitor
+
+
+class SlowStorage:
+    """ذخیره‌سازی کند؛ نتایج در صف BufferedResultWriter انباشته می‌شوند."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.saved = []
+        self.samples = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def save_batch(self, batch):
+        time.sleep(self.delay)
+        with self._lock:
+            self.saved.extend(batch)
+        return len(batch)
+
+    def record_sample(self, target, seq, delay, error):
+        self.samples += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_config(targets=3, count=4, probe_interval=0.1, interval=0.05, shutdown_grace=5.0):
+    return {
+        **DEFAULTS,
+        'start_jitter': 0.0,
+        'shutdown_grace': shutdown_grace,
+        'targets': [{**TARGET_DEFAULTS, 'host': f'10.0.0.{i}', 'name': f'target-{i}',
+                     'interval': interval, 'count': count, 'probe_interval': probe_interval}
+                    for i in range(targets)],
+    }
+
+
+def run_for(monitor, seconds):
+    async def main():
+        asyncio.get_running_loop().call_later(seconds, monitor.stop)
+        await monitor.run()
+    asyncio.run(main())
+
+
+def test_shutdown_finishes_rounds_and_writes_every_queued_result():
+    storage = SlowStorage(delay=0.05)
+    monitor = Monitor(make_config(), storage=storage, transport=FakeTransport(latency_ms=1, seed=1))
+    # توقف وسط دورها: هر دور حدود ۰٫۴ ثانیه طول می‌کشد و از interval خود عقب است
+    started = time.perf_counter()
+    run_for(monitor, 0.6)
+    assert time.perf_counter() - started < 2.0  # فقط دورهای در جریان تمام می‌شوند، نه تا shutdown_grace
+    monitor.close()
+    assert monitor.rounds >= 3
+    assert len(storage.saved) == monitor.rounds
+    assert storage.samples == monitor.rounds * 4
+    assert storage.closed
+
+
+def test_rounds_past_the_grace_period_are_cancelled_cleanly():
+    storage = SlowStorage(delay=0.0)
+    config = make_config(targets=2, count=20, probe_interval=0.1, shutdown_grace=0.05)
+    monitor = Monitor(config, storage=storage, transport=FakeTransport(latency_ms=1, seed=1))
+    started = time.perf_counter()
+    run_for(monitor, 0.2)
+    assert time.perf_counter() - started < 1.0
+    monitor.close()
+    # دورهای لغوشده نتیجه ناقص ذخیره نمی‌کنند
+    assert monitor.rounds == 0
+    assert storage.saved == []
@@ -0,0 +1,155 @@
+import asyncio
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from probes import DnsProbe, HttpTtfbProbe, TcpConnectProbe, UdpEchoProbe, make_probe, serve_udp_echo
+from speed import serve_stand_in
+
+
+def run_probe(probe, target, count=1, timeout=2.0):
+    """مثل ProbeEngine.run_sync: پروب‌ها روی یک loop تازه اجرا و سوکت‌ها پیش از بستن loop آزاد می‌شوند."""
+    async def main():
+        try:
+            return await asyncio.gather(*(probe.probe(target, timeout) for _ in range(count)))
+        finally:
+            probe.release()
+            await asyncio.sleep(0)
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def echo_target():
+    server = serve_udp_echo()
+    yield f'127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_udp_echo_matches_concurrent_replies(echo_target):
+    probe = UdpEchoProbe(payload_size=64)
+    rtts = run_probe(probe, echo_target, count=20)
+    assert len(rtts) == 20
+    assert all(rtt is not None and rtt >= 0 for rtt in rtts)
+    # loop بعدی سوکت تازه می‌گیرد و همچنان جواب می‌گیرد
+    assert run_probe(probe, echo_target)[0] is not None
+    probe.close()
+
+
+def test_udp_reply_with_unknown_token_times_out():
+    # سروری که پاسخ را با شماره ترتیب دیگری برمی‌گرداند
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(2.0)
+
+    async def main(probe):
+        try:
+            pending = asyncio.ensure_future(probe.probe(f'127.0.0.1:{sock.getsockname()[1]}', 0.3))
+            data, address = await asyncio.get_running_loop().run_in_executor(None, sock.recvfrom, 1024)
+            reply = bytearray(data)
+            UdpEchoProbe.HEADER.pack_into(reply, 0, b'NSPE', 999)
+            sock.sendto(bytes(reply), address)
+            return await pending
+        finally:
+            probe.release()
+            await asyncio.sleep(0)
+
+    try:
+        assert asyncio.run(main(UdpEchoProbe())) is None
+    finally:
+        sock.close()
+
+
+def test_dns_probe_matches_query_id(echo_target):
+    # سرور echo پرس‌وجو را با همان شناسه برمی‌گرداند، که برای DnsProbe یک پاسخ معتبر است
+    probe = make_probe('dns', query_name='example.com', path='/ignored')
+    assert isinstance(probe, DnsProbe)
+    rtts = run_probe(probe, echo_target, count=10)
+    assert all(rtt is not None for rtt in rtts)
+    assert probe._question.startswith(b'\x07example\x03com\x00')
+    assert probe._question.endswith(struct.pack('!HH', 1, 1))
+
+
+def test_dns_probe_times_out_without_resolver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))  # باز ولی بی‌پاسخ
+    try:
+        assert run_probe(DnsProbe(), f'127.0.0.1:{sock.getsockname()[1]}', timeout=0.2) == [None]
+    finally:
+        sock.close()
+
+
+@pytest.fixture
+def http_target():
+    server, base_url = serve_stand_in(payload_bytes=16)
+    yield f'127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_probe_reuses_keep_alive_connection(http_target):
+    probe = HttpTtfbProbe(path='/download', method='GET')
+
+    async def main():
+        try:
+            first = await probe.probe(http_target, 2.0)
+            connection = probe._idle[http_target][-1]
+            second = await probe.probe(http_target, 2.0)
+            return first, second, connection, probe._idle[http_target]
+        finally:
+            probe.release()
+            await asyncio.sleep(0)
+
+    first, second, connection, idle = asyncio.run(main())
+    assert first is not None and second is not None
+    assert idle == [connection]
+
+
+def test_http_probe_rejects_non_http_reply():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+
+    def serve():
+        conn, _ = listener.accept()
+        with conn:
+            conn.recv(1024)
+            conn.sendall(b'SSH-2.0-OpenSSH\r\n')
+
+    server = threading.Thread(target=serve, daemon=True)
+    server.start()
+    try:
+        with pytest.raises(ConnectionError, match='Invalid HTTP response'):
+            run_probe(HttpTtfbProbe(), f'127.0.0.1:{listener.getsockname()[1]}')
+    finally:
+        server.join(2.0)
+        listener.close()
+
+
+def test_tcp_resolved_addresses_expire(monkeypatch):
+    probe = TcpConnectProbe(resolve_ttl=60)
+    answers = iter(['192.0.2.1', '192.0.2.2', OSError('resolver down')])
+
+    async def getaddrinfo(host, port, type):
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return [(socket.AF_INET, type, 0, '', (answer, port))]
+
+    async def resolve():
+        monkeypatch.setattr(asyncio.get_running_loop(), 'getaddrinfo', getaddrinfo)
+        return await probe._resolve('example.test', 443)
+
+    def expire():
+        address, _ = probe._addresses[('example.test', 443)]
+        probe._addresses[('example.test', 443)] = (address, time.monotonic() - 1)
+
+    assert asyncio.run(resolve()) == '192.0.2.1'
+    assert asyncio.run(resolve()) == '192.0.2.1'  # از کش
+    expire()
+    assert asyncio.run(resolve()) == '192.0.2.2'
+    expire()
+    assert asyncio.run(resolve()) == '192.0.2.2'  # resolve ناموفق؛ آدرس قبلی
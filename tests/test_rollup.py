@@ -0,0 +1,120 @@
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from rollup import QUANTILES, TIERS, Rollup, aggregate, results_to_frame  # noqa: E402
+from stats import LatencyStats  # noqa: E402
+from storage import ResultStorage  # noqa: E402
+
+START = datetime(2026, 10, 16, 22, 0)
+rng = random.Random(7)
+
+
+def result(timestamp, name='A'):
+    stats = LatencyStats()
+    for _ in range(5):
+        stats.add(rng.lognormvariate(3, 0.5))
+    ping = {**stats.result(), 'histogram': stats.histogram.to_dict()}
+    speed = {'download_speed': rng.uniform(5, 50), 'upload_speed': 0.0} if rng.random() < 0.1 else \
+        {'download_speed': 0.0, 'upload_speed': 0.0}
+    return name, ping, speed, 'icmp', timestamp
+
+
+def save(storage, start, end, step=timedelta(seconds=20)):
+    batch, timestamp = [], start
+    while timestamp < end:
+        batch.extend(result(timestamp, name) for name in ('A', 'B'))
+        timestamp += step
+    storage.save_batch(batch)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = ResultStorage(data_dir=str(tmp_path), record_samples=False)
+    yield storage
+    storage.close()
+
+
+class Reads:
+    """شروع هر خواندن نتایج خام را ثبت می‌کند."""
+
+    def __init__(self, storage):
+        self.starts = []
+        self._iter = storage.iter_results
+        storage.iter_results = self
+
+    def __call__(self, connection_name=None, start=None, end=None):
+        self.starts.append(start)
+        return self._iter(connection_name, start, end)
+
+
+def assert_rows_match_raw(rollup, storage, tier, end):
+    raw = results_to_frame(storage.iter_results(end=end.isoformat()), histograms=True)
+    expected = aggregate(raw, TIERS[tier])
+    rows = list(rollup.iter_tier(tier))
+    assert [(r['connection_name'], r['bucket']) for r in rows] == sorted(
+        zip(expected['connection_name'], expected['bucket'].dt.strftime('%Y-%m-%dT%H:%M:%S')),
+        key=lambda key: (key[1], key[0]))
+    expected = expected.set_index(['connection_name', expected['bucket'].dt.strftime('%Y-%m-%dT%H:%M:%S')])
+    for row in rows:
+        want = expected.loc[(row['connection_name'], row['bucket'])]
+        assert row['count'] == want['count']
+        for column in ('mean_latency', 'min_latency', 'max_latency', 'packet_loss', 'download_speed',
+                       *QUANTILES):
+            if row[column] is None:
+                assert math.isnan(want[column])
+            else:
+                assert row[column] == pytest.approx(want[column])
+
+
+def test_incremental_compaction_matches_full_aggregation(storage):
+    rollup = Rollup(storage, retention=timedelta(days=30))
+    save(storage, START, START + timedelta(hours=3), step=timedelta(minutes=1))
+    rollup.compact(now=START + timedelta(hours=3, minutes=1))
+    save(storage, START + timedelta(hours=3), START + timedelta(hours=27), step=timedelta(minutes=1))
+    now = START + timedelta(hours=27, minutes=30)
+    rollup.compact(now=now)
+
+    assert_rows_match_raw(rollup, storage, '1min', pd.Timestamp(now).floor('1min'))
+    assert_rows_match_raw(rollup, storage, '1h', pd.Timestamp(now).floor('1h'))
+    assert_rows_match_raw(rollup, storage, '1d', pd.Timestamp(now).floor('1D'))
+
+
+def test_compaction_reads_only_the_grace_window(storage):
+    rollup = Rollup(storage, retention=timedelta(days=30), grace=timedelta(minutes=5))
+    save(storage, START, START + timedelta(hours=36), step=timedelta(minutes=1))
+    rollup.compact(now=START + timedelta(hours=36))  # 2026-10-18 10:00
+    with open(rollup._tier_path('1d'), 'rb') as f:
+        days = f.read()
+
+    save(storage, START + timedelta(hours=36), START + timedelta(hours=40), step=timedelta(minutes=1))
+    reads = Reads(storage)
+    summary = rollup.compact(now=START + timedelta(hours=40, minutes=2))
+    assert reads.starts == ['2026-10-18T09:55:00']
+    # ساعت ۹ (که پنجره grace به آن می‌رسد) و ساعت‌های کامل جدید برای دو اتصال
+    assert summary['1h'] == 2 * 5
+    assert summary['1d'] == 0
+    with open(rollup._tier_path('1d'), 'rb') as f:
+        assert f.read() == days  # روز قبل دوباره نوشته نمی‌شود
+
+
+def test_late_results_in_the_grace_window_are_absorbed(storage):
+    rollup = Rollup(storage, retention=timedelta(days=30), grace=timedelta(minutes=5))
+    save(storage, START, START + timedelta(minutes=61))
+    rollup.compact(now=START + timedelta(minutes=61))
+    late = START + timedelta(minutes=58, seconds=5)
+    storage.save_batch([result(late), result(late)])
+    now = START + timedelta(minutes=63)
+    rollup.compact(now=now)
+
+    minute = {(r['connection_name'], r['bucket']): r for r in rollup.iter_tier('1min')}
+    assert len(minute) == 2 * 61
+    assert minute['A', '2026-10-16T22:58:00']['count'] == 3 + 2
+    hour, = [r for r in rollup.iter_tier('1h', connection_name='A')]
+    assert hour['count'] == 3 * 60 + 2
+    assert_rows_match_raw(rollup, storage, '1min', pd.Timestamp(now).floor('1min'))
+    assert_rows_match_raw(rollup, storage, '1h', pd.Timestamp(now).floor('1h'))
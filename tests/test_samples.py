@@ -0,0 +1,41 @@
+import os
+import time
+
+import pytest
+
+from samples import SampleStore
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SampleStore(str(tmp_path), flush_interval=3600)
+    yield store
+    store.close()
+
+
+def test_samples_buffered_before_the_flush_are_in_the_window(store):
+    t0 = time.time()
+    store.record('a', 0, 12.5, None, timestamp=t0 - 0.3)
+    store.record('a', 1, None, None, timestamp=t0 - 0.2)
+    time.sleep(0.05)
+    store.flush()  # سگمنت بعد از ثبت نمونه‌ها ساخته می‌شود
+    window = store.window(None, t0 - 0.25)
+    assert list(window['timestamp']) == [t0 - 0.3]
+    assert len(store.window(None, t0 + 0.1)) == 2
+    assert len(store.window(t0 - 0.25, None, target='a')) == 1
+
+
+def test_prune_keeps_segments_that_may_still_be_written(store):
+    t0 = time.time()
+    store.record('a', 0, 10.0, None, timestamp=t0 - 7200)
+    store.flush()
+    assert store.prune(t0) == 0  # نویسنده هنوز سگمنت را باز نگه داشته
+    store.close()
+    path, = store.segments()
+    old = t0 - store.segment_max_age - 120
+    os.utime(path, (old, old))
+    assert store.prune(t0 - 7200) == 0  # نمونه جدیدتر از before است
+    assert store.prune(t0) == 1
+    assert store.segments() == []
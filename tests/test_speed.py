@@ -0,0 +1,61 @@
+import json
+import time
+
+import pytest
+
+from speed import HttpSpeedTarget, ServerCache, serve_stand_in
+
+PAYLOAD = 2 * 1024 * 1024
+
+
+@pytest.fixture
+def stand_in():
+    server, base_url = serve_stand_in(payload_bytes=PAYLOAD)
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_target_measures_all_streams(stand_in):
+    target = HttpSpeedTarget(f'{stand_in}/download', f'{stand_in}/upload', streams=3, upload_bytes=PAYLOAD)
+    result = target.measure()
+    timings = result['timings']
+    assert result['download_bps'] * timings['download'] / 8 == pytest.approx(3 * PAYLOAD)
+    assert result['upload_bps'] * timings['upload'] / 8 == pytest.approx(3 * PAYLOAD)
+    assert result['server'] == f'{stand_in}/download'
+
+
+def test_failed_stream_is_reported(stand_in):
+    target = HttpSpeedTarget(f'{stand_in}/download', streams=3)
+    calls = iter(range(3))
+
+    def worker():
+        if next(calls) == 1:
+            raise ConnectionResetError('stream reset')
+        return target._download_one()
+
+    with pytest.raises(RuntimeError, match='1 of 3 streams failed: stream reset'):
+        target._parallel(worker)
+
+
+def test_cache_entry_expires_after_ttl(tmp_path):
+    cache = ServerCache(str(tmp_path / 'server.json'), ttl=60)
+    server = {'host': 'speed.example:8080', 'id': '42'}
+    cache.put('1.2.3.4|ISP|10.0.0.2', server)
+    assert cache.get('1.2.3.4|ISP|10.0.0.2') == server
+
+    with open(cache.path, encoding='utf-8') as f:
+        entry = json.load(f)
+    entry['saved_at'] = time.time() - 61
+    with open(cache.path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    assert cache.get('1.2.3.4|ISP|10.0.0.2') is None
+
+
+def test_cache_is_invalid_on_another_network(tmp_path):
+    cache = ServerCache(str(tmp_path / 'server.json'))
+    cache.put('1.2.3.4|ISP|10.0.0.2', {'host': 'speed.example:8080'})
+    assert cache.get('5.6.7.8|Other ISP|192.168.1.7') is None
+    assert cache.get('1.2.3.4|ISP|192.168.1.7') is None  # همان ISP، شبکه محلی دیگر
+    cache.invalidate()
+    assert cache.get('1.2.3.4|ISP|10.0.0.2') is None
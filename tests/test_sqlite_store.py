@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+
+import pytest
+
+from sqlite_store import SqliteBackend
+from storage import ResultStorage
+
+
+def entry(minute, name='A', latency=20.0):
+    return {'timestamp': f'2026-10-18T10:{minute:02d}:00', 'connection_name': name, 'probe_type': 'icmp',
+            'ping': {'avg_latency': latency}, 'speed': {'download_speed': 0.0, 'upload_speed': 0.0}}
+
+
+def minutes(records):
+    return [int(r['timestamp'][14:16]) for r in records]
+
+
+@pytest.fixture
+def db(tmp_path):
+    backend = SqliteBackend(str(tmp_path / 'results.db'))
+    # ترتیب درج با ترتیب زمانی یکی نیست؛ ایندکس زمانی ترتیب را نگه می‌دارد
+    backend.append_many([entry(minute, 'A' if minute % 2 else 'B') for minute in range(39, -1, -1)])
+    yield backend
+    backend.close()
+
+
+def test_iter_and_load_are_in_timestamp_order(db):
+    assert minutes(db.iter()) == list(range(40))
+    assert minutes(db.load()) == list(range(40))
+
+
+def test_query_filters_by_connection_and_range(db):
+    records = db.query(connection_name='A', start='2026-10-18T10:10:00', end='2026-10-18T10:20:00')
+    assert minutes(records) == [11, 13, 15, 17, 19]
+
+
+def test_tail_returns_newest_in_ascending_order(db):
+    assert minutes(db.tail(3)) == [37, 38, 39]
+    assert minutes(db.tail(2, connection_name='B')) == [36, 38]
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = [entry(minute) for minute in range(5)]
+    with open(tmp_path / 'network_results.json', 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    storage = ResultStorage(data_dir=str(tmp_path), backend='sqlite', record_samples=False)
+    assert [r['timestamp'] for r in storage.load_results()] == [e['timestamp'] for e in legacy]
+    storage.close()
+
+    storage = ResultStorage(data_dir=str(tmp_path), backend='sqlite', record_samples=False)
+    assert len(storage.load_results()) == len(legacy)
+    storage.close()
+    with open(tmp_path / 'network_results.json', encoding='utf-8') as f:
+        assert json.load(f) == legacy
+
+
+def test_corrupt_legacy_json_is_not_migrated(tmp_path):
+    (tmp_path / 'network_results.json').write_text('[{"timestamp": ', encoding='utf-8')
+    storage = ResultStorage(data_dir=str(tmp_path), backend='sqlite', record_samples=False)
+    assert storage.load_results() == []
+    storage.close()
+    assert os.path.exists(tmp_path / 'network_results.json')
+
+
+def test_concurrent_migrations_insert_the_legacy_records_once(tmp_path, monkeypatch):
+    legacy = [entry(minute) for minute in range(5)]
+    legacy_path = tmp_path / 'network_results.json'
+    legacy_path.write_text(json.dumps(legacy), encoding='utf-8')
+
+    # هر دو اتصال از بررسی سریع رد می‌شوند و بعد با هم به درج می‌رسند
+    barrier = threading.Barrier(2, timeout=5)
+    load = json.load
+
+    def load_together(f):
+        records = load(f)
+        barrier.wait()
+        return records
+
+    monkeypatch.setattr(json, 'load', load_together)
+    backends = [SqliteBackend(str(tmp_path / 'results.db')) for _ in range(2)]
+    migrated = [None, None]
+
+    def migrate(i):
+        migrated[i] = backends[i].migrate_legacy(str(legacy_path))
+
+    threads = [threading.Thread(target=migrate, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert sorted(migrated) == [0, len(legacy)]
+        assert len(backends[0].load()) == len(legacy)
+    finally:
+        for backend in backends:
+            backend.close()
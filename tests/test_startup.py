@@ -0,0 +1,12 @@
+import pytest
+
+from bench_startup import HISTORY_BUDGET_MS, PING_BUDGET_MS, measure, startup_paths
+
+BUDGETS = {'ping': PING_BUDGET_MS, 'history': HISTORY_BUDGET_MS}
+
+
+@pytest.mark.parametrize('label', sorted(BUDGETS))
+def test_startup_within_budget(label, tmp_path):
+    total_ms, forbidden, _ = measure(startup_paths(str(tmp_path))[label])
+    assert not forbidden, f"{label} imports heavy modules: {', '.join(forbidden)}"
+    assert total_ms <= BUDGETS[label], f"{label} imports took {total_ms:.1f} ms (budget {BUDGETS[label]:.0f} ms)"
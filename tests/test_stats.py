@@ -0,0 +1,118 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from stats import LatencyHistogram, LatencyStats
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+def test_quantiles_are_within_relative_accuracy(accuracy):
+    rng = random.Random(3)
+    values = [rng.lognormvariate(3, 1) for _ in range(20000)]
+    histogram = LatencyHistogram(relative_accuracy=accuracy)
+    for value in values:
+        histogram.add(value)
+    for q in (0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 0.999, 1.0):
+        exact = exact_quantile(values, q)
+        assert abs(histogram.quantile(q) - exact) <= accuracy * exact * (1 + 1e-9)
+
+
+def test_values_outside_the_range_are_clamped():
+    histogram = LatencyHistogram(min_value=0.01, max_value=1000)
+    histogram.add(0.0)
+    histogram.add(0.005)
+    histogram.add(5000)
+    assert histogram.quantile(0.5) == 0.0
+    assert histogram.quantile(1.0) == pytest.approx(1000, rel=0.01)
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+def test_merged_histogram_equals_histogram_of_all_values():
+    rng = random.Random(5)
+    first, second, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(5000):
+        value = rng.expovariate(0.05)
+        (first if i % 3 else second).add(value)
+        combined.add(value)
+    first.merge(second)
+    assert first.count == combined.count
+    assert first.buckets == combined.buckets
+    assert first.zero_count == combined.zero_count
+    restored = LatencyHistogram.from_dict(first.to_dict())
+    assert restored.buckets == combined.buckets and restored.count == combined.count
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        LatencyHistogram(0.01).merge(LatencyHistogram(0.02))
+
+
+def test_welford_matches_statistics():
+    rng = random.Random(7)
+    # میانگین بزرگ و واریانس کوچک؛ فرمول ساده جمع مربعات اینجا دقت را از دست می‌دهد
+    values = [1e6 + rng.gauss(0, 0.5) for _ in range(10000)]
+    stats = LatencyStats()
+    for value in values:
+        stats.add(value)
+    assert stats.mean == pytest.approx(statistics.fmean(values), rel=1e-12)
+    assert stats.stdev == pytest.approx(statistics.stdev(values), rel=1e-9)
+    assert stats.min == min(values) and stats.max == max(values)
+
+
+def test_merged_stats_equal_stats_of_all_values():
+    rng = random.Random(11)
+    values = [rng.uniform(5, 50) for _ in range(3000)]
+    first, second = LatencyStats(), LatencyStats()
+    for i, value in enumerate(values):
+        (first if i < 1000 else second).add(value)
+    second.add_loss()
+    first.merge(second)
+    assert first.received == 3000 and first.sent == 3001
+    assert first.mean == pytest.approx(statistics.fmean(values), rel=1e-12)
+    assert first.stdev == pytest.approx(statistics.stdev(values), rel=1e-9)
+
+
+def test_rfc3550_jitter_known_values():
+    stats = LatencyStats()
+    for delay in (10, 20, 10, 20):
+        stats.add(delay)
+    # J(i) = J(i-1) + (|D(i-1,i)| - J(i-1)) / 16 با |D| = 10 در هر گام
+    expected = 0.0
+    for _ in range(3):
+        expected += (10 - expected) / 16
+    assert stats.rfc3550_jitter == pytest.approx(expected)
+    assert expected == pytest.approx(10 * (1 - (15 / 16) ** 3))
+
+    steady = LatencyStats()
+    for _ in range(1000):
+        steady.add(30)
+    assert steady.rfc3550_jitter == 0.0
+
+
+def test_rfc3550_jitter_converges_to_mean_difference():
+    stats = LatencyStats()
+    for i in range(500):
+        stats.add(10 if i % 2 else 14)
+    assert stats.rfc3550_jitter == pytest.approx(4.0, rel=1e-6)
+
+
+def test_result_with_losses_and_no_replies():
+    stats = LatencyStats()
+    for delay in (10.0, 12.0, 11.0):
+        stats.add(delay)
+    stats.add_loss()
+    result = stats.result()
+    assert result['packet_loss'] == 25.0
+    assert result['min_latency'] <= result['p50_latency'] <= result['p99_latency'] <= result['max_latency']
+
+    empty = LatencyStats()
+    empty.add_loss()
+    assert empty.result()['packet_loss'] == 100.0
+    assert empty.result()['p95_latency'] == 0.0
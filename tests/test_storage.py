@@ -0,0 +1,127 @@
+import json
+import os
+
+import pytest
+
+from storage import ResultLog, ResultStorage
+
+
+def entry(minute, name='A', latency=20.0):
+    return {'timestamp': f'2026-10-18T10:{minute:02d}:00', 'connection_name': name, 'probe_type': 'icmp',
+            'ping': {'avg_latency': latency}, 'speed': {'download_speed': 0.0, 'upload_speed': 0.0}}
+
+
+@pytest.fixture
+def log(tmp_path):
+    """دو نویسنده روی یک پوشه با timestamp‌های درهم؛ هر نویسنده سگمنت خودش را دارد."""
+    first = ResultLog(str(tmp_path))
+    second = ResultLog(str(tmp_path))
+    for minute in range(0, 40, 2):
+        first.append(entry(minute, 'A'))
+        second.append(entry(minute + 1, 'B'))
+    first.close()
+    second.close()
+    return ResultLog(str(tmp_path))
+
+
+def minutes(records):
+    return [int(r['timestamp'][14:16]) for r in records]
+
+
+def test_iter_merges_segments_in_timestamp_order(log):
+    assert len(log.segments()) == 2
+    assert minutes(log.iter()) == list(range(40))
+
+
+def test_tail_reads_newest_across_segments(log):
+    assert minutes(log.tail(5)) == [35, 36, 37, 38, 39]
+    assert minutes(log.tail(3, connection_name='A')) == [34, 36, 38]
+    assert log.tail(0) == []
+    assert minutes(log.tail(100)) == list(range(40))
+
+
+def test_torn_tail_line_is_skipped(log):
+    with open(log.segments()[0], 'a', encoding='utf-8') as f:
+        f.write('{"timestamp": "2026-10-18T11:00:00", "connec')
+    assert minutes(log.iter()) == list(range(40))
+    assert minutes(log.tail(2)) == [38, 39]
+
+
+@pytest.mark.parametrize('block_size', [7, 64, 1 << 16])
+def test_reversed_segment_read_crosses_blocks(log, block_size):
+    path = log.segments()[0]
+    forward = list(ResultLog._read_segment(path))
+    backward = list(ResultLog._read_segment_reversed(path, block_size=block_size))
+    assert backward == forward[::-1]
+
+
+def test_query_filters_by_connection_and_range(log):
+    records = log.query(connection_name='B', start='2026-10-18T10:10:00', end='2026-10-18T10:20:00')
+    assert minutes(records) == [11, 13, 15, 17, 19]
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = [entry(minute) for minute in range(5)]
+    with open(tmp_path / 'network_results.json', 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    storage = ResultStorage(data_dir=str(tmp_path), record_samples=False)
+    assert [r['timestamp'] for r in storage.load_results()] == [e['timestamp'] for e in legacy]
+    storage.close()
+
+    # دومین باز شدن دوباره منتقل نمی‌کند و فایل قدیمی دست نخورده می‌ماند
+    storage = ResultStorage(data_dir=str(tmp_path), record_samples=False)
+    assert len(storage.load_results()) == len(legacy)
+    storage.close()
+    with open(tmp_path / 'network_results.json', encoding='utf-8') as f:
+        assert json.load(f) == legacy
+
+
+def test_corrupt_legacy_json_is_not_migrated(tmp_path):
+    (tmp_path / 'network_results.json').write_text('[{"timestamp": ', encoding='utf-8')
+    storage = ResultStorage(data_dir=str(tmp_path), record_samples=False)
+    assert storage.load_results() == []
+    storage.close()
+    assert os.path.exists(tmp_path / 'network_results.json')
+
+
+def test_clock_going_back_starts_a_new_segment(tmp_path):
+    log = ResultLog(str(tmp_path))
+    # پایان ساعت تابستانی: ساعت محلی از 10:59 به 10:00 برمی‌گردد
+    log.append_many([entry(minute) for minute in (30, 45, 59)])
+    log.append_many([entry(minute) for minute in (5, 20)])
+    log.append(entry(35))
+    log.close()
+    assert len(log.segments()) == 2
+    for path in log.segments():
+        stamps = [r['timestamp'] for r in ResultLog._read_segment(path)]
+        assert stamps == sorted(stamps)
+    assert minutes(log.iter()) == [5, 20, 30, 35, 45, 59]
+    assert minutes(log.tail(3)) == [35, 45, 59]
+
+
+def test_prune_with_short_retention_reaches_young_segments(tmp_path):
+    closed = ResultLog(str(tmp_path))
+    closed.append_many([entry(minute) for minute in range(10)])
+    closed.close()
+    active = ResultLog(str(tmp_path))  # نویسنده پروسس دیگری که هنوز باز است
+    active.append_many([entry(minute, 'B') for minute in range(10)])
+    own = ResultLog(str(tmp_path))
+    own.append_many([entry(minute, 'C') for minute in range(10)])
+
+    assert own.prune('2026-10-18T10:05:00') == 10
+    assert [r['connection_name'] for r in own.iter() if r['timestamp'] < '2026-10-18T10:05:00'] == ['B'] * 5
+    # سگمنت بسته‌شده خود نویسنده هم prune شد و نوشتن بعدی سگمنت تازه می‌گیرد
+    own.append(entry(30, 'C'))
+    active.append(entry(30, 'B'))
+    own.close()
+    active.close()
+    assert minutes(ResultLog(str(tmp_path)).query(connection_name='C')) == [5, 6, 7, 8, 9, 30]
+    assert minutes(ResultLog(str(tmp_path)).query(connection_name='B')) == list(range(10)) + [30]
+
+
+def test_save_result_does_not_print(tmp_path, capsys):
+    storage = ResultStorage(data_dir=str(tmp_path), record_samples=False)
+    storage.save_result('A', {'avg_latency': 1.0}, {})
+    storage.close()
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,55 @@
+import json
+import socket
+import socketserver
+import time
+
+import pytest
+
+from throughput import MAGIC, MIN_INTERVAL, UDP_FIN, UDP_HEADER, ThroughputClient, ThroughputServer
+
+
+@pytest.fixture
+def server():
+    server = ThroughputServer('127.0.0.1', 0, max_duration=0.5).start()
+    yield server
+    server.shutdown()
+
+
+def test_stdlib_server_class_is_not_modified(server):
+    assert socketserver.ThreadingTCPServer.allow_reuse_address is False
+    assert server.tcp.allow_reuse_address is True
+
+
+def test_requested_duration_is_capped(server):
+    client = ThroughputClient('127.0.0.1', server.port, streams=1, duration=30.0, interval=0.25)
+    start = time.perf_counter()
+    result = client.download()
+    assert time.perf_counter() - start < 5
+    assert result['bytes'] > 0
+
+
+def test_upload_honours_the_capped_duration(server):
+    client = ThroughputClient('127.0.0.1', server.port, streams=2, duration=30.0, interval=0.01)
+    start = time.perf_counter()
+    result = client.upload()  # قبلاً کلاینت ۳۰ ثانیه می‌فرستاد و با reset اتصال تمام می‌شد
+    assert time.perf_counter() - start < 5
+    assert result['bytes'] > 0
+    assert result['seconds'] < 2.0
+    # بازه پذیرفته‌شده MIN_INTERVAL است، نه 0.01 درخواستی
+    assert len(result['interval_bps']) <= 0.5 / MIN_INTERVAL + 2
+
+
+def test_retried_udp_fin_gets_the_same_report(server):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect(('127.0.0.1', server.port))
+        sock.settimeout(2.0)
+        for seq in range(20):
+            sock.send(UDP_HEADER.pack(MAGIC, 7, seq) + bytes(100))
+        # پاسخ اول «گم می‌شود» و کلاینت FIN را دوباره می‌فرستد
+        sock.send(UDP_HEADER.pack(MAGIC, 7, UDP_FIN))
+        first = json.loads(sock.recv(65536))
+        sock.send(UDP_HEADER.pack(MAGIC, 7, UDP_FIN))
+        retried = json.loads(sock.recv(65536))
+    assert first['packets'] == retried['packets'] == 20
+    assert retried == first
+    assert not server.udp.sessions
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from writer import BufferedResultWriter
+
+
+class FlakyStorage:
+    """ذخیره‌سازی‌ای که failures نوشتن اول را با OSError رد می‌کند."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.saved = []
+        self.flushed = 0
+
+    def save_batch(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('disk full')
+        self.saved.extend(batch)
+        return len(batch)
+
+    def flush(self):
+        self.flushed += 1
+
+
+def save(writer, count, start=0):
+    for i in range(start, start + count):
+        writer.save_result(f'host-{i}', {'avg_latency': float(i)}, {})
+
+
+def test_failed_batch_is_retried_in_order():
+    storage = FlakyStorage(failures=1)
+    writer = BufferedResultWriter(storage, flush_interval=0.01)
+    save(writer, 3)
+    writer.flush()
+    save(writer, 2, start=3)
+    writer.close()
+    assert [item[0] for item in storage.saved] == [f'host-{i}' for i in range(5)]
+    stats = writer.stats()
+    assert stats['errors'] == 1
+    assert stats['pending'] == stats['dropped'] == 0
+    assert stats['written'] == 5
+
+
+def test_close_reports_results_it_could_not_write():
+    storage = FlakyStorage(failures=100)
+    writer = BufferedResultWriter(storage, flush_interval=0.01, max_pending=4)
+    save(writer, 6)
+    with pytest.raises(RuntimeError, match='Failed to write 4 results'):
+        writer.close()
+    assert writer.stats()['dropped'] == 2
+    assert storage.flushed == 1
+
+
+def test_close_during_concurrent_saves_loses_nothing():
+    storage = FlakyStorage(failures=0)
+    writer = BufferedResultWriter(storage, max_queue=8, batch_size=4, flush_interval=0.01)
+    accepted = []
+    start = threading.Barrier(5, timeout=5)
+
+    def produce(n):
+        start.wait()
+        for i in range(200):
+            try:
+                writer.save_result(f'host-{n}-{i}', {}, {})
+            except RuntimeError:
+                return
+            accepted.append(f'host-{n}-{i}')
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    start.wait()
+    writer.close()
+    for t in threads:
+        t.join()
+    # هر نتیجه‌ای که save_result پذیرفت نوشته شده و چیزی بعد از _STOP در صف نمانده
+    assert sorted(item[0] for item in storage.saved) == sorted(accepted)
+    assert writer.stats()['queue_depth'] == 0
+
+
+def test_save_racing_close_is_written_or_rejected():
+    storage = FlakyStorage(failures=0)
+    writer = BufferedResultWriter(storage, flush_interval=0.01)
+    closing = threading.Thread(target=writer.close)
+    put_nowait = writer._queue.put_nowait
+
+    def put_while_closing(item):
+        # close() درست بین بررسی _closed و put شروع می‌شود
+        closing.start()
+        closing.join(0.2)
+        put_nowait(item)
+
+    writer._queue.put_nowait = put_while_closing
+    writer.save_result('host-0', {}, {})
+    closing.join()
+    assert [item[0] for item in storage.saved] == ['host-0']
+